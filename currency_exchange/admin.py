@@ -5,7 +5,8 @@ Collect admin models
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+from currency_exchange.models import CurrencyRates, CurrencyRatesRollup, IngestCheckpoint, \
+    SourcePayloadHash, UserPortfolio, UsersExchangeOperations
 
 
 @admin.register(CurrencyRates)
@@ -18,6 +19,29 @@ class UsersExchangeOperationsViewAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(CurrencyRatesRollup)
+class CurrencyRatesRollupAdmin(admin.ModelAdmin):
+    list_display = ('to_currency', 'period', 'period_start', 'min_rate', 'max_rate', 'count')
+    list_filter = ('period', 'to_currency')
+
+
+@admin.register(IngestCheckpoint)
+class IngestCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'day', 'updated')
+
+
+@admin.register(SourcePayloadHash)
+class SourcePayloadHashAdmin(admin.ModelAdmin):
+    list_display = ('source', 'day', 'digest', 'updated')
+    list_filter = ('source',)
+
+
+@admin.register(UserPortfolio)
+class UserPortfolioAdmin(admin.ModelAdmin):
+    list_display = ('user', 'to_currency', 'count', 'value', 'operations')
+    list_filter = ('to_currency',)
+
+
 class UserAdmin(BaseUserAdmin):
     list_display = ('username', 'email', 'is_staff', 'is_active', 'password')
 
@@ -0,0 +1,303 @@
+"""
+    Vectorized analytics of currency rates series
+"""
+import io
+import threading
+from datetime import date
+from typing import Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+
+from currency_exchange.cache import ResponseCache, get_backend, get_data_version
+from currency_exchange.models import CurrencyRates
+
+METRICS = ('mean', 'std', 'percentiles', 'volatility', 'spread', 'moving_average')
+DAYS_IN_YEAR = 365
+SERIES_KEY = 'analytics:series'
+
+analytics_cache = ResponseCache('analytics')
+
+
+class RatesSeries:
+    """
+    Daily sale and purchase rates of one currency as NumPy columns
+    """
+
+    def __init__(self, days: np.ndarray, sale: np.ndarray, purchase: np.ndarray):
+        self.days = days
+        self.sale = sale
+        self.purchase = purchase
+
+    def between(self, low: date, high: date) -> 'RatesSeries':
+        """
+        Slice of the series between two days inclusive
+        """
+        start = np.searchsorted(self.days, np.datetime64(low, 'D'), side='left')
+        end = np.searchsorted(self.days, np.datetime64(high, 'D'), side='right')
+        return RatesSeries(self.days[start:end], self.sale[start:end], self.purchase[start:end])
+
+
+def load_series(currencies: Iterable = None) -> dict:
+    """
+    Read whole history of the currencies in one query. Rates are cast to floats and days
+    to strings by the database, so no model instances, decimals or dates are built per row.
+    :param currencies: currency codes, all currencies if None
+    :return: mapping currency -> RatesSeries ordered by day
+    """
+    rows = CurrencyRates.objects.order_by('to_currency', 'day_of_rate')
+    if currencies is not None:
+        rows = rows.filter(to_currency__in=list(currencies))
+    rows = list(rows.values_list('to_currency', Cast('day_of_rate', CharField()),
+                                 Cast('sale_rate', FloatField()), Cast('purchase_rate', FloatField())))
+    if not rows:
+        return {}
+    codes, days, sale, purchase = zip(*rows)
+    return split_series(np.array(codes), np.array(days, dtype='datetime64[D]'),
+                        np.array(sale, dtype=np.float64), np.array(purchase, dtype=np.float64))
+
+
+def split_series(codes: np.ndarray, days: np.ndarray, sale: np.ndarray,
+                 purchase: np.ndarray) -> dict:
+    """
+    Split columns of rates ordered by currency and day into series of every currency
+    :return: mapping currency -> RatesSeries
+    """
+    if not len(codes):
+        return {}
+    # rows are ordered by currency, so every currency is one contiguous slice
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    return {str(codes[start]): RatesSeries(days[start:end], sale[start:end], purchase[start:end])
+            for start, end in zip(starts, ends)}
+
+
+def dump_series(series: dict) -> bytes:
+    """
+    Pack series of all currencies into one npz blob for the shared cache
+    """
+    currencies = sorted(series)
+    columns = {'codes': np.repeat(np.array(currencies, dtype=str),
+                                  [len(series[currency].days) for currency in currencies]),
+               'days': np.array([], dtype='datetime64[D]'),
+               'sale': np.array([]), 'purchase': np.array([])}
+    if currencies:
+        for column in ('days', 'sale', 'purchase'):
+            columns[column] = np.concatenate([getattr(series[currency], column)
+                                              for currency in currencies])
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    return buffer.getvalue()
+
+
+def restore_series(content: bytes) -> dict:
+    """
+    Unpack series packed by dump_series
+    """
+    with np.load(io.BytesIO(content), allow_pickle=False) as columns:
+        return split_series(columns['codes'], columns['days'], columns['sale'],
+                            columns['purchase'])
+
+
+def series_cache_key(version: int) -> str:
+    return f'{SERIES_KEY}:v{version}'
+
+
+def publish_series() -> None:
+    """
+    Put series of all currencies of the new data version to the shared cache, called when
+    an ingest is committed, so the first analytics request of every worker doesn't read
+    the whole history from the db
+    """
+    version = get_data_version()
+    get_backend().set(series_cache_key(version), dump_series(load_series()),
+                      settings.RATES_CACHE.get('TIMEOUT'))
+
+
+class SeriesCache:
+    """
+    Process local series of whole history of currencies. All of them are dropped when the
+    data version changes, so any range of a loaded currency is sliced without db queries.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.series = {}
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def load(self, currencies: set = None, version: int = None) -> dict:
+        """
+        Series of whole history of the currencies. On a new data version all series are
+        taken from the shared cache if ingest published them, otherwise the missing
+        currencies are read from the db.
+        :param currencies: currency codes, all currencies if None
+        :param version: data version read once by the request, current one if None
+        :return: mapping currency -> RatesSeries, may contain other currencies too
+        """
+        if version is None:
+            version = get_data_version()
+        with self.lock:
+            if version != self.version:
+                self.version, self.series, self.complete = version, {}, False
+            series, complete = self.series, self.complete
+        if complete:
+            return series
+        loaded = self.load_published(version) if not series else None
+        if loaded is not None:
+            currencies = None
+        elif currencies is None:
+            loaded = load_series()
+        else:
+            missing = currencies - set(series)
+            if not missing:
+                return series
+            loaded = load_series(missing)
+            loaded.update({currency: EMPTY_SERIES for currency in missing - set(loaded)})
+        with self.lock:
+            if version == self.version:
+                self.series = dict(self.series, **loaded)
+                self.complete = self.complete or currencies is None
+        return dict(series, **loaded)
+
+    @staticmethod
+    def load_published(version: int) -> Optional[dict]:
+        """
+        Series of all currencies published to the shared cache, None if not published
+        """
+        content = get_backend().get(series_cache_key(version))
+        return None if content is None else restore_series(content)
+
+    def get(self, currencies: Iterable, low: date, high: date, version: int = None) -> dict:
+        """
+        Series of the currencies between two days inclusive
+        :param currencies: currency codes, all currencies if None
+        :param low: first day
+        :param high: last day
+        :param version: data version read once by the request, current one if None
+        :return: mapping currency -> RatesSeries, currencies without rates in range are skipped
+        """
+        currencies = None if currencies is None else set(currencies)
+        series = self.load(currencies, version)
+        result = {}
+        for currency in series if currencies is None else currencies:
+            rates = series.get(currency, EMPTY_SERIES).between(low, high)
+            if len(rates.days):
+                result[currency] = rates
+        return result
+
+
+EMPTY_SERIES = RatesSeries(np.array([], dtype='datetime64[D]'), np.array([]), np.array([]))
+series_cache = SeriesCache()
+
+
+def _number(value) -> float:
+    value = float(value)
+    return None if np.isnan(value) else round(value, 6)
+
+
+def _describe(values: np.ndarray) -> dict:
+    return {'mean': _number(values.mean()), 'min': _number(values.min()),
+            'max': _number(values.max())}
+
+
+def compute_metric(series: RatesSeries, metric: str, window: int = 7,
+                   percentiles: tuple = (5, 25, 50, 75, 95)):
+    """
+    Calculate one metric of the series
+    :param series: rates of one currency
+    :param metric: one of METRICS
+    :param window: days in moving average
+    :param percentiles: ranks of percentiles from 0 to 100
+    :return: json ready result
+    """
+    sale, purchase = series.sale, series.purchase
+    if metric == 'mean':
+        return {'sale': _number(sale.mean()), 'purchase': _number(purchase.mean())}
+    if metric == 'std':
+        ddof = 1 if len(sale) > 1 else 0
+        return {'sale': _number(sale.std(ddof=ddof)), 'purchase': _number(purchase.std(ddof=ddof))}
+    if metric == 'percentiles':
+        values = np.percentile(np.vstack([sale, purchase]), percentiles, axis=1)
+        return {'sale': {str(rank): _number(value) for rank, value in zip(percentiles, values[:, 0])},
+                'purchase': {str(rank): _number(value)
+                             for rank, value in zip(percentiles, values[:, 1])}}
+    if metric == 'volatility':
+        if len(sale) < 3:
+            return {'daily': None, 'annualized': None}
+        daily = np.diff(np.log(sale)).std(ddof=1)
+        return {'daily': _number(daily), 'annualized': _number(daily * np.sqrt(DAYS_IN_YEAR))}
+    if metric == 'spread':
+        spread = sale - purchase
+        return dict(_describe(spread), relative_mean=_number((spread / sale).mean()))
+    if metric == 'moving_average':
+        if len(sale) < window:
+            return {'days': [], 'values': []}
+        totals = np.cumsum(np.r_[0.0, sale])
+        averages = (totals[window:] - totals[:-window]) / window
+        return {'days': series.days[window - 1:].astype(str).tolist(),
+                'values': averages.round(6).tolist()}
+    raise ValueError(f'Unknown metric {metric}')
+
+
+def metric_key(metric: str, window: int, percentiles: tuple) -> str:
+    """
+    Metric name with parameters which change its result
+    """
+    if metric == 'moving_average':
+        return f'{metric}:{window}'
+    if metric == 'percentiles':
+        return f'{metric}:{",".join(str(rank) for rank in percentiles)}'
+    return metric
+
+
+def currency_analytics(currencies: list, low: date, high: date, metrics: Iterable,
+                       window: int = 7, percentiles: tuple = (5, 25, 50, 75, 95)) -> list:
+    """
+    Metrics of every currency between two days inclusive. Every (currency, range, metric)
+    result is cached until rates are changed, missing results are calculated from
+    series kept in memory.
+    :param currencies: currency codes, all currencies of the range if empty
+    :param low: first day
+    :param high: last day
+    :param metrics: names of metrics
+    :param window: days in moving average
+    :param percentiles: ranks of percentiles from 0 to 100
+    :return: list of dicts with to_currency, count and metrics ordered by currency
+    """
+    version = get_data_version()
+    if not currencies:
+        currencies = series_cache.get(None, low, high, version)
+
+    metrics = ['count'] + list(metrics)
+    names = ['count'] + [metric_key(metric, window, percentiles) for metric in metrics[1:]]
+    currencies = sorted(set(currencies))
+    keys = [(currency, metric, analytics_cache.make_data_key(currency, low, high, name,
+                                                             version=version))
+            for currency in currencies for name, metric in zip(names, metrics)]
+    values = analytics_cache.get_many([key for _, _, key in keys])
+
+    results = {currency: {'to_currency': currency} for currency in currencies}
+    missing = {}
+    for (currency, metric, key), value in zip(keys, values):
+        if value is None:
+            missing.setdefault(currency, []).append((metric, key))
+        else:
+            results[currency][metric] = value
+
+    series = series_cache.get(missing, low, high, version) if missing else {}
+    computed = {}
+    for currency, pending in missing.items():
+        currency_series = series.get(currency)
+        for metric, key in pending:
+            if currency_series is None:
+                value = 0 if metric == 'count' else None
+            elif metric == 'count':
+                value = len(currency_series.sale)
+            else:
+                value = compute_metric(currency_series, metric, window, percentiles)
+            results[currency][metric] = computed[key] = value
+    analytics_cache.set_many(computed)
+    return [results[currency] for currency in currencies]
@@ -8,3 +8,9 @@ from django.apps import AppConfig
 class CurrencyExchangeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'currency_exchange'
+
+    def ready(self):
+        """
+        Connect signal handlers
+        """
+        from currency_exchange import signals  # noqa: F401
@@ -0,0 +1,41 @@
+"""
+    ASGI handler which reads streaming responses in the thread pool
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+
+from currency_exchange.async_views import database_sync_to_async
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    The handler of Django 3.2 iterates streaming content in the event loop, where queries
+    aren't allowed and every chunk blocks other requests. Here every chunk is produced
+    through sync_to_async, so a long export keeps constant memory and the loop stays free.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+        await send({'type': 'http.response.start', 'status': response.status_code,
+                    'headers': response_headers})
+        parts = iter(response)
+        next_part = database_sync_to_async(next)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
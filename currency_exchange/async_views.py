@@ -0,0 +1,138 @@
+"""
+    Async read endpoints of currency rates for serving under ASGI. Waiting clients only
+    hold a coroutine, not a thread. Django 3.2 has no async ORM, so queries run in a thread
+    pool through sync_to_async and the event loop stays free while they run.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from currency_exchange.cache import rates_list_cache
+from currency_exchange.encoders import rates_row_encoder
+from currency_exchange.filters import FilterCurrency
+from currency_exchange.models import CurrencyRates
+from currency_exchange.pagination import RatesPagination
+from currency_exchange.rollups import currency_statistics
+from currency_exchange.serializers import CurrencyRatesSerializer, \
+    CurrencyStatisticsFilterSerializer
+from currency_exchange.snapshot import latest_rates
+
+logger = logging.getLogger('currency_exchange.async_views')
+
+
+def database_sync_to_async(func):
+    """
+    Run function with queries in the thread pool. Unlike the default thread sensitive mode
+    calls don't wait for each other in the single thread of sync views. Connection of
+    the pool thread is released like at the end of a sync request.
+    """
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def get_only(view):
+    """
+    Allow only GET and HEAD requests. Decorators of django.views.decorators.http
+    can't wrap coroutines in Django 3.2
+    """
+    async def inner(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+
+    inner.__doc__ = view.__doc__
+    return inner
+
+
+@database_sync_to_async
+def build_rates_page(request) -> tuple:
+    """
+    Filter and paginate rates like CurrencyRatesViewSet, pages are cached until rates change
+    :param request: django request
+    :return: response data and status
+    """
+    request = Request(request)
+    pagination = RatesPagination()
+    pagination.row_fields = rates_row_encoder.sources
+    key = rates_list_cache.make_key(request, list(FilterCurrency.base_filters) + [
+        pagination.limit_query_param, pagination.offset_query_param,
+        pagination.cursor_query_param, pagination.count_query_param])
+    data = rates_list_cache.get(key)
+    if data is not None:
+        return data, status.HTTP_200_OK
+
+    rates = FilterCurrency(request.query_params, queryset=CurrencyRates.objects.all())
+    if not rates.is_valid():
+        return {name: list(messages) for name, messages in rates.errors.items()}, \
+            status.HTTP_400_BAD_REQUEST
+    page = pagination.paginate_queryset(
+        rates.qs.values_list(*rates_row_encoder.sources), request)
+    data = pagination.get_paginated_response(rates_row_encoder.encode_many(page)).data
+    rates_list_cache.set(key, data)
+    return data, status.HTTP_200_OK
+
+
+@database_sync_to_async
+def build_latest_rates() -> list:
+    """
+    Latest rate of every currency ordered by currency
+    """
+    snapshot = latest_rates.get()
+    return CurrencyRatesSerializer([snapshot[currency] for currency in sorted(snapshot)],
+                                   many=True).data
+
+
+@database_sync_to_async
+def build_statistics(query_params) -> tuple:
+    """
+    Min and max rates of every currency in the date range
+    :param query_params: date_filter_gte and date_filter_lte
+    :return: response data and status
+    """
+    date_filter = CurrencyStatisticsFilterSerializer(data=query_params)
+    if not date_filter.is_valid():
+        return date_filter.errors, status.HTTP_400_BAD_REQUEST
+    return {'statistics': currency_statistics(date_filter.validated_data['date_filter_gte'],
+                                              date_filter.validated_data['date_filter_lte'])}, \
+        status.HTTP_200_OK
+
+
+@get_only
+async def rates_list(request):
+    """
+    Page of rates with the same filters and pagination as /rates/
+    """
+    logger.debug('Get response by url %s', request.get_full_path())
+    try:
+        data, status_code = await build_rates_page(request)
+    except APIException as exc:
+        data, status_code = {'detail': exc.detail}, exc.status_code
+    return JsonResponse(data, encoder=JSONEncoder, status=status_code)
+
+
+@get_only
+async def rates_latest(request):
+    """
+    Latest rate of every currency
+    """
+    return JsonResponse(await build_latest_rates(), encoder=JSONEncoder, safe=False)
+
+
+@get_only
+async def rates_statistics(request):
+    """
+    Min and max rates of every currency, date range is passed in query parameters
+    """
+    data, status_code = await build_statistics(request.GET)
+    return JsonResponse(data, encoder=JSONEncoder, status=status_code)
@@ -0,0 +1,149 @@
+"""
+    Authentication classes for app currency exchange
+"""
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from rest_framework.authentication import BaseAuthentication, BasicAuthentication, \
+    SessionAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication, \
+    JWTTokenUserAuthentication
+from rest_framework_social_oauth2.authentication import SocialAuthentication
+
+from currency_exchange.cache import get_backend
+
+CREDENTIALS_PREFIX = 'auth:basic:'
+
+
+def keyed_digest(*parts: str) -> str:
+    """
+    HMAC of the parts with the secret key, so cache keys and values never reveal
+    passwords or their hashes
+    """
+    message = '\x00'.join(parts).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def credentials_key(username: str, password: str) -> str:
+    return CREDENTIALS_PREFIX + keyed_digest('credentials', username, password)
+
+
+def forget_credentials(username: str, password: str) -> None:
+    """
+    Drop cached verification of the credentials
+    :param username: username
+    :param password: raw password which was verified
+    """
+    get_backend().delete(credentials_key(username, password))
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    Basic authentication which remembers successful verifications for
+    BASIC_AUTH_CACHE_TIMEOUT seconds, so repeated requests don't pay for hashing the
+    password. A cached verification is only trusted while the stored password hash of
+    the user is the same and the user is active, failed verifications are never cached.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = credentials_key(userid, password)
+        cached = get_backend().get(key)
+        if cached is not None:
+            user = self.cached_user(json.loads(cached))
+            if user is not None:
+                return user, None
+            get_backend().delete(key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        get_backend().set(key, json.dumps({'id': user.pk,
+                                           'password': keyed_digest('hash', user.password)})
+                          .encode(), settings.BASIC_AUTH_CACHE_TIMEOUT)
+        return user, auth
+
+    @staticmethod
+    def cached_user(cached: dict):
+        """
+        User of the cached verification
+        :param cached: id of the user and digest of their password hash at verification
+        :return: user, None if the user is gone, inactive or changed the password
+        """
+        user = get_user_model()._default_manager.filter(pk=cached['id'], is_active=True).first()
+        if user is None or not hmac.compare_digest(keyed_digest('hash', user.password),
+                                                   cached['password']):
+            return None
+        return user
+
+
+class SchemeAuthentication(BaseAuthentication):
+    """
+    Single authenticator which reads the Authorization header once and calls only the
+    backend of its scheme instead of trying every configured class in turn:
+    Basic goes to cached basic authentication, Bearer with a backend name goes to social
+    OAuth2, Bearer with a signed JWT to JWT and any other Bearer token to OAuth2 toolkit.
+    Requests without a known scheme are checked for a session cookie, requests without
+    both stay anonymous without touching the db.
+    """
+    jwt_class = JWTAuthentication
+    basic_class = CachedBasicAuthentication
+    session_class = SessionAuthentication
+    oauth2_class = OAuth2Authentication
+    social_class = SocialAuthentication
+
+    def get_backend_class(self, request):
+        """
+        Authentication class matching the request, None for anonymous request
+        """
+        header = get_authorization_header(request).split()
+        scheme = header[0].lower() if header else b''
+        if scheme == b'basic':
+            return self.basic_class
+        if scheme == b'bearer':
+            if len(header) == 3:
+                return self.social_class
+            if len(header) == 2 and header[1].count(b'.') == 2:
+                return self.jwt_class
+            return self.oauth2_class
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return self.session_class
+        return None
+
+    def authenticate(self, request):
+        backend_class = self.get_backend_class(request)
+        if backend_class is None:
+            return None
+        return backend_class().authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.jwt_class().authenticate_header(request)
+
+
+class StatelessSchemeAuthentication(SchemeAuthentication):
+    """
+    Scheme authentication for read only endpoints. User of a JWT is built from token
+    claims without a query, so it has only id and can't be used as a model instance.
+    """
+    jwt_class = JWTTokenUserAuthentication
+
+
+class SchemeAuthenticationScheme(OpenApiAuthenticationExtension):
+    """
+    Describe all schemes accepted by scheme authentication. Security requirement names
+    only JWT, other schemes are listed as alternatives in SECURITY of spectacular settings.
+    """
+    target_class = SchemeAuthentication
+    match_subclasses = True
+    name = ['jwtAuth', 'basicAuth', 'cookieAuth']
+
+    def get_security_requirement(self, auto_schema):
+        return {'jwtAuth': []}
+
+    def get_security_definition(self, auto_schema):
+        return [build_bearer_security_scheme_object('Authorization', 'Bearer', 'JWT'),
+                {'type': 'http', 'scheme': 'basic'},
+                {'type': 'apiKey', 'in': 'cookie', 'name': settings.SESSION_COOKIE_NAME}]
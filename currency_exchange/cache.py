@@ -0,0 +1,310 @@
+"""
+    Shared cache of api responses and version of currency rates data
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from currency_exchange.metrics import RESPONSE_CACHE_LOOKUPS
+
+VERSION_KEY = 'rates:version'
+MODIFIED_KEY = 'rates:modified'
+
+
+class LocMemBackend:
+    """
+    Process local cache with LRU eviction. Used in tests and development
+    """
+
+    def __init__(self, location: str = '', max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys: list) -> list:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, timeout: int = None) -> None:
+        expires = time.monotonic() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def set_many(self, values: dict, timeout: int = None) -> None:
+        for key, value in values.items():
+            self.set(key, value, timeout)
+
+    def delete(self, key: str) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys: list) -> None:
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    def set_counter(self, key: str, value: int) -> None:
+        with self.lock:
+            self.counters[key] = value
+
+    def incr(self, key: str) -> int:
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend:
+    """
+    Cache shared by all workers. Keys are bounded by max_entries with LRU eviction
+    tracked in a sorted set of access times. Counters are never evicted.
+    """
+    prefix = 'exchange:'
+
+    def __init__(self, location: str, max_entries: int = 10000):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.max_entries = max_entries
+        self.lru_key = f'{self.prefix}lru'
+
+    def get(self, key: str) -> Optional[bytes]:
+        pipeline = self.client.pipeline()
+        pipeline.get(self.prefix + key)
+        pipeline.zadd(self.lru_key, {self.prefix + key: time.time()}, xx=True)
+        value, _ = pipeline.execute()
+        return value
+
+    def get_many(self, keys: list) -> list:
+        if not keys:
+            return []
+        pipeline = self.client.pipeline()
+        pipeline.mget([self.prefix + key for key in keys])
+        pipeline.zadd(self.lru_key, {self.prefix + key: time.time() for key in keys}, xx=True)
+        values, _ = pipeline.execute()
+        return values
+
+    def set(self, key: str, value: bytes, timeout: int = None) -> None:
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, value, ex=timeout)
+        pipeline.zadd(self.lru_key, {self.prefix + key: time.time()})
+        pipeline.zcard(self.lru_key)
+        size = pipeline.execute()[-1]
+        if size > self.max_entries:
+            evicted = [member for member, _ in
+                       self.client.zpopmin(self.lru_key, size - self.max_entries)]
+            self.client.delete(*evicted)
+
+    def set_many(self, values: dict, timeout: int = None) -> None:
+        if not values:
+            return
+        pipeline = self.client.pipeline()
+        for key, value in values.items():
+            pipeline.set(self.prefix + key, value, ex=timeout)
+        now = time.time()
+        pipeline.zadd(self.lru_key, {self.prefix + key: now for key in values})
+        pipeline.zcard(self.lru_key)
+        size = pipeline.execute()[-1]
+        if size > self.max_entries:
+            evicted = [member for member, _ in
+                       self.client.zpopmin(self.lru_key, size - self.max_entries)]
+            self.client.delete(*evicted)
+
+    def delete(self, key: str) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys: list) -> None:
+        if not keys:
+            return
+        pipeline = self.client.pipeline()
+        pipeline.delete(*[self.prefix + key for key in keys])
+        pipeline.zrem(self.lru_key, *[self.prefix + key for key in keys])
+        pipeline.execute()
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def set_counter(self, key: str, value: int) -> None:
+        self.client.set(self.prefix + key, value)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = self.client.zrange(self.lru_key, 0, -1)
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self.lru_key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return backend configured in RATES_CACHE setting
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = settings.RATES_CACHE
+                _backend = import_string(config['BACKEND'])(config.get('LOCATION', ''),
+                                                            config.get('MAX_ENTRIES', 1024))
+    return _backend
+
+
+def get_data_version() -> int:
+    """
+    Version of currency rates data. Changes every time rates are changed
+    """
+    return get_backend().get_counter(VERSION_KEY)
+
+
+def get_data_modified() -> Optional[int]:
+    """
+    Timestamp of the last change of currency rates data, None if unknown
+    """
+    return get_backend().get_counter(MODIFIED_KEY) or None
+
+
+def bump_data_version() -> int:
+    """
+    Mark all cached responses built from currency rates as outdated
+    :return: new version
+    """
+    version = get_backend().incr(VERSION_KEY)
+    get_backend().set_counter(MODIFIED_KEY, int(time.time()))
+    return version
+
+
+def invalidate_rates_data() -> None:
+    """
+    Bump data version now, so the changing transaction doesn't read its own stale responses,
+    and once again after commit, dropping responses cached by concurrent requests
+    from the data before the change
+    """
+    bump_data_version()
+    transaction.on_commit(bump_data_version)
+
+
+class ResponseCache:
+    """
+    Cache of response data keyed on normalized request parameters and data version
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def make_key(self, request, params: Iterable) -> str:
+        """
+        Build key from the data version, url and values of known query parameters.
+        Order of parameters and unknown parameters don't change the key.
+        :param request: request
+        :param params: names of parameters which change the response
+        :return: key
+        """
+        normalized = json.dumps([request.build_absolute_uri(request.path),
+                                 sorted((name, sorted(request.query_params.getlist(name)))
+                                        for name in set(params)
+                                        if name in request.query_params)])
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f'{self.namespace}:v{get_data_version()}:{digest}'
+
+    def make_data_key(self, *parts, version: int = None) -> str:
+        """
+        Build key from the data version and parts which identify cached data
+        :param parts: values which identify cached data
+        :param version: data version read once for many keys, current one if None
+        :return: key
+        """
+        digest = hashlib.sha1(json.dumps(parts, cls=DjangoJSONEncoder).encode()).hexdigest()
+        if version is None:
+            version = get_data_version()
+        return f'{self.namespace}:v{version}:{digest}'
+
+    def count(self, hits: int, misses: int) -> None:
+        """
+        Add lookups to counts of this process and to metrics
+        """
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            RESPONSE_CACHE_LOOKUPS.labels(self.namespace, 'hit').inc(hits)
+        if misses:
+            RESPONSE_CACHE_LOOKUPS.labels(self.namespace, 'miss').inc(misses)
+
+    def get(self, key: str):
+        value = get_backend().get(key)
+        if value is None:
+            self.count(0, 1)
+            return None
+        self.count(1, 0)
+        return json.loads(value)
+
+    def get_many(self, keys: list) -> list:
+        """
+        Values of many keys at once, None for missing ones
+        """
+        values = get_backend().get_many(keys)
+        hits = sum(value is not None for value in values)
+        self.count(hits, len(values) - hits)
+        return [None if value is None else json.loads(value) for value in values]
+
+    def set(self, key: str, data) -> None:
+        get_backend().set(key, json.dumps(data, cls=DjangoJSONEncoder).encode(),
+                          settings.RATES_CACHE.get('TIMEOUT'))
+
+    def set_many(self, values: dict) -> None:
+        """
+        Store many values at once
+        :param values: mapping key -> data
+        """
+        get_backend().set_many({key: json.dumps(data, cls=DjangoJSONEncoder).encode()
+                                for key, data in values.items()},
+                               settings.RATES_CACHE.get('TIMEOUT'))
+
+    def delete_many(self, keys: list) -> None:
+        get_backend().delete_many(keys)
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counts of this process
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+rates_list_cache = ResponseCache('rates:list')
@@ -0,0 +1,177 @@
+"""
+    Open, high, low, close candles of currency sale rates by week, month, quarter or year
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Window
+from django.db.models.functions import FirstValue, LastValue, TruncMonth, TruncQuarter, \
+    TruncWeek, TruncYear
+from django.db.models.expressions import RowRange
+
+from currency_exchange.cache import ResponseCache
+from currency_exchange.models import CurrencyRates, CurrencyRatesRollup
+
+BUCKETS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+RATE_PRECISION = Decimal(10) ** -CurrencyRates._meta.get_field('sale_rate').decimal_places
+PRICES = ('open', 'high', 'low', 'close')
+DAYS = ('bucket_start', 'first_day', 'last_day')
+
+candles_cache = ResponseCache('candles')
+
+
+def bucket_start(bucket: str, day: date) -> date:
+    """
+    First day of the bucket which contains the day. Weeks start on Monday like in the db
+    """
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'quarter':
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, 1, 1)
+
+
+def next_bucket(bucket: str, start: date) -> date:
+    """
+    First day of the bucket after the bucket which starts on the day
+    """
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[bucket]
+    month = start.month - 1 + months
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def bucket_starts(bucket: str, low: date, high: date) -> list:
+    """
+    Starts of all buckets which overlap the range
+    """
+    starts = []
+    start = bucket_start(bucket, low)
+    while start <= high:
+        starts.append(start)
+        start = next_bucket(bucket, start)
+    return starts
+
+
+def candle_key(bucket: str, currency: str, start: date) -> str:
+    return f'{candles_cache.namespace}:{bucket}:{currency}:{start}'
+
+
+def query_candles(bucket: str, currencies: Iterable, low: date, high: date) -> list:
+    """
+    Calculate candles of whole buckets in the db. Every row gets values of its bucket
+    from window functions partitioned by currency and bucket, distinct leaves one row
+    per bucket.
+    :param bucket: one of BUCKETS
+    :param currencies: currency codes
+    :param low: first day of the first bucket
+    :param high: last day of the last bucket
+    :return: list of candles ordered by currency and bucket
+    """
+    partition = [F('to_currency'), F('bucket_start')]
+    whole_partition = {'partition_by': partition, 'order_by': F('day_of_rate').asc(),
+                       'frame': RowRange(start=None, end=None)}
+    candles = list(
+        CurrencyRates.objects
+        .filter(to_currency__in=list(currencies), day_of_rate__range=[low, high])
+        .annotate(bucket_start=BUCKETS[bucket]('day_of_rate'))
+        .annotate(open=Window(FirstValue('sale_rate'), **whole_partition),
+                  close=Window(LastValue('sale_rate'), **whole_partition),
+                  high=Window(Max('sale_rate'), partition_by=partition),
+                  low=Window(Min('sale_rate'), partition_by=partition),
+                  first_day=Window(Min('day_of_rate'), partition_by=partition),
+                  last_day=Window(Max('day_of_rate'), partition_by=partition))
+        .values('to_currency', 'bucket_start', 'open', 'high', 'low', 'close',
+                'first_day', 'last_day')
+        .order_by('to_currency', 'bucket_start')
+        .distinct())
+    # some backends don't keep the scale of decimals calculated by window functions
+    for candle in candles:
+        for name in PRICES:
+            candle[name] = Decimal(candle[name]).quantize(RATE_PRECISION)
+    return candles
+
+
+def load_candle(candle: dict) -> dict:
+    """
+    Restore decimals and dates of a candle read from cache, json keeps them as strings
+    :param candle: cached candle, empty for a bucket without rates
+    :return: candle with the same types as a calculated one
+    """
+    if not candle:
+        return candle
+    candle.update({name: Decimal(candle[name]) for name in PRICES})
+    candle.update({name: date.fromisoformat(candle[name]) for name in DAYS})
+    return candle
+
+
+def currency_candles(bucket: str, currencies: list, low: date, high: date,
+                     today: date = None) -> list:
+    """
+    Candles of every currency in buckets overlapping the range. Candles of closed buckets
+    are read from cache, the current bucket and missing ones are calculated in the db.
+    :param bucket: one of BUCKETS
+    :param currencies: currency codes, all currencies if empty
+    :param low: first day
+    :param high: last day
+    :param today: current day, defines the only bucket which still changes
+    :return: list of candles ordered by currency and bucket
+    """
+    today = today or date.today()
+    # yearly rollups bound the range by days with rates, so empty history isn't bucketed
+    years = CurrencyRatesRollup.objects.filter(period=CurrencyRatesRollup.YEAR,
+                                               period_start__range=[date(low.year, 1, 1), high])
+    if currencies:
+        years = years.filter(to_currency__in=currencies)
+    bounds = {row['to_currency']: (row['first_day'], row['last_day']) for row in
+              years.values('to_currency').annotate(first_day=Min('first_day'),
+                                                   last_day=Max('last_day')).order_by()}
+    current = bucket_start(bucket, today)
+    wanted = [(currency, start) for currency, (first_day, last_day) in sorted(bounds.items())
+              for start in bucket_starts(bucket, max(low, first_day), min(high, last_day, today))]
+
+    candles = {}
+    closed = [key for key in wanted if key[1] < current]
+    for key, candle in zip(closed, candles_cache.get_many([candle_key(bucket, *key)
+                                                           for key in closed])):
+        if candle is not None:
+            candles[key] = load_candle(candle)
+
+    missing = [key for key in wanted if key not in candles]
+    if missing:
+        first = min(start for _, start in missing)
+        last = next_bucket(bucket, max(start for _, start in missing)) - timedelta(days=1)
+        calculated = {(candle['to_currency'], candle['bucket_start']): candle
+                      for candle in query_candles(bucket, {currency for currency, _ in missing},
+                                                  first, last)}
+        for currency, start in missing:
+            candle = calculated.get((currency, start)) or {}
+            if start < current:
+                # empty closed buckets are cached too, so gaps don't query the db again
+                candles_cache.set(candle_key(bucket, currency, start), candle)
+            candles[(currency, start)] = candle
+    return [candles[key] for key in wanted if candles[key]]
+
+
+def invalidate_candles(keys: Iterable) -> None:
+    """
+    Drop cached candles of all bucket sizes which contain the changed rates,
+    now and once again after commit
+    :param keys: changed rates as tuples (to_currency, day_of_rate)
+    """
+    cache_keys = list({candle_key(bucket, currency, bucket_start(bucket, day))
+                       for currency, day in keys for bucket in BUCKETS})
+    if cache_keys:
+        candles_cache.delete_many(cache_keys)
+        transaction.on_commit(lambda: candles_cache.delete_many(cache_keys))
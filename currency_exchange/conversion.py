@@ -0,0 +1,125 @@
+"""
+    Cross rate conversion between any two currencies through the base currency
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from django.db.models import Max
+
+from currency_exchange.cache import get_data_version
+from currency_exchange.models import CurrencyRates
+from currency_exchange.sources import BASE_CURRENCY
+
+
+class CrossRateMatrix:
+    """
+    Matrix of cross rates of one day. matrix[i, j] is the amount of currency j
+    paid for one unit of currency i: the bank buys currency i at its purchase rate
+    and sells currency j at its sale rate.
+    """
+
+    def __init__(self, day: date, currencies: list, purchase_rates: np.ndarray,
+                 sale_rates: np.ndarray):
+        self.day = day
+        self.currencies = [BASE_CURRENCY] + list(currencies)
+        self.index = {currency: position for position, currency in enumerate(self.currencies)}
+        purchase = np.concatenate(([1.0], purchase_rates))
+        sale = np.concatenate(([1.0], sale_rates))
+        self.matrix = purchase[:, np.newaxis] / sale[np.newaxis, :]
+        np.fill_diagonal(self.matrix, 1.0)
+
+    @classmethod
+    def from_db(cls, day: date) -> 'CrossRateMatrix':
+        """
+        Build matrix from rates of the day
+        """
+        rows = list(CurrencyRates.objects.filter(from_currency=BASE_CURRENCY, day_of_rate=day)
+                    .order_by('to_currency')
+                    .values_list('to_currency', 'purchase_rate', 'sale_rate'))
+        rates = np.array([(purchase, sale) for _, purchase, sale in rows], dtype=np.float64) \
+            .reshape(-1, 2)
+        return cls(day, [currency for currency, _, _ in rows], rates[:, 0], rates[:, 1])
+
+    def unknown(self, currencies) -> list:
+        """
+        Currencies without rate on the day
+        """
+        return sorted(set(currencies) - set(self.index))
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """
+        Amount of to_currency paid for one unit of from_currency
+        """
+        return float(self.matrix[self.index[from_currency], self.index[to_currency]])
+
+    def convert(self, from_currencies: list, to_currencies: list, amounts) -> np.ndarray:
+        """
+        Convert every amount from one currency to another in one vectorized call
+        :param from_currencies: codes of source currencies
+        :param to_currencies: codes of target currencies
+        :param amounts: amounts in source currencies
+        :return: amounts in target currencies
+        """
+        rows = np.fromiter((self.index[currency] for currency in from_currencies), dtype=np.intp,
+                           count=len(from_currencies))
+        columns = np.fromiter((self.index[currency] for currency in to_currencies),
+                              dtype=np.intp, count=len(to_currencies))
+        return self.matrix[rows, columns] * np.asarray(amounts, dtype=np.float64)
+
+
+class CrossRateCache:
+    """
+    Process local matrices of recently used days and days with rates of recently requested
+    days, both with LRU eviction. All of them are dropped when the data version changes,
+    so a new ingest rebuilds matrices on next use.
+    """
+
+    def __init__(self, max_days: int = 64, max_requested_days: int = 4096):
+        self.max_days = max_days
+        self.max_requested_days = max_requested_days
+        self.version = None
+        self.matrices = OrderedDict()
+        self.rate_days = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, day: date) -> Optional[CrossRateMatrix]:
+        """
+        Matrix of the last day with rates on or before the day
+        :param day: requested day
+        :return: matrix or None if there are no rates before the day
+        """
+        version = get_data_version()
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.matrices.clear()
+                self.rate_days.clear()
+            rate_day = self.rate_days.get(day)
+            matrix = self.matrices.get(rate_day)
+            if matrix is not None:
+                self.rate_days.move_to_end(day)
+                self.matrices.move_to_end(rate_day)
+                return matrix
+
+        rate_day = CurrencyRates.objects.filter(from_currency=BASE_CURRENCY, day_of_rate__lte=day) \
+            .aggregate(day=Max('day_of_rate'))['day']
+        if rate_day is None:
+            return None
+        matrix = CrossRateMatrix.from_db(rate_day)
+        with self.lock:
+            if version == self.version:
+                self.rate_days[day] = rate_day
+                self.rate_days.move_to_end(day)
+                while len(self.rate_days) > self.max_requested_days:
+                    self.rate_days.popitem(last=False)
+                self.matrices[rate_day] = matrix
+                self.matrices.move_to_end(rate_day)
+                while len(self.matrices) > self.max_days:
+                    self.matrices.popitem(last=False)
+        return matrix
+
+
+cross_rates = CrossRateCache()
@@ -0,0 +1,90 @@
+"""
+    Fast read only encoding of large listings: rows from values_list are converted by
+    a row encoder compiled once from a serializer and rendered with orjson
+"""
+import orjson
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from currency_exchange.serializers import CurrencyRatesSerializer
+
+
+class RowEncoder:
+    """
+    Encoder of rows which gives the same representation as the serializer without model
+    instances and field by field to_representation. One function building the whole dict
+    is compiled per serializer: decimals and dates are formatted inline, numbers and strings
+    are taken as is, other fields call their to_representation.
+    """
+
+    def __init__(self, serializer_class):
+        fields = serializer_class().fields
+        self.names = tuple(fields)
+        self.sources = tuple(field.source for field in fields.values())
+        namespace = {}
+        items = ', '.join(f'{name!r}: {self.make_expression(field, index, namespace)}'
+                          for index, (name, field) in enumerate(fields.items()))
+        source = f'def encode(row):\n    return {{{items}}}\n'
+        exec(compile(source, f'<{serializer_class.__name__} row encoder>', 'exec'), namespace)
+        self.encode = namespace['encode']
+
+    @staticmethod
+    def make_expression(field, index: int, namespace: dict) -> str:
+        """
+        Python expression which converts the value of the field in row to its representation
+        :param field: serializer field
+        :param index: position of the value in row
+        :param namespace: globals of the compiled function, converters are added to it
+        :return: source of expression
+        """
+        value = f'row[{index}]'
+        if isinstance(field, (serializers.IntegerField, serializers.CharField)):
+            return value
+        if isinstance(field, serializers.DecimalField) and field.decimal_places is not None \
+                and field.rounding is None and not field.localize \
+                and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+            # the format rounds half even like quantize of the field with default context
+            expression = f"f'{{{value}:.{field.decimal_places}f}}'"
+        elif isinstance(field, serializers.DateField) and \
+                str(getattr(field, 'format', api_settings.DATE_FORMAT)).lower() == ISO_8601:
+            expression = f'{value}.isoformat()'
+        else:
+            namespace[f'convert_{index}'] = field.to_representation
+            expression = f'convert_{index}({value})'
+        # the serializer represents empty values as null without calling the field
+        return f'(None if {value} is None else {expression})' if field.allow_null \
+            else expression
+
+    def encode_many(self, rows) -> list:
+        encode = self.encode
+        return [encode(row) for row in rows]
+
+
+rates_row_encoder = RowEncoder(CurrencyRatesSerializer)
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    JSONRenderer which renders compact output with orjson. Output is the same bytes
+    as from JSONRenderer for data of api views: values unknown to orjson, dates and times
+    go through the DRF encoder. Only floats in exponent notation are written differently.
+    Indented output and data which orjson refuses are rendered by JSONRenderer.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | \
+        orjson.OPT_NON_STR_KEYS
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped like JSONRenderer does, to keep output a strict javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,63 @@
+"""
+    Encoders of currency rates for file export
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+EXPORT_FIELDS = ('id', 'from_currency', 'to_currency', 'day_of_rate', 'sale_rate',
+                 'purchase_rate')
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object which returns written value, so csv writer can feed a generator
+    """
+
+    def write(self, value):
+        return value
+
+
+def keyset_pages(queryset):
+    """
+    Rows of EXPORT_FIELDS ordered by day and id in pages of EXPORT_CHUNK_SIZE. Every page is
+    one query continuing after the last row of the previous one, so no cursor stays open
+    between pages and they may be read in different threads
+    """
+    queryset = queryset.order_by('day_of_rate', 'id').values_list(*EXPORT_FIELDS)
+    page = list(queryset[:EXPORT_CHUNK_SIZE])
+    while page:
+        yield page
+        if len(page) < EXPORT_CHUNK_SIZE:
+            break
+        last_id, day = page[-1][0], page[-1][3]
+        page = list(queryset.filter(Q(day_of_rate__gt=day) | Q(day_of_rate=day, id__gt=last_id))
+                    [:EXPORT_CHUNK_SIZE])
+
+
+def encode_csv(pages):
+    """
+    Encode pages of rates as csv. Header goes first, so the first byte doesn't wait for the db
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for chunk in pages:
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def encode_ndjson(pages):
+    """
+    Encode pages of rates as newline delimited json in the format of rates list
+    """
+    for chunk in pages:
+        yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+                      for row in chunk)
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', encode_csv),
+    'ndjson': ('application/x-ndjson', encode_ndjson),
+}
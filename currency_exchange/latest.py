@@ -0,0 +1,69 @@
+"""
+    Latest rates of every currency rendered to json once per data version
+"""
+import threading
+from datetime import date
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from currency_exchange.cache import get_backend, get_data_version
+from currency_exchange.serializers import CurrencyRatesSerializer
+from currency_exchange.snapshot import LatestRates
+
+LATEST_PAYLOAD_KEY = 'rates:latest'
+
+
+class LatestRatesPayload:
+    """
+    Ingest publishes rendered bytes to the shared cache, every worker takes them from there
+    when it sees a new data version and keeps them in memory. Requests between changes
+    only compare the version, they don't query the db or run serializers.
+    """
+
+    def __init__(self):
+        # key and content are replaced together, so readers never see a mixed pair
+        self.current = (None, b'')
+        self.lock = threading.Lock()
+
+    def get(self) -> bytes:
+        """
+        Json array of the latest rate of every currency ordered by currency
+        """
+        key, content = self.current
+        new_key = (get_data_version(), date.today())
+        if new_key != key:
+            with self.lock:
+                key, content = self.current
+                if new_key != key:
+                    content = get_backend().get(self.make_cache_key(new_key)) or \
+                        self.publish(new_key)
+                    self.current = (new_key, content)
+        return content
+
+    def publish(self, key: tuple = None) -> bytes:
+        """
+        Render the latest rates and put them to the shared cache for other workers
+        :param key: data version and day, current ones by default
+        :return: rendered rates
+        """
+        key = key or (get_data_version(), date.today())
+        snapshot = LatestRates.load(key[1])
+        content = JSONRenderer().render(CurrencyRatesSerializer(
+            [snapshot[currency] for currency in sorted(snapshot)], many=True).data)
+        get_backend().set(self.make_cache_key(key), content, settings.RATES_CACHE.get('TIMEOUT'))
+        return content
+
+    @staticmethod
+    def make_cache_key(key: tuple) -> str:
+        return f'{LATEST_PAYLOAD_KEY}:v{key[0]}:{key[1]}'
+
+
+latest_rates_payload = LatestRatesPayload()
+
+
+def publish_latest_rates() -> None:
+    """
+    Render the latest rates of the new data version, called when an ingest is committed
+    """
+    latest_rates_payload.publish()
@@ -0,0 +1,100 @@
+"""
+    Logging pipeline which keeps formatting and writing of records out of request threads
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format record as one line of json
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'function': record.funcName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass only a share of records below WARNING of chosen loggers. Warnings and errors
+    always pass.
+    """
+
+    def __init__(self, rates: dict = None, default: float = 1.0):
+        """
+        :param rates: mapping logger name -> share of records to pass from 0 to 1,
+            the rate of the closest configured parent logger applies to children
+        :param default: share of records of other loggers
+        """
+        super().__init__()
+        self.rates = rates or {}
+        self.default = default
+
+    def rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return self.default
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Put records to a queue which is drained by a background thread writing them to
+    the target handlers. Request threads only merge the message with its arguments.
+    Configured in dictConfig with references to other handlers:
+    'handlers': ['cfg://handlers.console', 'cfg://handlers.file']
+    """
+
+    def __init__(self, handlers: list, respect_handler_level: bool = True):
+        super().__init__(queue.SimpleQueue())
+        # dictConfig resolves references in the list on access by index, not on iteration
+        self.listener = QueueListener(self.queue, *[handlers[index]
+                                                    for index in range(len(handlers))],
+                                      respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.stop)
+        # celery and gunicorn workers are forked after logging is configured
+        os.register_at_fork(after_in_child=self.restart)
+
+    def restart(self) -> None:
+        """
+        Start own queue and background thread in a forked process, the thread of
+        the parent doesn't exist there
+        """
+        self.queue = self.listener.queue = queue.SimpleQueue()
+        self.listener._thread = None
+        self.listener.start()
+
+    def stop(self) -> None:
+        """
+        Write records left in the queue and stop the background thread
+        """
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self) -> None:
+        self.stop()
+        super().close()
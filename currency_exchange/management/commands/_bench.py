@@ -0,0 +1,169 @@
+"""
+    Shared helpers for benchmark management commands
+"""
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, \
+    teardown_test_environment
+
+from currency_exchange.cache import bump_data_version
+from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+from currency_exchange.rollups import rebuild_rollups
+
+KNOWN_CURRENCIES = ['USD', 'EUR', 'PLN', 'GBP', 'CHF', 'CZK', 'JPY', 'CAD', 'SEK', 'NOK',
+                    'DKK', 'HUF', 'AUD', 'CNY', 'ILS', 'KZT', 'TRY', 'GEL', 'MDL', 'SGD']
+
+
+def currency_codes(count: int) -> list:
+    """
+    Return currency codes for seeding. Real codes go first, synthetic ones fill the rest
+    :param count: number of codes
+    :return: list of codes
+    """
+    codes = KNOWN_CURRENCIES[:count]
+    codes += [f'X{number:03}' for number in range(count - len(codes))]
+    return codes
+
+
+def seed_currency_rates(years: int, currencies: int, end: date = None,
+                        batch_size: int = 10000) -> int:
+    """
+    Fill table with daily rates for every currency during number of years and build rollups
+    :param years: length of history in years
+    :param currencies: number of currencies
+    :param end: last day of history, today by default
+    :param batch_size: rows per insert
+    :return: number of inserted rows
+    """
+    end = end or date.today()
+    start = end - timedelta(days=365 * years)
+    randomizer = random.Random(years * 1000 + currencies)
+    batch = []
+    inserted = 0
+    for code in currency_codes(currencies):
+        sale = Decimal(randomizer.randint(20000, 500000)) / 10000
+        day = start
+        while day <= end:
+            sale = min(max(sale + Decimal(randomizer.randint(-500, 500)) / 10000,
+                           Decimal('1.0000')), Decimal('99.0000'))
+            batch.append(CurrencyRates(to_currency=code, day_of_rate=day, sale_rate=sale,
+                                       purchase_rate=sale - Decimal('0.5000')))
+            day += timedelta(days=1)
+            if len(batch) >= batch_size:
+                CurrencyRates.objects.bulk_create(batch)
+                inserted += len(batch)
+                batch = []
+    CurrencyRates.objects.bulk_create(batch)
+    rebuild_rollups()
+    return inserted + len(batch)
+
+
+def seed_operations(user, count: int, batch_size: int = 10000) -> int:
+    """
+    Create exchange operations of the user with random rates
+    :param user: owner of operations
+    :param count: number of operations
+    :param batch_size: rows per insert
+    :return: number of inserted rows
+    """
+    rates = list(CurrencyRates.objects.all()[:1000])
+    randomizer = random.Random(count)
+    for offset in range(0, count, batch_size):
+        operations = [UsersExchangeOperations(currency=randomizer.choice(rates), user=user,
+                                              count=randomizer.randint(1, 1000))
+                      for _ in range(min(batch_size, count - offset))]
+        for operation in operations:
+            operation.set_rate()
+        UsersExchangeOperations.objects.bulk_create(operations)
+    return count
+
+
+class BenchmarkDatabase:
+    """
+    Context manager which runs benchmark against a throwaway test database,
+    so seeded data never reaches the real one
+    """
+
+    def __init__(self, keepdb: bool = False):
+        self.keepdb = keepdb
+        self.old_name = None
+
+    def __enter__(self):
+        setup_test_environment(debug=False)
+        self.old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=self.keepdb)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection.creation.destroy_test_db(self.old_name, verbosity=0, keepdb=self.keepdb)
+        teardown_test_environment()
+
+
+def percentile(values: list, rank: float) -> float:
+    """
+    Nearest rank percentile
+    :param values: measured values
+    :param rank: percentile from 0 to 100
+    :return: value
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(rank / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def explain(sql: str) -> str:
+    """
+    Return plan of raw sql query for current database
+    :param sql: query
+    :return: plan as text
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def measure(func, repeat: int, setup=bump_data_version) -> dict:
+    """
+    Call function several times and collect latency, executed queries and their plans
+    :param func: callable without arguments
+    :param repeat: number of calls
+    :param setup: callable run before every call and not measured. By default outdates
+        cached responses, so every call does the full work
+    :return: measurements in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'min_ms': round(min(timings), 3),
+        'queries': [{'sql': query['sql'], 'plan': explain(query['sql'])}
+                    for query in context.captured_queries
+                    if query['sql'].lstrip().upper().startswith('SELECT')],
+    }
+
+
+def write_report(report: dict, output: str, stdout) -> None:
+    """
+    Write report as json to file or to command output
+    :param report: collected results
+    :param output: path to file, empty value means stdout
+    :param stdout: command output stream
+    """
+    content = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, 'w') as file:
+            file.write(content)
+    else:
+        stdout.write(content)
@@ -0,0 +1,28 @@
+"""
+    Load archive currency rates of privat bank for a range of days
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from currency_exchange.tasks import backfill_currency_rates
+
+
+class Command(BaseCommand):
+    help = 'Load archive rates for every day in range. Interrupted run continues ' \
+           'from the last saved day when started again with the same first day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=date.fromisoformat, help='First day, YYYY-MM-DD')
+        parser.add_argument('end', type=date.fromisoformat, nargs='?', default=date.today(),
+                            help='Last day, YYYY-MM-DD. Today by default')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent requests')
+        parser.add_argument('--rate', type=float, default=5, help='Requests per second')
+        parser.add_argument('--restart', action='store_true', help='Ignore saved checkpoint')
+
+    def handle(self, *args, **options):
+        counts = backfill_currency_rates(options['start'], options['end'],
+                                         workers=options['workers'],
+                                         requests_per_second=options['rate'],
+                                         restart=options['restart'])
+        self.stdout.write(self.style.SUCCESS(f'Backfill finished: {counts}'))
@@ -0,0 +1,59 @@
+"""
+    Benchmark of currency analytics over long history of all currencies
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from currency_exchange.analytics import METRICS, compute_metric, load_series, publish_series
+from currency_exchange.cache import bump_data_version, get_backend
+from currency_exchange.management.commands._bench import BenchmarkDatabase, KNOWN_CURRENCIES, \
+    currency_codes, measure, seed_currency_rates, write_report
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database with rates and record latency of analytics endpoint ' \
+           'after ingest, with series in memory, with cached results and of the vectorized ' \
+           'calculations alone'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10, help='Years of daily history')
+        parser.add_argument('--currencies', type=int, default=len(KNOWN_CURRENCIES),
+                            help='Number of currencies')
+        parser.add_argument('--repeat', type=int, default=5, help='Calls per case')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        with BenchmarkDatabase():
+            rows = seed_currency_rates(options['years'], options['currencies'])
+            self.stderr.write(f'Seeded {rows} rows')
+            client = Client()
+            high = date.today()
+            low = high - timedelta(days=365 * options['years'])
+            params = {'day_of_rate_gte': low, 'day_of_rate_lte': high,
+                      'metrics': ','.join(metric for metric in METRICS if metric != 'moving_average')}
+            series = load_series(currency_codes(options['currencies']))
+
+            def analytics():
+                return client.get('/api/v1/currency_analytics/', params)
+
+            def ingest():
+                bump_data_version()
+                publish_series()
+
+            cases = {
+                'load_series': (lambda: load_series(currency_codes(options['currencies'])), None),
+                'compute_metrics': (lambda: [compute_metric(currency_series, metric)
+                                             for currency_series in series.values()
+                                             for metric in METRICS], None),
+                'endpoint_after_ingest': (analytics, ingest),
+                'endpoint_after_unpublished_change': (analytics, bump_data_version),
+                'endpoint_series_in_memory': (analytics, get_backend().clear),
+                'endpoint_cached_results': (analytics, None),
+            }
+            results = {name: measure(case, options['repeat'], setup=setup)
+                       for name, (case, setup) in cases.items()}
+        write_report({'vendor': connection.vendor, 'rows': rows, 'results': results},
+                     options['output'], self.stdout)
@@ -0,0 +1,50 @@
+"""
+    Benchmark of requests with basic authentication with and without cached verifications
+"""
+import base64
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from rest_framework.authentication import BasicAuthentication
+
+from currency_exchange.authentication import CachedBasicAuthentication
+from currency_exchange.cache import get_backend
+from currency_exchange.management.commands._bench import BenchmarkDatabase, measure, write_report
+from currency_exchange.views import UserPortfolioView
+
+
+class Command(BaseCommand):
+    help = 'Compare requests per second of an endpoint behind basic authentication ' \
+           'with plain and cached verification of the password'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per case')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        with BenchmarkDatabase():
+            User.objects.create_user('benchmark', 'benchmark@mail.ua', 'benchmark-password')
+            credentials = base64.b64encode(b'benchmark:benchmark-password').decode()
+            client = Client(HTTP_AUTHORIZATION=f'Basic {credentials}')
+            get_backend().clear()
+
+            results = {}
+            for name, authentication in (('basic', BasicAuthentication),
+                                         ('cached_basic', CachedBasicAuthentication)):
+                with mock.patch.object(UserPortfolioView, 'authentication_classes',
+                                       [authentication]):
+                    # the first request fills the cache, measured calls show the steady state
+                    client.get('/api/v1/portfolio/')
+                    started = time.perf_counter()
+                    results[name] = measure(lambda: client.get('/api/v1/portfolio/'),
+                                            options['requests'], setup=None)
+                    elapsed = time.perf_counter() - started
+                results[name]['requests_per_second'] = round(options['requests'] / elapsed, 1)
+        results['speedup'] = round(results['cached_basic']['requests_per_second'] /
+                                   results['basic']['requests_per_second'], 1)
+        write_report({'vendor': connection.vendor, 'requests': options['requests'],
+                      'results': results}, options['output'], self.stdout)
@@ -0,0 +1,196 @@
+"""
+    Latency, throughput and query counts of every api endpoint under concurrent load
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from currency_exchange.management.commands._bench import BenchmarkDatabase, KNOWN_CURRENCIES, \
+    currency_codes, percentile, seed_currency_rates, seed_operations, write_report
+from currency_exchange.models import UsersExchangeOperations
+from currency_exchange.portfolio import rebuild_portfolios
+
+PASSWORD = 'benchmark-password'
+
+
+def endpoint_cases(users: list, deletable: dict, currencies: list) -> dict:
+    """
+    Requests of every endpoint. Every case is called with a client authenticated by JWT
+    of the user, the user and the number of the request.
+    :param users: seeded users
+    :param deletable: mapping user id -> ids of operations which may be deleted
+    :param currencies: seeded currency codes
+    :return: mapping name -> callable
+    """
+    today = date.today()
+    year_ago = str(today - timedelta(days=365))
+    conversion = {'from_currency': 'USD', 'to_currency': 'EUR', 'amount': '100'}
+    refresh_tokens = {user.pk: str(RefreshToken.for_user(user)) for user in users}
+    access_tokens = {user.pk: str(RefreshToken.for_user(user).access_token) for user in users}
+    batch = [{'count': number + 1, 'currency': currencies[number % min(len(currencies), 5)]}
+             for number in range(50)]
+
+    def export(client, user, number):
+        response = client.get('/api/v1/rates/export/', {'day_of_rate_gte': year_ago,
+                                                         'to_currency': 'USD'})
+        b''.join(response.streaming_content)
+        return response
+
+    return {
+        'rates_list': lambda client, user, number: client.get('/api/v1/rates/'),
+        'rates_filtered': lambda client, user, number: client.get(
+            '/api/v1/rates/', {'to_currency': 'EUR', 'day_of_rate_gte': year_ago}),
+        'rates_keyset': lambda client, user, number: client.get(
+            '/api/v1/rates/', {'cursor': '', 'limit': 50}),
+        'rates_export': export,
+        'rates_latest': lambda client, user, number: client.get('/api/v1/rates/latest/'),
+        'currency_statistics': lambda client, user, number: client.get(
+            '/api/v1/currency_statistics/'),
+        'currency_analytics': lambda client, user, number: client.get(
+            '/api/v1/currency_analytics/', {'day_of_rate_gte': year_ago}),
+        'currency_candles': lambda client, user, number: client.get(
+            '/api/v1/currency_candles/', {'bucket': 'week'}),
+        'convert': lambda client, user, number: client.get('/api/v1/convert/', conversion),
+        'convert_batch': lambda client, user, number: client.post(
+            '/api/v1/convert/', {'items': [conversion] * 100}, content_type='application/json'),
+        'async_rates_list': lambda client, user, number: client.get('/api/v1/async/rates/'),
+        'async_rates_latest': lambda client, user, number: client.get(
+            '/api/v1/async/rates/latest/'),
+        'async_currency_statistics': lambda client, user, number: client.get(
+            '/api/v1/async/currency_statistics/'),
+        'portfolio': lambda client, user, number: client.get('/api/v1/portfolio/'),
+        'users_exchange_list': lambda client, user, number: client.get('/api/v1/users_exchange/'),
+        'users_exchange_create': lambda client, user, number: client.post(
+            '/api/v1/users_exchange/', {'count': 10, 'currency': 'USD'},
+            content_type='application/json'),
+        'users_exchange_batch': lambda client, user, number: client.post(
+            '/api/v1/users_exchange/batch/', batch, content_type='application/json'),
+        'users_exchange_delete': lambda client, user, number: client.delete(
+            f'/api/v1/users_exchange/{deletable[user.pk].pop()}/'),
+        'retrieve_user': lambda client, user, number: client.get(
+            f'/api/v1/retrieve_update_user/{user.username}/'),
+        'create_user': lambda client, user, number: client.post(
+            '/api/v1/create_user/', {'username': f'new-{user.pk}-{number}',
+                                     'email': 'new@example.com', 'password': PASSWORD},
+            content_type='application/json'),
+        'change_password': lambda client, user, number: client.put(
+            '/api/v1/change_password/', {'old_password': PASSWORD, 'password': PASSWORD,
+                                         'confirmed_password': PASSWORD},
+            content_type='application/json'),
+        'token_obtain': lambda client, user, number: Client().post(
+            '/api/token/', {'username': user.username, 'password': PASSWORD},
+            content_type='application/json'),
+        'token_refresh': lambda client, user, number: Client().post(
+            '/api/token/refresh/', {'refresh': refresh_tokens[user.pk]},
+            content_type='application/json'),
+        'token_verify': lambda client, user, number: Client().post(
+            '/api/token/verify/', {'token': access_tokens[user.pk]},
+            content_type='application/json'),
+    }
+
+
+def run_endpoint(case, users: list, requests: int, concurrency: int) -> dict:
+    """
+    Send requests from concurrent clients, every client works in its own thread with
+    its own connection and is authenticated as one of the users. Only queries of the client
+    thread are counted, async endpoints run their queries in a thread pool. Concurrent
+    writes may fail with locked database on sqlite, failures are reported by type.
+    :param case: callable which sends one request
+    :param users: users of clients
+    :param requests: total number of requests
+    :param concurrency: number of clients
+    :return: measurements
+    """
+    def client_worker(worker: int) -> list:
+        user = users[worker % len(users)]
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        calls = []
+        try:
+            for number in range(worker, requests, concurrency):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    try:
+                        status_code = case(client, user, number).status_code
+                    except Exception as exc:  # pylint: disable=broad-except
+                        status_code = type(exc).__name__
+                    calls.append(((time.perf_counter() - started) * 1000, status_code,
+                                  len(context.captured_queries)))
+        finally:
+            connections.close_all()
+        return calls
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        calls = [call for worker_calls in executor.map(client_worker, range(concurrency))
+                 for call in worker_calls]
+    elapsed = time.perf_counter() - started
+
+    timings = [timing for timing, status_code, _ in calls
+               if isinstance(status_code, int) and status_code < 400]
+    statuses = {}
+    for _, status_code, _ in calls:
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+    queries = [count for _, _, count in calls]
+    result = {'requests': len(calls), 'statuses': statuses, 'seconds': round(elapsed, 3),
+              'requests_per_second': round(len(timings) / elapsed, 1),
+              'queries_per_request': round(sum(queries) / len(queries), 2),
+              'max_queries': max(queries)}
+    if timings:
+        result.update({f'p{rank}_ms': round(percentile(timings, rank), 3)
+                       for rank in (50, 95, 99)})
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and drive every api endpoint and JWT token endpoint ' \
+           'in process from concurrent clients. Reports latency percentiles, throughput ' \
+           'and sql queries per endpoint as json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=3, help='Years of daily history')
+        parser.add_argument('--currencies', type=int, default=len(KNOWN_CURRENCIES),
+                            help='Number of currencies')
+        parser.add_argument('--users', type=int, default=10, help='Number of users')
+        parser.add_argument('--operations', type=int, default=1000,
+                            help='Number of operations of every user')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Clients sending requests at the same time')
+        parser.add_argument('--endpoint', action='append', default=[],
+                            choices=list(endpoint_cases([], {}, KNOWN_CURRENCIES)),
+                            help='Name of measured endpoint, may be repeated. All by default')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        with BenchmarkDatabase():
+            rows = seed_currency_rates(options['years'], options['currencies'])
+            password = make_password(PASSWORD)
+            User.objects.bulk_create([User(username=f'benchmark-{number}', password=password)
+                                      for number in range(options['users'])])
+            users = list(User.objects.filter(username__startswith='benchmark-').order_by('id'))
+            for user in users:
+                seed_operations(user, options['operations'])
+            rebuild_portfolios()
+            deletable = {user.pk: list(UsersExchangeOperations.objects.filter(user=user)
+                                       .values_list('id', flat=True))
+                         for user in users}
+
+            cases = endpoint_cases(users, deletable, currency_codes(options['currencies']))
+            names = options['endpoint'] or list(cases)
+            results = {}
+            for name in names:
+                self.stderr.write(f'Measure {name}')
+                results[name] = run_endpoint(cases[name], users, options['requests'],
+                                             options['concurrency'])
+        write_report({'vendor': connection.vendor, 'rates': rows, 'users': options['users'],
+                      'operations': options['operations'], 'requests': options['requests'],
+                      'concurrency': options['concurrency'], 'results': results},
+                     options['output'], self.stdout)
@@ -0,0 +1,62 @@
+"""
+    Benchmark of deep pages with offset and keyset pagination
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from currency_exchange.management.commands._bench import BenchmarkDatabase, measure, \
+    seed_currency_rates, seed_operations, write_report
+from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+from currency_exchange.pagination import OperationsPagination, RatesPagination
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and compare latency of a deep page of rates ' \
+           'and users operations under offset and keyset pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10, help='Years of daily history')
+        parser.add_argument('--currencies', type=int, default=30, help='Number of currencies')
+        parser.add_argument('--operations', type=int, default=100000,
+                            help='Number of operations of one user')
+        parser.add_argument('--page', type=int, default=1000, help='Measured page number')
+        parser.add_argument('--limit', type=int, default=10, help='Page size')
+        parser.add_argument('--repeat', type=int, default=5, help='Calls per case')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        with BenchmarkDatabase():
+            rows = seed_currency_rates(options['years'], options['currencies'])
+            user = User.objects.create(username='benchmark')
+            seed_operations(user, options['operations'])
+            client = Client()
+            client.force_login(user)
+
+            offset = (options['page'] - 1) * options['limit']
+            rates_position = list(CurrencyRates.objects.order_by(*RatesPagination.ordering)
+                                  .values_list(*RatesPagination.ordering)[offset - 1])
+            operations_position = list(UsersExchangeOperations.objects.filter(user=user)
+                                       .order_by(*OperationsPagination.ordering)
+                                       .values_list(*OperationsPagination.ordering)[offset - 1])
+            operations_url = reverse('users_exchange-list')
+            limit = options['limit']
+            cases = {
+                'rates_offset': lambda: client.get(
+                    '/api/v1/rates/', {'limit': limit, 'offset': offset}),
+                'rates_keyset': lambda: client.get(
+                    '/api/v1/rates/', {'limit': limit, 'cursor': RatesPagination()
+                                       .encode_cursor(rates_position)}),
+                'operations_offset': lambda: client.get(
+                    operations_url, {'limit': limit, 'offset': offset}),
+                'operations_keyset': lambda: client.get(
+                    operations_url, {'limit': limit, 'cursor': OperationsPagination()
+                                     .encode_cursor(operations_position)}),
+            }
+            results = {name: measure(case, options['repeat']) for name, case in cases.items()}
+        write_report({'vendor': connection.vendor, 'rates': rows,
+                      'operations': options['operations'], 'page': options['page'],
+                      'limit': limit, 'results': results}, options['output'], self.stdout)
@@ -0,0 +1,74 @@
+"""
+    Benchmark of currency rates query paths with and without indexes
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from currency_exchange.management.commands._bench import BenchmarkDatabase, measure, \
+    seed_currency_rates, write_report
+from currency_exchange.models import CurrencyRates
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database with rates and record query plans and timings ' \
+           'of rates endpoints before and after adding indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10, help='Years of daily history')
+        parser.add_argument('--currencies', type=int, default=300,
+                            help='Number of currencies. 10 years x 300 currencies '
+                                 'is about 1.1 million rows')
+        parser.add_argument('--repeat', type=int, default=5, help='Calls per endpoint')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        with BenchmarkDatabase():
+            rows = seed_currency_rates(options['years'], options['currencies'])
+            self.stderr.write(f'Seeded {rows} rows')
+            after = self.run_cases(options['repeat'])
+            self.drop_indexes()
+            before = self.run_cases(options['repeat'])
+        write_report({'vendor': connection.vendor, 'rows': rows,
+                      'before': before, 'after': after}, options['output'], self.stdout)
+
+    @staticmethod
+    def run_cases(repeat: int) -> dict:
+        """
+        Measure every endpoint which reads currency rates
+        :param repeat: calls per endpoint
+        :return: measurements by case name
+        """
+        client = Client()
+        today = date.today()
+        year_ago = today - timedelta(days=365)
+        cases = {
+            'rates_by_currency_and_range': lambda: client.get(
+                '/api/v1/rates/', {'to_currency': 'USD', 'day_of_rate_gte': year_ago,
+                                   'day_of_rate_lte': today}),
+            'rates_by_day': lambda: client.get('/api/v1/rates/', {'day_of_rate': today}),
+            'rates_by_range': lambda: client.get(
+                '/api/v1/rates/', {'day_of_rate_gte': year_ago, 'day_of_rate_lte': today}),
+            'currency_statistics': lambda: client.generic(
+                'GET', '/api/v1/currency_statistics/',
+                f'{{"date_filter_gte": "{year_ago}", "date_filter_lte": "{today}"}}',
+                content_type='application/json'),
+            'ingest_day_lookup': lambda: list(CurrencyRates.objects.filter(
+                from_currency='UAH', to_currency__in=['USD', 'EUR', 'PLN'], day_of_rate__in=[today])),
+        }
+        return {name: measure(case, repeat) for name, case in cases.items()}
+
+    @staticmethod
+    def drop_indexes() -> None:
+        """
+        Remove indexes and unique constraint of currency rates
+        """
+        meta = CurrencyRates._meta
+        with connection.schema_editor() as editor:
+            # SQLite rebuilds the table to drop a constraint, so indexes go last
+            for constraint in meta.constraints:
+                editor.remove_constraint(CurrencyRates, constraint)
+            for index in meta.indexes:
+                editor.remove_index(CurrencyRates, index)
@@ -0,0 +1,56 @@
+"""
+    Benchmark of rendering a large listing of rates with the serializer and the fast path
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from currency_exchange.encoders import OrjsonRenderer, rates_row_encoder
+from currency_exchange.management.commands._bench import BenchmarkDatabase, measure, \
+    seed_currency_rates, write_report
+from currency_exchange.models import CurrencyRates
+from currency_exchange.serializers import CurrencyRatesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and compare rendering of rates by the model serializer ' \
+           'with JSONRenderer and by values_list rows with the row encoder and orjson. ' \
+           'Fails if outputs differ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows in the listing')
+        parser.add_argument('--currencies', type=int, default=20, help='Number of currencies')
+        parser.add_argument('--repeat', type=int, default=20, help='Calls per case')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with BenchmarkDatabase():
+            years = rows // (365 * options['currencies']) + 1
+            seeded = seed_currency_rates(years, options['currencies'])
+            rates = CurrencyRates.objects.order_by('id')
+            tuples = rates.values_list(*rates_row_encoder.sources)
+            cases = {
+                'serializer': lambda: JSONRenderer().render(
+                    CurrencyRatesSerializer(rates[:rows], many=True).data),
+                'row_encoder': lambda: JSONRenderer().render(
+                    rates_row_encoder.encode_many(tuples[:rows])),
+                'row_encoder_orjson': lambda: OrjsonRenderer().render(
+                    rates_row_encoder.encode_many(tuples[:rows])),
+            }
+            # the same work on rows read beforehand, without the time of the query
+            instances, values = list(rates[:rows]), list(tuples[:rows])
+            cases.update({
+                'serializer_without_query': lambda: JSONRenderer().render(
+                    CurrencyRatesSerializer(instances, many=True).data),
+                'row_encoder_orjson_without_query': lambda: OrjsonRenderer().render(
+                    rates_row_encoder.encode_many(values)),
+            })
+            outputs = {name: case() for name, case in cases.items()}
+            if len(set(outputs.values())) != 1:
+                raise CommandError('Outputs of cases differ')
+            results = {name: measure(case, options['repeat'], setup=None)
+                       for name, case in cases.items()}
+        write_report({'vendor': connection.vendor, 'rates': seeded, 'rows': rows,
+                      'bytes': len(outputs['serializer']), 'results': results},
+                     options['output'], self.stdout)
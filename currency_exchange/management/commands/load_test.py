@@ -0,0 +1,105 @@
+"""
+    Load test of running servers with many concurrent and slow clients
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from currency_exchange.management.commands._bench import percentile, write_report
+
+
+async def fetch(url: str, slow: float, timeout: float) -> int:
+    """
+    Send one GET request over a new connection. Slow client sends the request line and
+    waits before sending the headers
+    :param url: full url
+    :param slow: seconds between request line and headers
+    :param timeout: seconds to wait for the whole response
+    :return: status code of the response
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\n'.encode())
+        await writer.drain()
+        if slow:
+            await asyncio.sleep(slow)
+        writer.write(f'Host: {parts.netloc}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def run_load(url: str, requests: int, concurrency: int, slow: float,
+                   timeout: float) -> dict:
+    """
+    Send requests from concurrent clients and collect latency and throughput
+    :param url: full url
+    :param requests: total number of requests
+    :param concurrency: number of clients sending requests at the same time
+    :param slow: seconds every client waits in the middle of the request
+    :param timeout: seconds to wait for one response
+    :return: measurements
+    """
+    timings, errors = [], {}
+    limit = asyncio.Semaphore(concurrency)
+
+    async def client():
+        async with limit:
+            started = time.perf_counter()
+            try:
+                status_code = await fetch(url, slow, timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError) as exc:
+                status_code = type(exc).__name__
+            if status_code == 200:
+                timings.append((time.perf_counter() - started) * 1000)
+            else:
+                errors[str(status_code)] = errors.get(str(status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    result = {'ok': len(timings), 'errors': errors, 'seconds': round(elapsed, 3),
+              'requests_per_second': round(len(timings) / elapsed, 1)}
+    if timings:
+        result.update({f'p{rank}_ms': round(percentile(timings, rank), 3)
+                       for rank in (50, 95, 99)})
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Send concurrent GET requests to running servers, for example the sync WSGI ' \
+           'and async ASGI versions of an endpoint, and compare latency and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True,
+                            help='name=url of a tested endpoint, may be repeated')
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per target')
+        parser.add_argument('--concurrency', type=int, default=1000,
+                            help='Clients sending requests at the same time')
+        parser.add_argument('--slow', type=float, default=0,
+                            help='Seconds every client waits in the middle of its request')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait for one response')
+        parser.add_argument('--output', default='', help='Path to json report')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url.startswith('http://'):
+                raise CommandError(f'Target must look like name=http://host:port/path: {target}')
+            targets.append((name, url))
+
+        results = {name: asyncio.run(run_load(url, options['requests'], options['concurrency'],
+                                              options['slow'], options['timeout']))
+                   for name, url in targets}
+        write_report({'requests': options['requests'], 'concurrency': options['concurrency'],
+                      'slow': options['slow'], 'results': results},
+                     options['output'], self.stdout)
@@ -0,0 +1,20 @@
+"""
+    Check and rebuild portfolios of users from their exchange operations
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from currency_exchange.portfolio import rebuild_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Drop portfolios of users and aggregate them again from all exchange operations, ' \
+           'reporting how many stored portfolios did not match operations'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = rebuild_portfolios()
+        style = self.style.WARNING if counts['mismatched'] else self.style.SUCCESS
+        self.stdout.write(style(f'Created {counts["created"]} portfolios, '
+                                f'{counts["mismatched"]} did not match operations'))
@@ -0,0 +1,17 @@
+"""
+    Rebuild monthly and yearly rollups of currency rates
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from currency_exchange.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Drop rollups of currency rates and aggregate them again from all rates'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Created {created} rollups'))
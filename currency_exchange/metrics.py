@@ -0,0 +1,161 @@
+"""
+    Prometheus metrics of requests: latency, sql queries and response size per route,
+    of response caches: hits and misses per namespace
+    and of rate sources: fetch outcomes and latency per source
+"""
+import asyncio
+import contextvars
+import glob
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, \
+    Histogram, generate_latest, multiprocess
+from prometheus_client.multiprocess import MultiProcessCollector
+
+UNRESOLVED_ROUTE = '<unresolved>'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latency of requests', ['route', 'method', 'status'])
+REQUEST_QUERIES = Histogram(
+    'http_request_sql_queries', 'Number of sql queries of a request', ['route', 'method'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, float('inf')))
+REQUEST_SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Time of sql queries of a request', ['route', 'method'])
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of response content', ['route', 'method'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float('inf')))
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    'response_cache_lookups', 'Lookups of response caches by result: hit or miss',
+    ['namespace', 'result'])
+
+RATE_SOURCE_FETCHES = Counter(
+    'rate_source_fetches', 'Fetches of rate sources by outcome: ok, failed or skipped',
+    ['source', 'outcome'])
+RATE_SOURCE_LATENCY = Histogram(
+    'rate_source_fetch_duration_seconds', 'Latency of rate source fetches', ['source'])
+
+
+class RequestStats:
+    """
+    Queries of one request. Shared by threads which run queries of the request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self.lock:
+            self.queries += 1
+            self.seconds += seconds
+
+
+# context variables follow the request into threads of sync_to_async
+current_stats = contextvars.ContextVar('current_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of db connections which adds queries to stats of the current request
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(time.perf_counter() - started)
+
+
+def get_route(request) -> str:
+    """
+    Url pattern of the resolved view, keeps number of label values small
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED_ROUTE
+    return match.route.replace('^', '').replace('$', '')
+
+
+def observe(request, response, stats: RequestStats, started: float) -> None:
+    route, method = get_route(request), request.method
+    REQUEST_LATENCY.labels(route, method, response.status_code).observe(
+        time.perf_counter() - started)
+    REQUEST_QUERIES.labels(route, method).observe(stats.queries)
+    REQUEST_SQL_TIME.labels(route, method).observe(stats.seconds)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(route, method).observe(len(response.content))
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Record metrics of every request. Works without adaptation under WSGI and ASGI
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, started = RequestStats(), time.perf_counter()
+            token = current_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                current_stats.reset(token)
+            observe(request, response, stats, started)
+            return response
+    else:
+        def middleware(request):
+            stats, started = RequestStats(), time.perf_counter()
+            token = current_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                current_stats.reset(token)
+            observe(request, response, stats, started)
+            return response
+    return middleware
+
+
+class MultiProcessRootCollector:
+    """
+    Collector of metrics written by processes of several services, e.g. rate sources
+    fetched by celery and requests served by web workers. Every service writes to its own
+    PROMETHEUS_MULTIPROC_DIR under the root, so pids of different containers don't clash.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def collect(self):
+        return MultiProcessCollector.merge(glob.glob(os.path.join(self.root, '*', '*.db')))
+
+
+def get_registry():
+    """
+    Registry of this process, or collector of all processes of all services when
+    PROMETHEUS_MULTIPROC_ROOT setting is set, or of all worker processes of this service
+    when PROMETHEUS_MULTIPROC_DIR is set
+    """
+    if settings.PROMETHEUS_MULTIPROC_ROOT:
+        registry = CollectorRegistry()
+        registry.register(MultiProcessRootCollector(settings.PROMETHEUS_MULTIPROC_ROOT))
+        return registry
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Expose metrics in Prometheus text format
+    """
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
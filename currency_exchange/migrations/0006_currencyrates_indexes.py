@@ -0,0 +1,53 @@
+# Generated by Django 3.2.6 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_rates(apps, schema_editor):
+    """
+    Keep the latest row for every currency and day before adding the unique constraint.
+    Operations pointing to a removed duplicate are moved to the kept row.
+    """
+    CurrencyRates = apps.get_model('currency_exchange', 'CurrencyRates')
+    UsersExchangeOperations = apps.get_model('currency_exchange', 'UsersExchangeOperations')
+    duplicates = (CurrencyRates.objects
+                  .values('from_currency', 'to_currency', 'day_of_rate')
+                  .annotate(rows=Count('id'), keep_id=Max('id'))
+                  .filter(rows__gt=1))
+    for duplicate in duplicates:
+        stale = (CurrencyRates.objects
+                 .filter(from_currency=duplicate['from_currency'],
+                         to_currency=duplicate['to_currency'],
+                         day_of_rate=duplicate['day_of_rate'])
+                 .exclude(id=duplicate['keep_id']))
+        UsersExchangeOperations.objects.filter(currency__in=stale) \
+            .update(currency_id=duplicate['keep_id'])
+        stale.delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # checks of deferred foreign keys would still be pending when the constraint alters
+        # the table in the same transaction
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0005_usersexchangeoperations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='currencyrates',
+            index=models.Index(fields=['to_currency', 'day_of_rate'], include=('sale_rate', 'purchase_rate'), name='rates_currency_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='currencyrates',
+            index=models.Index(fields=['day_of_rate'], name='rates_day_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_rates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='currencyrates',
+            constraint=models.UniqueConstraint(fields=('from_currency', 'to_currency', 'day_of_rate'), name='unique_currency_rate_per_day'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.6 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    """
+    Aggregate rates stored before rollups existed. Uses historical models only,
+    so later changes of currency_exchange.rollups don't change this migration.
+    """
+    CurrencyRates = apps.get_model('currency_exchange', 'CurrencyRates')
+    CurrencyRatesRollup = apps.get_model('currency_exchange', 'CurrencyRatesRollup')
+
+    periods = {'month': {}, 'year': {}}
+    rows = (CurrencyRates.objects.order_by('to_currency', 'day_of_rate')
+            .values_list('to_currency', 'day_of_rate', 'sale_rate')
+            .iterator(chunk_size=10000))
+    for currency, day, rate in rows:
+        month, year = day.replace(day=1), day.replace(month=1, day=1)
+        for period, start in (('month', month), ('year', year)):
+            rollup = periods[period].get((currency, start))
+            if rollup is None:
+                periods[period][(currency, start)] = {
+                    'min_rate': rate, 'max_rate': rate, 'first_rate': rate, 'last_rate': rate,
+                    'first_day': day, 'last_day': day, 'count': 1,
+                }
+                continue
+            rollup['min_rate'] = min(rollup['min_rate'], rate)
+            rollup['max_rate'] = max(rollup['max_rate'], rate)
+            rollup['last_rate'], rollup['last_day'] = rate, day
+            rollup['count'] += 1
+
+    CurrencyRatesRollup.objects.bulk_create(
+        [CurrencyRatesRollup(to_currency=currency, period=period, period_start=start, **fields)
+         for period, rollups in periods.items()
+         for (currency, start), fields in rollups.items()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0007_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRatesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_currency', models.CharField(max_length=20)),
+                ('period', models.CharField(choices=[('month', 'Month'), ('year', 'Year')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('min_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('max_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('first_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('last_rate', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('first_day', models.DateField()),
+                ('last_day', models.DateField()),
+                ('count', models.IntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='currencyratesrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'to_currency'), name='unique_rollup_per_period'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
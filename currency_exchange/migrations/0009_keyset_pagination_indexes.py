@@ -0,0 +1,25 @@
+# Generated by Django 3.2.6 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0008_currencyratesrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='currencyrates',
+            name='rates_day_idx',
+        ),
+        migrations.AddIndex(
+            model_name='currencyrates',
+            index=models.Index(fields=['day_of_rate', 'id'], name='rates_day_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersexchangeoperations',
+            index=models.Index(fields=['user', 'id'], name='operations_user_id_idx'),
+        ),
+    ]
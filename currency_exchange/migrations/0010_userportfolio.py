@@ -0,0 +1,52 @@
+# Generated by Django 3.2.6 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from django.db.models import Count, F, Sum
+
+
+def build_portfolios(apps, schema_editor):
+    """
+    Aggregate operations stored before portfolios existed
+    """
+    operations = apps.get_model('currency_exchange', 'UsersExchangeOperations')
+    portfolio = apps.get_model('currency_exchange', 'UserPortfolio')
+    portfolio.objects.bulk_create(
+        [portfolio(user_id=row['user'], to_currency=row['currency__to_currency'],
+                   count=row['total_count'], value=row['total_value'],
+                   operations=row['total_operations'])
+         for row in operations.objects.filter(user__isnull=False, currency__isnull=False)
+         .values('user', 'currency__to_currency')
+         .annotate(total_count=Sum('count'), total_value=Sum(F('count') * F('currency__sale_rate')),
+                   total_operations=Count('id'))
+         .order_by()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('currency_exchange', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPortfolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_currency', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('operations', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userportfolio',
+            constraint=models.UniqueConstraint(fields=('user', 'to_currency'), name='unique_portfolio_per_currency'),
+        ),
+        migrations.RunPython(build_portfolios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.6 on 2026-10-18 17:03
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def copy_rates(apps, schema_editor):
+    """
+    Copy currency and sale rate of existing operations from their rates
+    """
+    operations = apps.get_model('currency_exchange', 'UsersExchangeOperations')
+    rates = apps.get_model('currency_exchange', 'CurrencyRates').objects.filter(pk=OuterRef('currency_id'))
+    operations.objects.filter(currency__isnull=False).update(
+        to_currency=Subquery(rates.values('to_currency')[:1]),
+        rate=Subquery(rates.values('sale_rate')[:1]))
+    operations.objects.filter(rate__isnull=False).update(amount=F('count') * F('rate'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0010_userportfolio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersexchangeoperations',
+            name='amount',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersexchangeoperations',
+            name='rate',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='usersexchangeoperations',
+            name='to_currency',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.RunPython(copy_rates, migrations.RunPython.noop),
+    ]
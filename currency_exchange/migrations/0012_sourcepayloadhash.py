@@ -0,0 +1,27 @@
+# Generated by Django 3.2.6 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0011_operations_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourcePayloadHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('digest', models.CharField(max_length=64)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sourcepayloadhash',
+            constraint=models.UniqueConstraint(fields=('source', 'day'), name='unique_source_payload_day'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('currency_exchange', '0012_sourcepayloadhash'),
+    ]
+
+    operations = [
+        # Rates before several sources were all loaded from PrivatBank
+        migrations.AddField(
+            model_name='currencyrates',
+            name='source',
+            field=models.CharField(blank=True, default='privatbank', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='currencyrates',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -1,6 +1,7 @@
 """
     Collect django models for app currency exchange
 """
+from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.db import models
@@ -17,6 +18,22 @@ class CurrencyRates(models.Model):
     day_of_rate = models.DateField(default=date.today)
     sale_rate = models.DecimalField(max_digits=6, decimal_places=4)
     purchase_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    # Name of the rate source which wrote the rate, empty for rates added by hand
+    source = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_currency', 'to_currency', 'day_of_rate'],
+                                    name='unique_currency_rate_per_day'),
+        ]
+        indexes = [
+            # Filtering by currency with a date range and the statistics group by
+            models.Index(fields=['to_currency', 'day_of_rate'],
+                         include=['sale_rate', 'purchase_rate'],
+                         name='rates_currency_day_idx'),
+            # Filtering by a single day or a date range over all currencies and keyset pages
+            models.Index(fields=['day_of_rate', 'id'], name='rates_day_id_idx'),
+        ]
 
     def __str__(self):
         """
@@ -36,6 +53,36 @@ class UsersExchangeOperations(models.Model):
     count = models.IntegerField('Count_exchange', blank=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True,
                              related_name='exchanges')
+    # Rate of the operation is copied from the currency rate, so amounts survive
+    # deleted rates and listing doesn't join rates
+    to_currency = models.CharField(max_length=20, blank=True, default='')
+    rate = models.DecimalField(max_digits=6, decimal_places=4, null=True, blank=True)
+    amount = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of user operations
+            models.Index(fields=['user', 'id'], name='operations_user_id_idx'),
+        ]
+
+    def set_rate(self) -> None:
+        """
+        Copy currency and sale rate from the currency rate and calculate amount
+        :return:
+        """
+        if self.currency is not None and self.rate is None:
+            self.to_currency = self.currency.to_currency
+            self.rate = self.currency.sale_rate
+        if self.rate is not None:
+            self.amount = self.count * Decimal(self.rate)
+
+    def save(self, *args, **kwargs):
+        """
+        Save operation with its rate and amount
+        :return:
+        """
+        self.set_rate()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -43,3 +90,102 @@ class UsersExchangeOperations(models.Model):
         :return: str
         """
         return f'Rate: {self.id}:{self.currency}:{self.count}={self.user}:'
+
+
+class IngestCheckpoint(models.Model):
+    """
+    Model look for progress of long running rates ingestion, like archive backfill
+    """
+    name = models.CharField(max_length=100, unique=True)
+    day = models.DateField(null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        Representation of model
+        :return: str
+        """
+        return f'Checkpoint: {self.name}:{self.day}'
+
+
+class SourcePayloadHash(models.Model):
+    """
+    Model look for hash of the last rates of a source for a day, lets polling skip
+    unchanged payloads without touching the rates
+    """
+    source = models.CharField(max_length=50)
+    day = models.DateField()
+    digest = models.CharField(max_length=64)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'day'], name='unique_source_payload_day'),
+        ]
+
+    def __str__(self):
+        """
+        Representation of model
+        :return: str
+        """
+        return f'Payload: {self.source}:{self.day}:{self.digest[:12]}'
+
+
+class CurrencyRatesRollup(models.Model):
+    """
+    Model look for sale rate aggregates of a currency during a month or a year.
+    Daily values are the rows of CurrencyRates itself.
+    """
+    MONTH = 'month'
+    YEAR = 'year'
+    PERIODS = [(MONTH, 'Month'), (YEAR, 'Year')]
+
+    to_currency = models.CharField(max_length=20)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    min_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    max_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    first_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    last_rate = models.DecimalField(max_digits=6, decimal_places=4)
+    first_day = models.DateField()
+    last_day = models.DateField()
+    count = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'to_currency'],
+                                    name='unique_rollup_per_period'),
+        ]
+
+    def __str__(self):
+        """
+        Representation of model
+        :return: str
+        """
+        return f'Rollup:{self.to_currency}:{self.period}:{self.period_start}=' \
+               f'{self.min_rate}:{self.max_rate}'
+
+
+class UserPortfolio(models.Model):
+    """
+    Model look for totals of user exchange operations in one currency. Kept in sync
+    with operations on create and delete, rebuilt by rebuild_portfolios command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolio')
+    to_currency = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    operations = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'to_currency'],
+                                    name='unique_portfolio_per_currency'),
+        ]
+
+    def __str__(self):
+        """
+        Representation of model
+        :return: str
+        """
+        return f'Portfolio:{self.user_id}:{self.to_currency}={self.count}:{self.value}'
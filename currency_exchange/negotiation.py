@@ -0,0 +1,18 @@
+"""
+    Collect content negotiations for app currency exchange
+"""
+
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Negotiation for views which build their own response, like file exports.
+    Accept header of the client doesn't matter for them.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
@@ -0,0 +1,156 @@
+"""
+    Collect all paginations for app currency exchange
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Keyset pagination over unique ordering with opaque cursors. Every page is an indexed
+    range scan, so deep pages cost the same as the first one. The total count is only
+    calculated on request with `with_count=true`.
+    Requests without `cursor` parameter keep limit offset pagination.
+    Pass an empty `cursor` to get the first page.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    keyset = False
+    next_position = None
+    # names of values in rows of values_list querysets
+    row_fields = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.ordering)
+        with_count = request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+        self.count = queryset.count() if with_count else None
+
+        position = self.decode_cursor(request, queryset.model)
+        if position:
+            queryset = queryset.filter(self.after(position))
+        page = list(queryset[:self.limit + 1])
+        self.next_position = self.get_position(page[self.limit - 1]) \
+            if len(page) > self.limit else None
+        return page[:self.limit]
+
+    def after(self, position: list, ordering: tuple = None) -> Q:
+        """
+        Filter rows which follow the position in ordering. The leading `>=` condition
+        lets the database start an index range scan right at the position.
+        :param position: values of ordering fields of the last row on previous page
+        :param ordering: ordering fields, pagination ordering by default
+        :return: filter
+        """
+        field, *rest = ordering or self.ordering
+        if not rest:
+            return Q(**{f'{field}__gt': position[0]})
+        return Q(**{f'{field}__gte': position[0]}) & (
+            Q(**{f'{field}__gt': position[0]}) | self.after(position[1:], rest))
+
+    def get_position(self, row) -> list:
+        """
+        Values of ordering fields of the row. Row may be a model instance, a dict
+        or a tuple of values of row_fields
+        """
+        if isinstance(row, dict):
+            return [row[field] for field in self.ordering]
+        if isinstance(row, tuple):
+            return [row[self.row_fields.index(field)] for field in self.ordering]
+        return [getattr(row, field) for field in self.ordering]
+
+    def encode_cursor(self, position: list) -> str:
+        data = json.dumps([str(value) for value in position]).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request, model) -> list:
+        """
+        Position from cursor parameter, every value is converted by its ordering field
+        :param request: request
+        :param model: model of paginated queryset
+        :return: values of ordering fields, empty for the first page
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return []
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [model._meta.get_field(field).to_python(value)
+                        for field, value in zip(self.ordering, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        content = OrderedDict([('next', self.get_next_link()), ('results', data)])
+        if self.count is not None:
+            content['count'] = self.count
+            content.move_to_end('count', last=False)
+        return Response(content)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor of keyset pagination. Empty value for the first page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Add total count to keyset pagination response',
+                'schema': {'type': 'boolean'},
+            },
+        ]
+        return parameters
+
+
+class RatesPagination(KeysetPagination):
+    """
+    Pagination of currency rates, keyset mode follows days
+    """
+    ordering = ('day_of_rate', 'id')
+
+
+class OperationsPagination(KeysetPagination):
+    """
+    Pagination of users exchange operations
+    """
+    ordering = ('id',)
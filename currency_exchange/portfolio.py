@@ -0,0 +1,93 @@
+"""
+    Per user and currency totals of exchange operations
+"""
+from decimal import Decimal
+from typing import Iterable
+
+from django.db.models import Count, Sum
+
+from currency_exchange.models import UserPortfolio, UsersExchangeOperations
+
+
+def operations_totals(operations: Iterable) -> dict:
+    """
+    Sum operations by currency
+    :param operations: operations with rate and amount set
+    :return: Mapping to_currency -> [count, value, number of operations]
+    """
+    totals = {}
+    for operation in operations:
+        if operation.amount is None:
+            continue
+        total = totals.setdefault(operation.to_currency, [0, Decimal(0), 0])
+        total[0] += operation.count
+        total[1] += operation.amount
+        total[2] += 1
+    return totals
+
+
+def lock_portfolios(user, currencies: list) -> dict:
+    """
+    Select portfolios of the user for update
+    :return: Mapping to_currency -> portfolio
+    """
+    return {portfolio.to_currency: portfolio for portfolio in
+            UserPortfolio.objects.select_for_update()
+            .filter(user=user, to_currency__in=currencies)}
+
+
+def update_portfolio(user, operations: Iterable, sign: int = 1) -> None:
+    """
+    Add created operations to the user portfolio or subtract deleted ones.
+    Must run in the transaction which creates or deletes the operations.
+    :param user: owner of operations
+    :param operations: created or deleted operations
+    :param sign: 1 for created operations, -1 for deleted ones
+    """
+    totals = operations_totals(operations)
+    if not totals:
+        return
+    portfolios = lock_portfolios(user, list(totals))
+    missing = [currency for currency in totals if currency not in portfolios]
+    if missing:
+        # a select locks no rows which don't exist yet, so empty rows are inserted first.
+        # Rows inserted by a concurrent transaction are kept and locked by the second select
+        UserPortfolio.objects.bulk_create([UserPortfolio(user=user, to_currency=currency)
+                                           for currency in missing], ignore_conflicts=True)
+        portfolios.update(lock_portfolios(user, missing))
+    for currency, (count, value, number) in totals.items():
+        portfolio = portfolios[currency]
+        portfolio.count += sign * count
+        portfolio.value += sign * value
+        portfolio.operations += sign * number
+
+    UserPortfolio.objects.bulk_update(list(portfolios.values()),
+                                      ['count', 'value', 'operations'])
+
+
+def rebuild_portfolios() -> dict:
+    """
+    Drop all portfolios and aggregate them again from operations
+    :return: Counts of created portfolios and of stored ones which didn't match operations
+    """
+    totals = {
+        (row['user'], row['to_currency']): (row['total_count'], row['total_value'],
+                                            row['total_operations'])
+        for row in UsersExchangeOperations.objects.filter(user__isnull=False, amount__isnull=False)
+        .values('user', 'to_currency')
+        .annotate(total_count=Sum('count'), total_value=Sum('amount'), total_operations=Count('id'))
+        .order_by()
+    }
+    stored = {(portfolio.user_id, portfolio.to_currency):
+              (portfolio.count, portfolio.value, portfolio.operations)
+              for portfolio in UserPortfolio.objects.all()}
+    mismatched = sum(stored.get(key) != total for key, total in totals.items()) + \
+        sum(key not in totals and any(values) for key, values in stored.items())
+
+    UserPortfolio.objects.all().delete()
+    UserPortfolio.objects.bulk_create(
+        [UserPortfolio(user_id=user, to_currency=currency, count=count, value=value,
+                       operations=number)
+         for (user, currency), (count, value, number) in totals.items()],
+        batch_size=1000)
+    return {'created': len(totals), 'mismatched': mismatched}
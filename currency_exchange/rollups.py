@@ -0,0 +1,167 @@
+"""
+    Monthly and yearly rollups of currency rates and statistics built on them
+"""
+from datetime import date, timedelta
+from typing import Iterable
+
+from django.db.models import Max, Min, Q
+
+from currency_exchange.models import CurrencyRates, CurrencyRatesRollup
+
+MONTH, YEAR = CurrencyRatesRollup.MONTH, CurrencyRatesRollup.YEAR
+
+
+def next_month(day: date) -> date:
+    """
+    First day of the month after the day
+    """
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def aggregate_rows(rows: Iterable) -> dict:
+    """
+    Aggregate daily sale rates by currency and month
+    :param rows: Tuples (to_currency, day_of_rate, sale_rate) ordered by currency and day
+    :return: Mapping (to_currency, month start) -> rollup fields
+    """
+    months = {}
+    for currency, day, rate in rows:
+        rollup = months.get((currency, day.replace(day=1)))
+        if rollup is None:
+            months[(currency, day.replace(day=1))] = {
+                'min_rate': rate, 'max_rate': rate, 'first_rate': rate, 'last_rate': rate,
+                'first_day': day, 'last_day': day, 'count': 1,
+            }
+            continue
+        rollup['min_rate'] = min(rollup['min_rate'], rate)
+        rollup['max_rate'] = max(rollup['max_rate'], rate)
+        rollup['last_rate'], rollup['last_day'] = rate, day
+        rollup['count'] += 1
+    return months
+
+
+def combine_months(months: dict) -> dict:
+    """
+    Aggregate month rollups by currency and year
+    :param months: Mapping (to_currency, month start) -> rollup fields
+    :return: Mapping (to_currency, year start) -> rollup fields
+    """
+    years = {}
+    for (currency, start), month in sorted(months.items()):
+        year = years.get((currency, start.replace(month=1)))
+        if year is None:
+            years[(currency, start.replace(month=1))] = dict(month)
+            continue
+        year['min_rate'] = min(year['min_rate'], month['min_rate'])
+        year['max_rate'] = max(year['max_rate'], month['max_rate'])
+        year['last_rate'], year['last_day'] = month['last_rate'], month['last_day']
+        year['count'] += month['count']
+    return years
+
+
+def _replace_rollups(period: str, rollups: dict, currencies: set, starts: set) -> None:
+    CurrencyRatesRollup.objects.filter(period=period, to_currency__in=currencies,
+                                       period_start__in=starts).delete()
+    CurrencyRatesRollup.objects.bulk_create(
+        [CurrencyRatesRollup(to_currency=currency, period=period, period_start=start, **fields)
+         for (currency, start), fields in rollups.items()],
+        batch_size=1000)
+
+
+def refresh_rollups(keys: Iterable) -> None:
+    """
+    Recalculate month and year rollups which contain the changed rates.
+    Must run in the transaction which changed the rates.
+    :param keys: Changed rates as tuples (to_currency, day_of_rate)
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    currencies = {currency for currency, _ in keys}
+    months = {day.replace(day=1) for _, day in keys}
+    years = {month.replace(month=1) for month in months}
+
+    rows = (CurrencyRates.objects
+            .filter(to_currency__in=currencies, day_of_rate__gte=min(months),
+                    day_of_rate__lt=next_month(max(months)))
+            .order_by('to_currency', 'day_of_rate')
+            .values_list('to_currency', 'day_of_rate', 'sale_rate'))
+    month_rollups = {key: fields for key, fields in aggregate_rows(rows).items()
+                     if key[1] in months}
+    _replace_rollups(MONTH, month_rollups, currencies, months)
+
+    year_months = {
+        (rollup.to_currency, rollup.period_start): {
+            'min_rate': rollup.min_rate, 'max_rate': rollup.max_rate,
+            'first_rate': rollup.first_rate, 'last_rate': rollup.last_rate,
+            'first_day': rollup.first_day, 'last_day': rollup.last_day, 'count': rollup.count,
+        }
+        for rollup in CurrencyRatesRollup.objects.filter(
+            period=MONTH, to_currency__in=currencies, period_start__gte=min(years),
+            period_start__lte=max(years).replace(month=12))
+        if rollup.period_start.replace(month=1) in years
+    }
+    _replace_rollups(YEAR, combine_months(year_months), currencies, years)
+
+
+def rebuild_rollups() -> int:
+    """
+    Drop all rollups and build them again from rates
+    :return: Number of created rollups
+    """
+    rows = (CurrencyRates.objects.order_by('to_currency', 'day_of_rate')
+            .values_list('to_currency', 'day_of_rate', 'sale_rate')
+            .iterator(chunk_size=10000))
+    months = aggregate_rows(rows)
+    years = combine_months(months)
+    CurrencyRatesRollup.objects.all().delete()
+    _replace_rollups(MONTH, months, set(), set())
+    _replace_rollups(YEAR, years, set(), set())
+    return len(months) + len(years)
+
+
+def currency_statistics(low: date, high: date) -> list:
+    """
+    Min and max sale rate of every currency between two days inclusive.
+    Whole years and months inside the range are read from rollups,
+    only the days of partial months at the edges are read from rates.
+    :param low: First day
+    :param high: Last day
+    :return: List of dicts with to_currency, min, max ordered by currency
+    """
+    first_month = low if low.day == 1 else next_month(low)
+    end_month = next_month(high) if high + timedelta(days=1) == next_month(high) \
+        else high.replace(day=1)
+    rollups_filter = Q(pk__in=[])
+    raw_filter = Q(day_of_rate__range=[low, high])
+
+    if first_month < end_month:
+        first_year = first_month if first_month.month == 1 \
+            else date(first_month.year + 1, 1, 1)
+        end_year = end_month.replace(month=1)
+        if first_year < end_year:
+            rollups_filter |= Q(period=YEAR, period_start__gte=first_year,
+                                period_start__lt=end_year)
+            rollups_filter |= Q(period=MONTH, period_start__gte=first_month,
+                                period_start__lt=first_year)
+            rollups_filter |= Q(period=MONTH, period_start__gte=end_year,
+                                period_start__lt=end_month)
+        else:
+            rollups_filter |= Q(period=MONTH, period_start__gte=first_month,
+                                period_start__lt=end_month)
+        raw_filter = Q(day_of_rate__gte=low, day_of_rate__lt=first_month) | \
+            Q(day_of_rate__gte=end_month, day_of_rate__lte=high)
+
+    statistics = {}
+    parts = [
+        CurrencyRatesRollup.objects.filter(rollups_filter).values('to_currency')
+        .annotate(min=Min('min_rate'), max=Max('max_rate')).order_by(),
+        CurrencyRates.objects.filter(raw_filter).values('to_currency')
+        .annotate(min=Min('sale_rate'), max=Max('sale_rate')).order_by(),
+    ]
+    for part in parts:
+        for row in part:
+            current = statistics.setdefault(row['to_currency'], row)
+            current['min'] = min(current['min'], row['min'])
+            current['max'] = max(current['max'], row['max'])
+    return [statistics[currency] for currency in sorted(statistics)]
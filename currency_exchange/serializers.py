@@ -1,15 +1,23 @@
 """
     Collect all serializers for app currency exchange
 """
-from datetime import datetime, timedelta
+import math
+from datetime import date, timedelta
 
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.core.validators import MaxValueValidator
+from django.db import connection, transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
-from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+from currency_exchange.analytics import METRICS
+from currency_exchange.authentication import forget_credentials
+from currency_exchange.candles import BUCKETS
+from currency_exchange.models import CurrencyRates, UserPortfolio, UsersExchangeOperations
+from currency_exchange.snapshot import latest_rates
 
 
 class CurrencyRatesSerializer(ModelSerializer):
@@ -18,7 +26,107 @@ class CurrencyRatesSerializer(ModelSerializer):
     """
     class Meta:
         model = CurrencyRates
-        fields = '__all__'
+        exclude = ('source',)
+
+
+class CurrencyStatisticsFilterSerializer(serializers.Serializer):
+    """
+    Date range of currency statistics
+    """
+    # statistics step to the next month and year of the bounds, so the last year is refused
+    date_filter_gte = serializers.DateField(default=date(1970, 1, 1),
+                                            validators=[MaxValueValidator(date(9998, 12, 31))])
+    date_filter_lte = serializers.DateField(default=date(2999, 12, 31),
+                                            validators=[MaxValueValidator(date(9998, 12, 31))])
+
+
+class CommaSeparatedField(serializers.CharField):
+    """
+    List of values passed as one comma separated string
+    """
+
+    def __init__(self, child=None, **kwargs):
+        self.child = child or serializers.CharField()
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        values = [value.strip() for value in super().to_internal_value(data).split(',')
+                  if value.strip()]
+        return [self.child.run_validation(value) for value in values]
+
+    def to_representation(self, value):
+        return ','.join(str(item) for item in value)
+
+
+class CurrencyAnalyticsFilterSerializer(serializers.Serializer):
+    """
+    Currencies, date range and metrics of currency analytics
+    """
+    currencies = CommaSeparatedField(required=False, default=list)
+    day_of_rate_gte = serializers.DateField(default=date(1970, 1, 1))
+    day_of_rate_lte = serializers.DateField(default=date(2999, 12, 31))
+    metrics = CommaSeparatedField(child=serializers.ChoiceField(choices=METRICS), default=list(METRICS))
+    window = serializers.IntegerField(min_value=2, max_value=366, default=7)
+    percentiles = CommaSeparatedField(child=serializers.FloatField(min_value=0, max_value=100),
+                                      default=[5, 25, 50, 75, 95])
+
+    def validate_currencies(self, value: list) -> list:
+        return [currency.upper() for currency in value]
+
+    def validate_metrics(self, value: list) -> list:
+        return list(dict.fromkeys(value))
+
+    def validate_percentiles(self, value: list) -> list:
+        return [int(rank) if float(rank).is_integer() else rank for rank in value]
+
+
+class CurrencyCandlesFilterSerializer(serializers.Serializer):
+    """
+    Bucket size, currencies and date range of currency candles, the last year by default
+    """
+    bucket = serializers.ChoiceField(choices=list(BUCKETS), default='month')
+    currencies = CommaSeparatedField(required=False, default=list)
+    day_of_rate_gte = serializers.DateField(default=lambda: date.today() - timedelta(days=365))
+    day_of_rate_lte = serializers.DateField(default=date.today)
+
+    def validate_currencies(self, value: list) -> list:
+        return [currency.upper() for currency in value]
+
+
+class ConversionSerializer(serializers.Serializer):
+    """
+    Amount to convert from one currency to another
+    """
+    from_currency = serializers.CharField(max_length=3)
+    to_currency = serializers.CharField(max_length=3)
+    # the bound keeps results of any cross rate finite
+    amount = serializers.FloatField(default=1.0, min_value=0, max_value=10 ** 15)
+
+    def validate_amount(self, value: float) -> float:
+        if math.isnan(value):
+            raise serializers.ValidationError('A valid number is required.')
+        return value
+
+    def validate_from_currency(self, value: str) -> str:
+        return value.upper()
+
+    def validate_to_currency(self, value: str) -> str:
+        return value.upper()
+
+
+class ConversionRequestSerializer(ConversionSerializer):
+    """
+    Single conversion on a day, today by default
+    """
+    date = serializers.DateField(default=date.today)
+
+
+class BatchConversionRequestSerializer(serializers.Serializer):
+    """
+    Many conversions on one day, today by default
+    """
+    date = serializers.DateField(default=date.today)
+    items = ConversionSerializer(many=True, allow_empty=False)
 
 
 class CurrencyField(serializers.RelatedField):
@@ -27,6 +135,33 @@ class CurrencyField(serializers.RelatedField):
         return f'Date: {value.day_of_rate} : {value.sale_rate}'
 
 
+@extend_schema_field(OpenApiTypes.STR)
+class LatestRateField(serializers.Field):
+    """
+    Currency code of an operation. Input is resolved to the latest rate of the currency
+    from the process wide snapshot, output is the currency stored on the operation.
+    """
+    default_error_messages = {
+        'does_not_exist': 'No current rate for currency {value}.',
+        'invalid': 'Invalid value.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        rate = latest_rates.lookup(data)
+        if rate is None:
+            self.fail('does_not_exist', value=data)
+        return {'currency': rate}
+
+    def to_representation(self, value):
+        return value.to_currency
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for user
@@ -36,24 +171,52 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email')
 
 
+class UsersExchangeOperationsListSerializer(serializers.ListSerializer):
+    """
+    Batch of users exchange operations saved with one insert
+    """
+
+    def create(self, validated_data):
+        """
+        Insert all operations in one query. Backends which don't return ids of bulk inserts,
+        like sqlite, get them with one more select of the last operations of the user.
+        The insert locks the sqlite database until commit, so no other rows come between.
+        """
+        model = self.child.Meta.model
+        operations = [model(**item) for item in validated_data]
+        for operation in operations:
+            operation.set_rate()
+        with transaction.atomic():
+            model.objects.bulk_create(operations)
+            if operations and not connection.features.can_return_rows_from_bulk_insert:
+                ids = model.objects.filter(user=operations[0].user).order_by('-id') \
+                    .values_list('id', flat=True)[:len(operations)]
+                for operation, pk in zip(operations, reversed(ids)):
+                    operation.pk = pk
+        return operations
+
+
 class GetUsersExchangeOperationsSerializer(ModelSerializer):
     """
     Users exchange operations serializer
     """
-    currency = serializers.SlugRelatedField(
-        slug_field='to_currency',
-        queryset=CurrencyRates.objects
-            .filter(
-            Q(day_of_rate=datetime.today().date()) |
-            Q(day_of_rate=datetime.today().date() + timedelta(days=-1))
-        )
-    )
-    amount_operation = serializers.FloatField(read_only=True)
+    currency = LatestRateField()
+    amount_operation = serializers.FloatField(read_only=True, source='amount')
     user = serializers.SlugRelatedField(read_only=True, slug_field='username')
 
     class Meta:
         model = UsersExchangeOperations
         fields = ('id', 'count', 'currency', 'user', 'amount_operation')
+        list_serializer_class = UsersExchangeOperationsListSerializer
+
+
+class UserPortfolioSerializer(ModelSerializer):
+    """
+    Totals of user exchange operations in one currency
+    """
+    class Meta:
+        model = UserPortfolio
+        fields = ('to_currency', 'count', 'value', 'operations')
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -95,10 +258,11 @@ class UserPasswordChangeSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         """
-        Update user password
+        Update user password and drop cached verification of the old one
         """
         instance.set_password(validated_data['password'])
         instance.save()
+        forget_credentials(instance.get_username(), validated_data['old_password'])
         return instance
 
     def create(self, validated_data):
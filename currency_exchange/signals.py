@@ -0,0 +1,43 @@
+"""
+    Collect signal handlers for app currency exchange
+"""
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from currency_exchange.cache import invalidate_rates_data
+from currency_exchange.candles import invalidate_candles
+from currency_exchange.metrics import record_query
+from currency_exchange.models import CurrencyRates
+from currency_exchange.rollups import refresh_rollups
+
+
+@receiver([post_save, post_delete], sender=CurrencyRates)
+def refresh_currency_rates_rollups(sender, instance, **kwargs):
+    """
+    Keep rollups in sync with rates changed one by one, e.g. in admin.
+    Bulk ingest refreshes rollups itself.
+    """
+    day_of_rate = sender._meta.get_field('day_of_rate').to_python(instance.day_of_rate)
+    refresh_rollups([(instance.to_currency, day_of_rate)])
+
+
+@receiver([post_save, post_delete], sender=CurrencyRates)
+def invalidate_currency_rates_responses(sender, instance, **kwargs):
+    """
+    Outdate cached responses and candles when a rate is changed one by one.
+    Bulk ingest invalidates them itself.
+    """
+    day_of_rate = sender._meta.get_field('day_of_rate').to_python(instance.day_of_rate)
+    invalidate_candles([(instance.to_currency, day_of_rate)])
+    invalidate_rates_data()
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    """
+    Count queries of every new connection in metrics of the current request
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
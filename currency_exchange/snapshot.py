@@ -0,0 +1,62 @@
+"""
+    Process wide snapshot of the latest rate of every currency
+"""
+import threading
+from datetime import date
+from functools import reduce
+from operator import or_
+
+from django.db.models import Max, Q
+
+from currency_exchange.cache import get_data_version
+from currency_exchange.models import CurrencyRates
+from currency_exchange.sources import BASE_CURRENCY
+
+
+class LatestRates:
+    """
+    Latest rate on or before today of every currency. The snapshot is reloaded when the
+    data version or the current day changes, between reloads lookups don't query the db.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.rates = {}
+        self.lock = threading.Lock()
+
+    def get(self) -> dict:
+        """
+        Snapshot of the latest rates
+        :return: mapping to_currency -> CurrencyRates
+        """
+        key = (get_data_version(), date.today())
+        if key != self.key:
+            with self.lock:
+                if key != self.key:
+                    self.rates = self.load(key[1])
+                    self.key = key
+        return self.rates
+
+    def lookup(self, currency: str):
+        """
+        Latest rate of the currency, None if the currency has no rates
+        """
+        return self.get().get(currency)
+
+    @staticmethod
+    def load(today: date) -> dict:
+        """
+        Read the latest rate on or before the day of every currency
+        :param today: last day to look at
+        :return: mapping to_currency -> CurrencyRates
+        """
+        rates = CurrencyRates.objects.filter(from_currency=BASE_CURRENCY, day_of_rate__lte=today)
+        latest_days = rates.values('to_currency').annotate(day=Max('day_of_rate')).order_by()
+        conditions = [Q(to_currency=row['to_currency'], day_of_rate=row['day'])
+                      for row in latest_days]
+        if not conditions:
+            return {}
+        return {rate.to_currency: rate for rate in rates.filter(reduce(or_, conditions))}
+
+
+latest_rates = LatestRates()
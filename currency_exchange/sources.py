@@ -0,0 +1,327 @@
+"""
+    Sources of currency rates. Every source fetches rates of a day and normalizes them
+    to one mapping, sources are asked concurrently and merged by priority.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from currency_exchange.metrics import RATE_SOURCE_FETCHES, RATE_SOURCE_LATENCY
+from currency_exchange.models import CurrencyRates
+
+logger = logging.getLogger('currency_exchange.sources')
+
+BASE_CURRENCY = 'UAH'
+RATE_FIELD = CurrencyRates._meta.get_field('sale_rate')
+RATE_PRECISION = Decimal(10) ** -RATE_FIELD.decimal_places
+RATE_LIMIT = Decimal(10) ** (RATE_FIELD.max_digits - RATE_FIELD.decimal_places)
+
+
+def make_session(pool_size: int = 10, retries: int = 3) -> requests.Session:
+    """
+    Create http session which keeps connections alive and retries failed requests
+    :param pool_size: Number of connections kept per host
+    :param retries: Number of retries with exponential backoff
+    :return: session
+    """
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Session shared by all sources of the process, keeps connections to apis alive
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def normalize_rate(value) -> Optional[Decimal]:
+    """
+    Convert api value to the precision of rate fields
+    :param value: rate from api
+    :return: Decimal or None if value doesn't fit the field
+    """
+    rate = Decimal(str(value)).quantize(RATE_PRECISION)
+    return rate if abs(rate) < RATE_LIMIT else None
+
+
+def build_url(day: date, base_url: str = None) -> str:
+    """
+    Build url of archive rates for the day
+    :param day: Day of rates
+    :param base_url: Api url, PRIVATBANK_API_URL setting by default
+    :return: url
+    """
+    return f'{base_url or settings.PRIVATBANK_API_URL}?json&date={day:%d.%m.%Y}'
+
+
+def get_currency_rates(day: date = None, session: requests.Session = None,
+                       base_url: str = None, timeout: float = None) -> dict:
+    """
+    Get request to api
+    :param day: Day of rates, today by default
+    :param session: Http session, the shared session by default
+    :param base_url: Api url, PRIVATBANK_API_URL setting by default
+    :param timeout: Seconds to wait for api, PRIVATBANK_API_TIMEOUT setting by default
+    :return: Data from api
+    """
+    resp = (session or get_session()).get(build_url(day or date.today(), base_url),
+                                          timeout=timeout or settings.PRIVATBANK_API_TIMEOUT)
+    logger.debug('Response is %s', resp.status_code)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def parse_currency_rates(data: dict) -> dict:
+    """
+    Collect rates with both sale and purchase values from api payload
+    :param data: Data from api call
+    :return: Mapping (to_currency, day_of_rate) -> (sale_rate, purchase_rate)
+    """
+    current_date = (datetime.strptime(data['date'], '%d.%m.%Y').date() if data.get('date')
+                    else datetime.today().date())
+    rates = {}
+    for currency in data.get('exchangeRate', []):
+        if currency.get('saleRate') and currency.get('purchaseRate'):
+            sale_rate = normalize_rate(currency['saleRate'])
+            purchase_rate = normalize_rate(currency['purchaseRate'])
+            if sale_rate is None or purchase_rate is None:
+                logger.warning('Skip rate %s out of range: %s', currency.get('currency'), currency)
+                continue
+            rates[(currency['currency'], current_date)] = (sale_rate, purchase_rate)
+    return rates
+
+
+def rates_digest(rates: dict) -> str:
+    """
+    Hash of normalized rates, equal for equal rates whatever the order or format of payload
+    :param rates: Mapping (to_currency, day_of_rate) -> (sale_rate, purchase_rate)
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    for (currency, day), (sale_rate, purchase_rate) in sorted(rates.items()):
+        digest.update(f'{currency}|{day}|{sale_rate}|{purchase_rate}\n'.encode())
+    return digest.hexdigest()
+
+
+class CircuitBreaker:
+    """
+    Stop calling a source after several failures in a row. After cooldown one call is let
+    through, its success closes the circuit and its failure opens it again.
+    State is kept per process, so a dead api costs one timeout per cooldown, not per call.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # half open: the next failure opens the circuit again right away
+                self.opened_at = None
+                self.failures = self.threshold - 1
+                return True
+            return False
+
+    def success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class RateSource:
+    """
+    Base class of sources. Subclasses implement fetch which returns rates of a day
+    as mapping (to_currency, day_of_rate) -> (sale_rate, purchase_rate)
+    """
+    name = ''
+
+    def __init__(self, timeout: float = 10, **options):
+        self.timeout = timeout
+        self.options = options
+
+    def fetch(self, day: date, session: requests.Session) -> dict:
+        raise NotImplementedError
+
+
+class PrivatBankSource(RateSource):
+    """
+    Archive of cash rates of PrivatBank, has sale and purchase rates of main currencies
+    """
+    name = 'privatbank'
+
+    def fetch(self, day: date, session: requests.Session) -> dict:
+        return parse_currency_rates(get_currency_rates(day, session, self.options.get('url'),
+                                                       self.timeout))
+
+
+class NBUSource(RateSource):
+    """
+    Official rates of the National Bank of Ukraine. There is one rate per currency,
+    it is used as both sale and purchase rate.
+    """
+    name = 'nbu'
+
+    def fetch(self, day: date, session: requests.Session) -> dict:
+        resp = session.get(self.options.get('url', settings.NBU_API_URL),
+                           params={'date': f'{day:%Y%m%d}', 'json': ''}, timeout=self.timeout)
+        resp.raise_for_status()
+        rates = {}
+        for currency in resp.json():
+            rate = normalize_rate(currency['rate'])
+            if rate is None:
+                logger.warning('Skip rate %s out of range: %s', currency.get('cc'), currency)
+                continue
+            rates[(currency['cc'], day)] = (rate, rate)
+        return rates
+
+
+class FileSource(RateSource):
+    """
+    Rates from a local json file, for development and manual corrections.
+    The file is a list of objects with currency, day, sale_rate and purchase_rate.
+    """
+    name = 'file'
+
+    def fetch(self, day: date, session: requests.Session) -> dict:
+        with open(self.options['path']) as file:
+            rows = json.load(file)
+        rates = {}
+        for row in rows:
+            if date.fromisoformat(row['day']) != day:
+                continue
+            sale_rate, purchase_rate = (normalize_rate(row['sale_rate']),
+                                        normalize_rate(row['purchase_rate']))
+            if sale_rate is not None and purchase_rate is not None:
+                rates[(row['currency'], day)] = (sale_rate, purchase_rate)
+        return rates
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(settings.RATE_SOURCE_FAILURE_THRESHOLD,
+                                             settings.RATE_SOURCE_COOLDOWN)
+        return _breakers[name]
+
+
+def reset_breakers() -> None:
+    """
+    Close circuits of all sources
+    """
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def get_sources() -> list:
+    """
+    Sources configured in RATE_SOURCES setting ordered by priority, the first is the most
+    trusted one
+    """
+    sources = []
+    for config in settings.RATE_SOURCES:
+        options = {key.lower(): value for key, value in config.items() if key != 'BACKEND'}
+        sources.append(import_string(config['BACKEND'])(**options))
+    return sources
+
+
+def source_ranks() -> dict:
+    """
+    Priorities of sources configured in RATE_SOURCES setting
+    :return: Mapping source name -> rank, 0 is the most trusted source
+    """
+    return {source.name: rank for rank, source in enumerate(get_sources())}
+
+
+def fetch_source(source: RateSource, day: date, session: requests.Session) -> tuple:
+    """
+    Fetch rates of one source through its circuit breaker and record metrics
+    :return: rates and report of the source
+    """
+    breaker = get_breaker(source.name)
+    if not breaker.allow():
+        RATE_SOURCE_FETCHES.labels(source.name, 'skipped').inc()
+        return {}, {'status': 'skipped'}
+
+    started = time.perf_counter()
+    try:
+        rates = source.fetch(day, session)
+    except (requests.RequestException, OSError, ValueError, KeyError, TypeError,
+            ArithmeticError) as exc:
+        breaker.failure()
+        RATE_SOURCE_FETCHES.labels(source.name, 'failed').inc()
+        logger.warning('Source %s failed for %s: %r', source.name, day, exc)
+        return {}, {'status': 'failed', 'error': repr(exc)}
+    finally:
+        RATE_SOURCE_LATENCY.labels(source.name).observe(time.perf_counter() - started)
+    breaker.success()
+    RATE_SOURCE_FETCHES.labels(source.name, 'ok').inc()
+    return rates, {'status': 'ok', 'rates': len(rates), 'digest': rates_digest(rates)}
+
+
+def fetch_rates(day: date, sources: list = None) -> tuple:
+    """
+    Fetch rates of the day from all sources concurrently and merge them. A rate of
+    a currency is taken from the first source by priority which has it.
+    :param day: day of rates
+    :param sources: sources ordered by priority, RATE_SOURCES setting by default
+    :return: merged rates, mapping (to_currency, day_of_rate) -> name of the source
+        of the rate and mapping source name -> report ordered by priority
+    """
+    sources = get_sources() if sources is None else sources
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as executor:
+        results = list(executor.map(lambda source: fetch_source(source, day, session), sources))
+
+    merged, owners, reports = {}, {}, {}
+    for source, (rates, report) in zip(sources, results):
+        taken = 0
+        for key, value in rates.items():
+            if key not in merged:
+                merged[key] = value
+                owners[key] = source.name
+                taken += 1
+        reports[source.name] = dict(report, taken=taken)
+    return merged, owners, reports
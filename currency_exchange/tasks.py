@@ -2,62 +2,254 @@
     Collect all celery tasks for app currency exchange
 """
 import logging
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
-import requests
+from django.db import IntegrityError, transaction
 
-from currency_exchange.models import CurrencyRates
+from currency_exchange.analytics import publish_series
+from currency_exchange.cache import invalidate_rates_data
+from currency_exchange.candles import invalidate_candles
+from currency_exchange.latest import publish_latest_rates
+from currency_exchange.models import CurrencyRates, IngestCheckpoint, SourcePayloadHash
+from currency_exchange.rollups import refresh_rollups
+from currency_exchange.sources import BASE_CURRENCY, PrivatBankSource, fetch_rates, \
+    get_currency_rates, make_session, parse_currency_rates, source_ranks
 from exchange_api.celery import app
 
-logger = logging.getLogger('currency_exchange')
+logger = logging.getLogger('currency_exchange.tasks')
 
-YEAR = datetime.now().year
-MONTH = datetime.now().month
-DAY = datetime.now().day
 
-URL = f'https://api.privatbank.ua/p24api/exchange_rates?json&date={DAY}.{MONTH}.{YEAR}'
+BACKFILL_CHECKPOINT = 'privatbank_backfill'
+UPSERT_ATTEMPTS = 3
 
 
 @app.task
-def download_exchange_rates():
+def download_exchange_rates() -> dict:
     """
-    Celery task get data from privat bank api and upload currency rates to db
-    :return:
+    Celery task get today rates from all sources and upload them to db with one bulk upsert
+    :return: Counts of inserted, updated and unchanged rows
     """
+    day = date.today()
+    rates, owners, reports = fetch_rates(day)
+    check_reports(day, reports)
+    counts = upsert_currency_rates(rates, owners)
+    logger.info('Rates for %s were ingested: %s, sources: %s', day, counts, reports)
+    return counts
 
-    data = get_currency_rates()
-    add_currency_rates_to_db(data)
-    return 'Task download exchange rates executed successfully'
+
+@app.task
+def poll_exchange_rates() -> dict:
+    """
+    Celery task poll sources for today rates many times a day. When every answered source
+    returns the same rates as last time, the db and caches are not touched at all.
+    :return: Counts of inserted, updated and unchanged rows
+    """
+    day = date.today()
+    rates, owners, reports = fetch_rates(day)
+    check_reports(day, reports)
+    digests = {name: report['digest'] for name, report in reports.items()
+               if report['status'] == 'ok'}
+    known = dict(SourcePayloadHash.objects.filter(day=day, source__in=digests)
+                 .values_list('source', 'digest'))
+    if known == digests:
+        logger.debug('Rates for %s are unchanged, sources: %s', day, reports)
+        return {'inserted': 0, 'updated': 0, 'unchanged': len(rates)}
+
+    with transaction.atomic():
+        counts = upsert_currency_rates(rates, owners)
+        for name, digest in digests.items():
+            if known.get(name) != digest:
+                SourcePayloadHash.objects.update_or_create(source=name, day=day,
+                                                           defaults={'digest': digest})
+    logger.info('Rates for %s were polled: %s, sources: %s', day, counts, reports)
+    return counts
+
+
+def check_reports(day: date, reports: dict) -> None:
+    """
+    Fail the ingest when no source answered, instead of reporting zero rows as success
+    :param day: Day of rates
+    :param reports: Mapping source name -> report
+    """
+    if not any(report['status'] == 'ok' for report in reports.values()):
+        logger.error('No source answered for %s: %s', day, reports)
+        raise RuntimeError(f'No source of rates answered for {day}')
 
 
-def get_currency_rates() -> dict:
+@app.task
+def backfill_exchange_rates(start: str, end: str, workers: int = 4,
+                            requests_per_second: float = 5, restart: bool = False) -> dict:
     """
-    Get request to api
-    :return: Data from api
+    Celery task load archive rates of privat bank api for every day in range
+    :param start: First day in ISO format
+    :param end: Last day in ISO format
+    :param workers: Number of concurrent requests
+    :param requests_per_second: Limit of requests to api
+    :param restart: Ignore saved checkpoint and start from the first day
+    :return: Counts of inserted, updated and unchanged rows
     """
-    resp = requests.get(URL)
-    logger.debug(f'Response is {resp.status_code}')
-    return resp.json()
+    return backfill_currency_rates(date.fromisoformat(start), date.fromisoformat(end),
+                                   workers=workers, requests_per_second=requests_per_second,
+                                   restart=restart)
 
 
-def add_currency_rates_to_db(data: dict) -> str:
+class RateLimiter:
+    """
+    Thread safe limiter which spreads calls evenly, no more than rate calls per second
     """
-    Insert currency rates to db
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """
+        Block until the next call is allowed
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def backfill_currency_rates(start: date, end: date, workers: int = 4,
+                            requests_per_second: float = 5, restart: bool = False,
+                            base_url: str = None) -> dict:
+    """
+    Fetch days concurrently and write every chunk of days with one bulk upsert.
+    The last written day is saved as checkpoint of the first day, so an interrupted backfill
+    continues from it, also when it is started again with a later last day.
+    :param start: First day
+    :param end: Last day
+    :param workers: Number of concurrent requests
+    :param requests_per_second: Limit of requests to api
+    :param restart: Ignore saved checkpoint and start from the first day
+    :param base_url: Api url, PRIVATBANK_API_URL setting by default
+    :return: Counts of inserted, updated and unchanged rows
+    """
+    checkpoint, _ = IngestCheckpoint.objects.get_or_create(
+        name=f'{BACKFILL_CHECKPOINT}:{start}')
+    if checkpoint.day and not restart:
+        start = checkpoint.day + timedelta(days=1)
+        logger.info('Backfill continues from checkpoint %s', checkpoint.day)
+
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    limiter = RateLimiter(requests_per_second)
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    def fetch(day: date) -> dict:
+        limiter.wait()
+        return get_currency_rates(day, session, base_url)
+
+    with make_session(pool_size=workers) as session, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk_size = workers * 8
+        for offset in range(0, len(days), chunk_size):
+            chunk = days[offset:offset + chunk_size]
+            rates = {}
+            for data in executor.map(fetch, chunk):
+                rates.update(parse_currency_rates(data))
+            owners = dict.fromkeys(rates, PrivatBankSource.name)
+            for key, value in upsert_currency_rates(rates, owners).items():
+                counts[key] += value
+            checkpoint.day = chunk[-1]
+            checkpoint.save(update_fields=['day', 'updated'])
+            logger.info('Backfill loaded rates up to %s', checkpoint.day)
+    return counts
+
+
+def add_currency_rates_to_db(data: dict) -> dict:
+    """
+    Insert or update currency rates of one api payload in a single transaction
     :param data: Data from api call
-    :return: String notification
-    """
-
-    currant_date = datetime.strptime(data.get('date', datetime.today().date()), '%d.%m.%Y').date()
-    if not CurrencyRates.objects.filter(day_of_rate=currant_date).exists():
-        for currency in data.get('exchangeRate'):
-            if currency.get('saleRate') and currency.get('purchaseRate'):
-                record = CurrencyRates(to_currency=currency.get('currency'),
-                                       sale_rate=currency.get('saleRate'),
-                                       purchase_rate=currency.get('purchaseRate'))
-
-                record.save()
-        logger.debug('Rates was updated using api')
-        return 'Rates was updated using api'
-    else:
-        logger.debug('Db contains rates for this day')
-        return 'Db contains rates for this day'
+    :return: Counts of inserted, updated and unchanged rows
+    """
+    rates = parse_currency_rates(data)
+    counts = upsert_currency_rates(rates, dict.fromkeys(rates, PrivatBankSource.name))
+    logger.debug('Rates for %s were ingested: %s', data.get('date'), counts)
+    return counts
+
+
+def lock_rates(keys) -> dict:
+    """
+    Select existing rates for update
+    :param keys: tuples (to_currency, day_of_rate)
+    :return: Mapping (to_currency, day_of_rate) -> rate
+    """
+    return {
+        (record.to_currency, record.day_of_rate): record
+        for record in CurrencyRates.objects.select_for_update()
+        .filter(from_currency=BASE_CURRENCY,
+                to_currency__in={currency for currency, _ in keys},
+                day_of_rate__in={day for _, day in keys})
+    }
+
+
+def upsert_currency_rates(rates: dict, sources: dict = None) -> dict:
+    """
+    Bulk insert new rates and update changed ones. Running it again with the same
+    rates doesn't touch the db except for one select. A rate written by a source
+    with higher priority in RATE_SOURCES setting is not replaced by a less trusted one,
+    e.g. by NBU rates while PrivatBank is down.
+    :param rates: Mapping (to_currency, day_of_rate) -> (sale_rate, purchase_rate)
+    :param sources: Mapping (to_currency, day_of_rate) -> name of the source of the rate,
+        rates without a source rank below all configured sources
+    :return: Counts of inserted, updated and unchanged rows
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if not rates:
+        return counts
+    sources = sources or {}
+    ranks = source_ranks()
+
+    with transaction.atomic():
+        for attempt in range(1, UPSERT_ATTEMPTS + 1):
+            existing = lock_rates(rates)
+            new_records, changed_records, unchanged = [], [], 0
+            for (currency, day), (sale_rate, purchase_rate) in rates.items():
+                record = existing.get((currency, day))
+                source = sources.get((currency, day), '')
+                if record is None:
+                    new_records.append(CurrencyRates(to_currency=currency, day_of_rate=day,
+                                                     sale_rate=sale_rate,
+                                                     purchase_rate=purchase_rate,
+                                                     source=source))
+                elif (record.sale_rate != sale_rate or record.purchase_rate != purchase_rate) \
+                        and ranks.get(source, len(ranks)) <= ranks.get(record.source, len(ranks)):
+                    record.sale_rate, record.purchase_rate = sale_rate, purchase_rate
+                    record.source = source
+                    changed_records.append(record)
+                else:
+                    unchanged += 1
+            try:
+                with transaction.atomic():
+                    CurrencyRates.objects.bulk_create(new_records)
+                break
+            except IntegrityError:
+                # a concurrent ingest inserted some of the rates since the select,
+                # the next round locks and compares them like other existing rates
+                if attempt == UPSERT_ATTEMPTS:
+                    raise
+                logger.debug('Rates were inserted concurrently, select them again')
+
+        CurrencyRates.objects.bulk_update(changed_records,
+                                          ['sale_rate', 'purchase_rate', 'source'])
+        changed = [(record.to_currency, record.day_of_rate)
+                   for record in new_records + changed_records]
+        refresh_rollups(changed)
+        if changed:
+            invalidate_candles(changed)
+            invalidate_rates_data()
+            transaction.on_commit(publish_latest_rates)
+            transaction.on_commit(publish_series)
+
+    counts['inserted'] = len(new_records)
+    counts['updated'] = len(changed_records)
+    counts['unchanged'] = unchanged
+    return counts
@@ -0,0 +1,113 @@
+"""
+    Collect all tests for analytics of currency rates
+"""
+import statistics
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.cache import get_backend
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class AnalyticsTestCase(APITestCase):
+    """
+    Class for testing analytics endpoint
+    """
+
+    def setUp(self) -> None:
+        """
+        Ingest thirty days of rates of two currencies
+        :return:
+        """
+        self.sale = [Decimal(28 + (day % 5) / 10).quantize(Decimal('0.0001')) for day in range(30)]
+        rates = {}
+        for offset, sale in enumerate(self.sale):
+            day = date(2022, 1, 1) + timedelta(days=offset)
+            rates[('USD', day)] = (sale, sale - Decimal('0.5'))
+            rates[('EUR', day)] = (sale + 3, sale + 2)
+        upsert_currency_rates(rates)
+
+    def get_analytics(self, **params):
+        response = self.client.get('/api/v1/currency_analytics/', params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return response.data['analytics']
+
+    def test_metrics(self):
+        """
+        Test that metrics match plain python calculations
+        :return:
+        """
+        sale = [float(value) for value in self.sale]
+        usd = self.get_analytics(currencies='usd', window=3)[0]
+        returns = np.diff(np.log(sale))
+
+        self.assertEqual(30, usd['count'])
+        self.assertAlmostEqual(statistics.mean(sale), usd['mean']['sale'], places=6)
+        self.assertAlmostEqual(statistics.stdev(sale), usd['std']['sale'], places=6)
+        self.assertAlmostEqual(statistics.median(sale), usd['percentiles']['sale']['50'], places=6)
+        self.assertAlmostEqual(statistics.stdev(returns), usd['volatility']['daily'], places=6)
+        self.assertAlmostEqual(0.5, usd['spread']['mean'], places=6)
+        self.assertEqual(28, len(usd['moving_average']['values']))
+        self.assertEqual('2022-01-03', usd['moving_average']['days'][0])
+        self.assertAlmostEqual(sum(sale[:3]) / 3, usd['moving_average']['values'][0], places=6)
+
+    def test_range_and_metrics_filter(self):
+        """
+        Test that only requested metrics of the range are returned for all currencies
+        :return:
+        """
+        analytics = self.get_analytics(day_of_rate_gte='2022-01-11', day_of_rate_lte='2022-01-20',
+                                       metrics='mean,spread')
+        self.assertEqual(['EUR', 'USD'], [item['to_currency'] for item in analytics])
+        self.assertEqual({'to_currency', 'count', 'mean', 'spread'}, set(analytics[0]))
+        self.assertEqual(10, analytics[0]['count'])
+
+    def test_results_cached_until_rates_change(self):
+        """
+        Test that repeated request doesn't read rates and ingest outdates results
+        :return:
+        """
+        self.get_analytics(currencies='USD', metrics='mean')
+        with self.assertNumQueries(0):
+            self.get_analytics(currencies='USD', metrics='mean')
+
+        upsert_currency_rates({('USD', date(2022, 1, 31)): (Decimal('59.0000'), Decimal('58.0000'))})
+        self.assertEqual(31, self.get_analytics(currencies='USD', metrics='mean')[0]['count'])
+
+    def test_version_read_once_and_results_fetched_at_once(self):
+        """
+        Test that a request reads the data version once and all cached results in one lookup
+        :return:
+        """
+        backend = get_backend()
+        with mock.patch.object(backend, 'get_counter', wraps=backend.get_counter) as get_counter, \
+                mock.patch.object(backend, 'get_many', wraps=backend.get_many) as get_many:
+            self.get_analytics()
+        self.assertEqual(1, get_counter.call_count)
+        self.assertEqual(1, get_many.call_count)
+        self.assertEqual(14, len(get_many.call_args[0][0]))
+
+    def test_series_published_at_ingest(self):
+        """
+        Test that the first request after a committed ingest takes series from the shared cache
+        :return:
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_currency_rates({('USD', date(2022, 1, 31)): (Decimal('59.0000'),
+                                                                 Decimal('58.0000'))})
+        with self.assertNumQueries(0):
+            analytics = self.get_analytics(metrics='mean')
+        self.assertEqual([30, 31], [item['count'] for item in analytics])
+
+    def test_unknown_metric(self):
+        """
+        Test that unknown metric is rejected
+        :return:
+        """
+        response = self.client.get('/api/v1/currency_analytics/', {'metrics': 'mean,median'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
@@ -4,8 +4,10 @@
 import json
 from datetime import datetime, timedelta
 from decimal import Decimal
+from unittest import mock
 
-from django.db import models
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import check_password
@@ -363,3 +365,118 @@ class CurrencyRatesApiTestCase(APITestCase):
                                    content_type='application/json')
         self.assertEqual(status.HTTP_200_OK, response.status_code)
         self.assertTrue(check_password('new_updated', response.data.get('password')))
+
+    def test_export_rates_csv(self):
+        """
+        Test that export streams filtered rates as csv
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/export/', {'to_currency': 'USD'},
+                                   HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual('text/csv', response['Content-Type'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(['id,from_currency,to_currency,day_of_rate,sale_rate,purchase_rate',
+                          f'{self.cur_6.id},UAH,USD,{self.cur_6.day_of_rate},32.1800,31.5000',
+                          f'{self.cur_10.id},UAH,USD,{self.cur_10.day_of_rate},33.1800,32.5000'],
+                         lines)
+
+    def test_export_rates_ndjson(self):
+        """
+        Test that ndjson export has the format of rates list
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/export/',
+                                   {'export_format': 'ndjson', 'day_of_rate_gte':
+                                    datetime.today().date() + timedelta(days=2)})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        test_data = CurrencyRatesSerializer([self.cur_8, self.cur_9, self.cur_10], many=True).data
+        self.assertEqual(test_data, rows)
+
+    def test_export_rates_unknown_format(self):
+        """
+        Test that export rejects unknown format
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/export/', {'export_format': 'xml'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_export_rates_reads_keyset_pages(self):
+        """
+        Test that export reads every rate once, one query per page continuing after
+        the last rate of the previous page
+        :return:
+        """
+        expected = list(CurrencyRates.objects.order_by('day_of_rate', 'id')
+                        .values_list('id', flat=True))
+        with mock.patch('currency_exchange.export.EXPORT_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/rates/export/', {'export_format': 'ndjson'})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(expected, [row['id'] for row in rows])
+        self.assertEqual(len(expected) // 2 + 1, len(context.captured_queries))
+
+    def test_batch_users_operations(self):
+        """
+        Test that batch of operations is created with one insert
+        :return:
+        """
+        url = reverse('users_exchange-batch')
+        operations = [{'count': 5, 'currency': 'GBP'}, {'count': 7, 'currency': 'USD'},
+                      {'count': 1, 'currency': 'CHF'}]
+        self.client.force_login(self.user_1)
+        self.client.post(url, data=operations[:1], format='json')
+        with self.assertNumQueries(12):
+            # session, user, savepoint, savepoint, insert, select of ids, release,
+            # portfolio select, insert, select, update, release
+            response = self.client.post(url, data=operations, format='json')
+
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(['GBP', 'USD', 'CHF'], [item['currency'] for item in response.data])
+        self.assertEqual(6, UsersExchangeOperations.objects.filter(user=self.user_1.id).count())
+        self.assertEqual(list(UsersExchangeOperations.objects.filter(user=self.user_1.id)
+                              .order_by('-id').values_list('id', 'count')[:3])[::-1],
+                         [(item['id'], item['count']) for item in response.data])
+
+    def test_batch_users_operations_errors(self):
+        """
+        Test that invalid item rejects whole batch with errors per item
+        :return:
+        """
+        url = reverse('users_exchange-batch')
+        self.client.force_login(self.user_1)
+        response = self.client.post(url, data=[{'count': 5, 'currency': 'GBP'},
+                                               {'count': 'many', 'currency': 'XXX'}], format='json')
+
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual({}, response.data[0])
+        self.assertEqual({'count', 'currency'}, set(response.data[1]))
+        self.assertEqual(2, UsersExchangeOperations.objects.filter(user=self.user_1.id).count())
+
+        response = self.client.post(url, data={'count': 5, 'currency': 'GBP'}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_users_operations_keep_rate_of_deleted_currency_rate(self):
+        """
+        Test that operations store their rate, list them without join to rates
+        and keep amounts after the rate is deleted
+        :return:
+        """
+        url = reverse('users_exchange-list')
+        self.client.force_login(self.user_1)
+        self.cur_1.delete()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'cursor': ''})
+
+        operations_queries = [query['sql'] for query in context.captured_queries
+                              if 'currency_exchange_usersexchangeoperations' in query['sql']]
+        self.assertEqual(1, len(operations_queries))
+        self.assertNotIn('JOIN', operations_queries[0])
+        self.assertEqual([('CHF', 64.2), ('CZK', 2.69)],
+                         [(item['currency'], item['amount_operation'])
+                          for item in response.data['results']])
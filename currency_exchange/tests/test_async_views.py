@@ -0,0 +1,159 @@
+"""
+    Collect all tests for async read endpoints
+"""
+import json
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TransactionTestCase
+from rest_framework import status
+
+from currency_exchange.cache import get_backend
+from currency_exchange.models import CurrencyRates
+from exchange_api.asgi import application
+
+
+class AsyncRatesTestCase(TransactionTestCase):
+    """
+    Class for testing async endpoints against their sync versions. Queries run in other
+    threads, so data has to be committed
+    """
+
+    def setUp(self) -> None:
+        """
+        Create rates of two currencies for three days
+        :return:
+        """
+        get_backend().clear()
+        self.async_client = AsyncClient()
+        for offset in range(3):
+            day = date.today() - timedelta(days=offset)
+            CurrencyRates.objects.create(to_currency='USD', sale_rate=f'{28 + offset}.0000',
+                                         purchase_rate='27.0000', day_of_rate=day)
+            CurrencyRates.objects.create(to_currency='EUR', sale_rate=f'{32 + offset}.0000',
+                                         purchase_rate='31.0000', day_of_rate=day)
+
+    def request(self, method: str, url: str):
+        async def send():
+            return await getattr(self.async_client, method)(url)
+        return async_to_sync(send)()
+
+    def get(self, url: str, params: dict = None):
+        # async client of Django 3.2 drops data of GET requests
+        return self.request('get', f'{url}?{urlencode(params or {})}')
+
+    def test_rates_list_matches_sync(self):
+        """
+        Test that filters and both paginations give the same data as /rates/
+        :return:
+        """
+        for params in ({'to_currency': 'USD'}, {'limit': 2, 'offset': 2},
+                       {'cursor': '', 'limit': 4, 'with_count': 'true'}):
+            with self.subTest(params=params):
+                response = self.get('/api/v1/async/rates/', params)
+                self.assertEqual(status.HTTP_200_OK, response.status_code)
+                expected = json.loads(self.client.get('/api/v1/rates/', params).content)
+                data = response.json()
+                self.assertEqual(expected['results'], data['results'])
+                self.assertEqual(bool(expected['next']), bool(data['next']))
+
+    def test_rates_list_errors(self):
+        """
+        Test that invalid filter and cursor are rejected
+        :return:
+        """
+        self.assertEqual(status.HTTP_400_BAD_REQUEST,
+                         self.get('/api/v1/async/rates/', {'day_of_rate': 'yesterday'}).status_code)
+        self.assertEqual(status.HTTP_404_NOT_FOUND,
+                         self.get('/api/v1/async/rates/', {'cursor': 'broken'}).status_code)
+        response = self.request('post', '/api/v1/async/rates/')
+        self.assertEqual(status.HTTP_405_METHOD_NOT_ALLOWED, response.status_code)
+
+    def test_latest_rates(self):
+        """
+        Test that every currency has the rate of today
+        :return:
+        """
+        response = self.get('/api/v1/async/rates/latest/')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([('EUR', '32.0000', str(date.today())), ('USD', '28.0000', str(date.today()))],
+                         [(rate['to_currency'], rate['sale_rate'], rate['day_of_rate'])
+                          for rate in response.json()])
+
+    def test_statistics(self):
+        """
+        Test that statistics take date range from query parameters
+        :return:
+        """
+        params = {'date_filter_gte': str(date.today() - timedelta(days=1))}
+        response = self.get('/api/v1/async/currency_statistics/', params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(['EUR', 'USD'], [row['to_currency'] for row in response.json()['statistics']])
+        # the sync view reads the range from the body of GET request
+        self.assertEqual(json.loads(self.client.generic('GET', '/api/v1/currency_statistics/',
+                                                        json.dumps(params),
+                                                        'application/json').content),
+                         response.json())
+        self.assertEqual(status.HTTP_400_BAD_REQUEST,
+                         self.get('/api/v1/async/currency_statistics/',
+                                  {'date_filter_gte': 'never'}).status_code)
+        params = {'date_filter_lte': '9999-12-31'}
+        self.assertEqual(status.HTTP_400_BAD_REQUEST,
+                         self.get('/api/v1/async/currency_statistics/', params).status_code)
+        self.assertEqual(status.HTTP_400_BAD_REQUEST,
+                         self.client.generic('GET', '/api/v1/currency_statistics/',
+                                             json.dumps(params), 'application/json').status_code)
+
+
+class AsgiExportTestCase(TransactionTestCase):
+    """
+    Class for testing sync views with streaming responses served by the ASGI handler,
+    which iterates the content inside the event loop
+    """
+
+    def setUp(self) -> None:
+        """
+        Create rates for more days than fit one export chunk
+        :return:
+        """
+        CurrencyRates.objects.bulk_create([
+            CurrencyRates(to_currency='USD', sale_rate='28.0000', purchase_rate='27.0000',
+                          day_of_rate=date.today() - timedelta(days=offset))
+            for offset in range(2500)])
+
+    def asgi_get(self, path: str, query: str = '') -> tuple:
+        """
+        Send GET request through the ASGI application
+        :return: status and body of the response
+        """
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            await application({
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': query.encode(), 'headers': [(b'host', b'localhost')],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 5000)}, receive, send)
+
+        async_to_sync(run)()
+        status_code = next(message['status'] for message in messages
+                           if message['type'] == 'http.response.start')
+        return status_code, b''.join(message.get('body', b'') for message in messages
+                                     if message['type'] == 'http.response.body')
+
+    def test_export_is_complete(self):
+        """
+        Test that csv export contains every row when served under ASGI
+        :return:
+        """
+        status_code, body = self.asgi_get('/api/v1/rates/export/', 'export_format=csv')
+
+        self.assertEqual(status.HTTP_200_OK, status_code)
+        self.assertEqual(2501, len(body.decode().splitlines()))
@@ -0,0 +1,164 @@
+"""
+    Collect all tests for cached basic authentication
+"""
+import base64
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from rest_framework import status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_social_oauth2.authentication import SocialAuthentication
+
+from currency_exchange.authentication import CachedBasicAuthentication, SchemeAuthentication, \
+    credentials_key
+from currency_exchange.cache import get_backend
+
+
+class CachedBasicAuthenticationTestCase(APITestCase):
+    """
+    Class for testing basic authentication with cached verifications
+    """
+
+    def setUp(self) -> None:
+        """
+        Create user with basic credentials and start with empty cache
+        :return:
+        """
+        get_backend().clear()
+        self.user = User.objects.create_user('basic_user', 'basic@mail.ua', 'old_secret')
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('basic_user', 'old_secret'))
+
+    @staticmethod
+    def basic(username: str, password: str) -> str:
+        return 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+
+    def get_portfolio(self):
+        return self.client.get('/api/v1/portfolio/')
+
+    def test_verification_cached(self):
+        """
+        Test that only the first request checks the password
+        :return:
+        """
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate',
+                        autospec=True, side_effect=lambda *args, **kwargs: self.user) as checked:
+            self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+            self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+        self.assertEqual(1, checked.call_count)
+        cached = get_backend().get(credentials_key('basic_user', 'old_secret'))
+        self.assertNotIn(b'old_secret', cached)
+        self.assertNotIn(self.user.password.encode(), cached)
+
+    def test_wrong_password_not_cached(self):
+        """
+        Test that failed verification is rejected and not remembered
+        :return:
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('basic_user', 'wrong'))
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.get_portfolio().status_code)
+        self.assertIsNone(get_backend().get(credentials_key('basic_user', 'wrong')))
+
+    def test_password_change_invalidates_cache(self):
+        """
+        Test that old password stops working right after change through the api
+        :return:
+        """
+        self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+        response = self.client.put('/api/v1/change_password/', {
+            'old_password': 'old_secret', 'password': 'new_secret',
+            'confirmed_password': 'new_secret'}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIsNone(get_backend().get(credentials_key('basic_user', 'old_secret')))
+
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.get_portfolio().status_code)
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('basic_user', 'new_secret'))
+        self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+
+    def test_cached_verification_checks_user(self):
+        """
+        Test that cached verification isn't trusted after password is changed elsewhere
+        or user is deactivated
+        :return:
+        """
+        self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+        self.user.set_password('admin_reset')
+        self.user.save()
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.get_portfolio().status_code)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('basic_user', 'admin_reset'))
+        self.assertEqual(status.HTTP_200_OK, self.get_portfolio().status_code)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.get_portfolio().status_code)
+
+
+class SchemeAuthenticationTestCase(APITestCase):
+    """
+    Class for testing dispatch of authentication by scheme of the header
+    """
+
+    def setUp(self) -> None:
+        """
+        Create user and obtain JWT of the user
+        :return:
+        """
+        self.user = User.objects.create_user('scheme_user', 'scheme@mail.ua', 'secret')
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_backend_by_scheme(self):
+        """
+        Test that every scheme is routed to its backend only
+        :return:
+        """
+        factory = APIRequestFactory()
+        headers = {
+            '': None,
+            'Basic c2NoZW1lX3VzZXI6c2VjcmV0': CachedBasicAuthentication,
+            f'Bearer {self.access}': JWTAuthentication,
+            'Bearer github 401f7ac837da42b97f613d789819ff93537bee6a': SocialAuthentication,
+            'Bearer 9qGYyJDCTXXCv3XqZ8gZ2u1gcydaZr': OAuth2Authentication,
+            'Token abc': None,
+        }
+        for header, backend_class in headers.items():
+            with self.subTest(header=header):
+                request = factory.get('/api/v1/rates/', HTTP_AUTHORIZATION=header)
+                self.assertIs(backend_class, SchemeAuthentication().get_backend_class(request))
+
+        factory.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertIs(SessionAuthentication, SchemeAuthentication()
+                      .get_backend_class(factory.get('/api/v1/rates/')))
+
+    def test_stateless_jwt_on_rates(self):
+        """
+        Test that read only endpoint takes user from token claims without user query
+        and other endpoints still load the user
+        :return:
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/rates/')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertFalse([query for query in context.captured_queries
+                          if 'auth_user' in query['sql']])
+        self.assertIsInstance(response.wsgi_request.user, TokenUser)
+
+        response = self.client.get('/api/v1/portfolio/')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(self.user, response.wsgi_request.user)
+
+    def test_unknown_bearer_token(self):
+        """
+        Test that token which is neither JWT nor known OAuth2 token isn't authenticated
+        :return:
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer unknown')
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED,
+                         self.client.get('/api/v1/portfolio/').status_code)
+        self.assertEqual(status.HTTP_200_OK, self.client.get('/api/v1/rates/').status_code)
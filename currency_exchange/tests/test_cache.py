@@ -0,0 +1,151 @@
+"""
+    Collect all tests for cache of api responses
+"""
+from datetime import date
+from decimal import Decimal
+
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.cache import LocMemBackend, get_data_version, rates_list_cache
+from currency_exchange.models import CurrencyRates
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class LocMemBackendTestCase(APITestCase):
+    """
+    Class for testing local memory backend
+    """
+
+    def test_least_recently_used_key_is_evicted(self):
+        """
+        Test that backend keeps max entries and evicts the least recently used one
+        :return:
+        """
+        backend = LocMemBackend(max_entries=2)
+        backend.set('first', b'1')
+        backend.set('second', b'2')
+        backend.get('first')
+        backend.set('third', b'3')
+
+        self.assertEqual(b'1', backend.get('first'))
+        self.assertIsNone(backend.get('second'))
+        self.assertEqual(b'3', backend.get('third'))
+
+
+class RatesListCacheTestCase(APITestCase):
+    """
+    Class for testing cached list of rates
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up data for tests
+        :return:
+        """
+        self.cur_1 = CurrencyRates.objects.create(to_currency='USD', sale_rate='27.4000',
+                                                  purchase_rate='27.0000',
+                                                  day_of_rate=date(2021, 12, 1))
+
+    def test_list_is_cached_by_normalized_params(self):
+        """
+        Test that the same filters in another order are served from cache
+        :return:
+        """
+        def lookups(result):
+            return REGISTRY.get_sample_value('response_cache_lookups_total',
+                                             {'namespace': 'rates:list', 'result': result}) or 0
+
+        hits = rates_list_cache.stats()['hits']
+        hit_lookups, miss_lookups = lookups('hit'), lookups('miss')
+        first = self.client.get('/api/v1/rates/?to_currency=USD&limit=5&unknown=1')
+        second = self.client.get('/api/v1/rates/?limit=5&to_currency=USD')
+
+        self.assertEqual('MISS', first['X-Cache'])
+        self.assertEqual('HIT', second['X-Cache'])
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(hits + 1, rates_list_cache.stats()['hits'])
+        self.assertEqual((hit_lookups + 1, miss_lookups + 1), (lookups('hit'), lookups('miss')))
+        self.assertIn(b'response_cache_lookups_total{namespace="rates:list",result="hit"}',
+                      self.client.get('/metrics').content)
+
+    def test_ingest_invalidates_cached_list(self):
+        """
+        Test that ingest of changed rates bumps data version and outdates cache
+        :return:
+        """
+        self.client.get('/api/v1/rates/')
+        version = get_data_version()
+
+        upsert_currency_rates({('EUR', date(2021, 12, 1)): (Decimal('31.0500'),
+                                                           Decimal('30.4500'))})
+        response = self.client.get('/api/v1/rates/')
+
+        self.assertLess(version, get_data_version())
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('MISS', response['X-Cache'])
+        self.assertEqual(2, response.data['count'])
+
+    def test_unchanged_ingest_keeps_cache(self):
+        """
+        Test that ingest without changes keeps data version
+        :return:
+        """
+        version = get_data_version()
+        upsert_currency_rates({('USD', date(2021, 12, 1)): (Decimal('27.4000'),
+                                                           Decimal('27.0000'))})
+        self.assertEqual(version, get_data_version())
+
+
+class ConditionalGetTestCase(APITestCase):
+    """
+    Class for testing ETag and Last-Modified of rates endpoints
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up data for tests
+        :return:
+        """
+        upsert_currency_rates({('USD', date(2021, 12, 1)): (Decimal('27.4000'),
+                                                           Decimal('27.0000'))})
+
+    def test_rates_not_modified(self):
+        """
+        Test that matching ETag or Last-Modified of rates list return 304 without body
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/', {'to_currency': 'USD'})
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            by_etag = self.client.get('/api/v1/rates/', {'to_currency': 'USD'},
+                                      HTTP_IF_NONE_MATCH=etag)
+        by_date = self.client.get('/api/v1/rates/', {'to_currency': 'USD'},
+                                  HTTP_IF_MODIFIED_SINCE=last_modified)
+        other_filter = self.client.get('/api/v1/rates/', {'to_currency': 'EUR'},
+                                       HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, by_etag.status_code)
+        self.assertEqual(b'', by_etag.content)
+        self.assertEqual(etag, by_etag['ETag'])
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, by_date.status_code)
+        self.assertEqual(status.HTTP_200_OK, other_filter.status_code)
+
+    def test_statistics_not_modified_until_ingest(self):
+        """
+        Test that statistics ETag matches until rates are changed
+        :return:
+        """
+        etag = self.client.get('/api/v1/currency_statistics/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/currency_statistics/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+        upsert_currency_rates({('USD', date(2021, 12, 2)): (Decimal('27.5000'),
+                                                           Decimal('27.1000'))})
+        response = self.client.get('/api/v1/currency_statistics/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
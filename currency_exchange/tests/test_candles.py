@@ -0,0 +1,99 @@
+"""
+    Collect all tests for candles of currency rates
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.candles import bucket_start, currency_candles, next_bucket
+from currency_exchange.models import CurrencyRates
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class CandlesTestCase(APITestCase):
+    """
+    Class for testing candles
+    """
+
+    def setUp(self) -> None:
+        """
+        Ingest daily rates of two currencies from October 2021 to January 2022
+        :return:
+        """
+        self.today = date(2022, 1, 20)
+        rates = {}
+        day = date(2021, 10, 1)
+        while day <= self.today:
+            sale_rate = Decimal(day.toordinal() % 13 + 20).quantize(Decimal('0.0001'))
+            rates[('USD', day)] = (sale_rate, sale_rate)
+            rates[('EUR', day)] = (sale_rate + 5, sale_rate)
+            day += timedelta(days=1)
+        upsert_currency_rates(rates)
+
+    def expected_candle(self, currency: str, bucket: str, start: date) -> dict:
+        rates = list(CurrencyRates.objects
+                     .filter(to_currency=currency, day_of_rate__gte=start,
+                             day_of_rate__lt=next_bucket(bucket, start))
+                     .order_by('day_of_rate').values_list('sale_rate', flat=True))
+        return {'open': rates[0], 'high': max(rates), 'low': min(rates), 'close': rates[-1]}
+
+    def test_candles_match_rates(self):
+        """
+        Test that every bucket size gives candles of whole buckets
+        :return:
+        """
+        for bucket in ('week', 'month', 'quarter', 'year'):
+            with self.subTest(bucket=bucket):
+                candles = currency_candles(bucket, ['USD'], date(2021, 11, 10), self.today,
+                                           today=self.today)
+                self.assertEqual(bucket_start(bucket, date(2021, 11, 10)),
+                                 candles[0]['bucket_start'])
+                for candle in candles:
+                    self.assertEqual(
+                        self.expected_candle('USD', bucket, candle['bucket_start']),
+                        {name: Decimal(str(candle[name]))
+                         for name in ('open', 'high', 'low', 'close')})
+
+    def test_closed_buckets_cached(self):
+        """
+        Test that only the current bucket is calculated again
+        :return:
+        """
+        currency_candles('month', [], date(2021, 10, 1), self.today, today=self.today)
+        with self.assertNumQueries(2):
+            candles = currency_candles('month', [], date(2021, 10, 1), self.today,
+                                       today=self.today)
+        self.assertEqual(8, len(candles))
+        self.assertEqual(currency_candles('month', [], date(2021, 10, 1), self.today,
+                                          today=date(2022, 3, 1)), candles)
+        self.assertEqual({date}, {type(candle['bucket_start']) for candle in candles})
+        self.assertEqual({Decimal}, {type(candle['high']) for candle in candles})
+
+    def test_ingest_invalidates_touched_buckets(self):
+        """
+        Test that backfilled rate of a closed bucket changes its candle
+        :return:
+        """
+        currency_candles('month', ['USD'], date(2021, 10, 1), self.today, today=self.today)
+        upsert_currency_rates({('USD', date(2021, 11, 15)): (Decimal('99.0000'), Decimal('1'))})
+        candles = currency_candles('month', ['USD'], date(2021, 10, 1), self.today,
+                                   today=self.today)
+        self.assertEqual('99.0000', str(candles[1]['high']))
+
+    def test_candles_endpoint(self):
+        """
+        Test endpoint filters and validation of bucket
+        :return:
+        """
+        response = self.client.get('/api/v1/currency_candles/', {
+            'bucket': 'quarter', 'currencies': 'eur', 'day_of_rate_gte': '2021-10-01',
+            'day_of_rate_lte': '2021-12-31'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([('EUR', date(2021, 10, 1))],
+                         [(candle['to_currency'], candle['bucket_start'])
+                          for candle in response.data['candles']])
+
+        response = self.client.get('/api/v1/currency_candles/', {'bucket': 'day'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
@@ -1,18 +1,182 @@
 """
     Collect all tests for celery tasks
 """
+import json
+import threading
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
+from django.db import IntegrityError
+from django.test import override_settings
 from rest_framework.test import APITestCase
-from currency_exchange.tasks import download_exchange_rates
+
+from currency_exchange.models import CurrencyRates, IngestCheckpoint
+from currency_exchange.tasks import BACKFILL_CHECKPOINT, UPSERT_ATTEMPTS, \
+    add_currency_rates_to_db, backfill_currency_rates, download_exchange_rates, lock_rates
+
+API_RESPONSE = {
+    'date': '01.12.2021',
+    'bank': 'PB',
+    'baseCurrencyLit': 'UAH',
+    'exchangeRate': [
+        {'baseCurrency': 'UAH', 'currency': 'USD', 'saleRate': 27.4, 'purchaseRate': 27.0},
+        {'baseCurrency': 'UAH', 'currency': 'EUR', 'saleRate': 31.05, 'purchaseRate': 30.45},
+        {'baseCurrency': 'UAH', 'currency': 'AZN', 'saleRateNB': 16.03,
+         'purchaseRateNB': 16.03},
+    ]
+}
 
 
 class TestAddTask(APITestCase):
 
-    def test_task_download_exchange_rates(self):
+    @override_settings(RATE_SOURCES=[{'BACKEND': 'currency_exchange.sources.PrivatBankSource'}])
+    @mock.patch('currency_exchange.sources.get_currency_rates', return_value=API_RESPONSE)
+    def test_task_download_exchange_rates(self, get_currency_rates):
         """
         Test celery tasks which upload currency rates to db
         :return:
         """
         results = download_exchange_rates.apply()
-        self.assertEqual(results.get(), 'Task download exchange rates executed successfully')
+        self.assertEqual(results.get(), {'inserted': 2, 'updated': 0, 'unchanged': 0})
         self.assertEqual(results.state, 'SUCCESS')
+
+    def test_add_currency_rates_is_idempotent(self):
+        """
+        Test that repeated ingest of the same payload doesn't change rows
+        :return:
+        """
+        add_currency_rates_to_db(API_RESPONSE)
+        self.assertEqual({'inserted': 0, 'updated': 0, 'unchanged': 2},
+                         add_currency_rates_to_db(API_RESPONSE))
+        self.assertEqual(2, CurrencyRates.objects.filter(day_of_rate=date(2021, 12, 1)).count())
+
+    def test_add_currency_rates_repairs_partial_day(self):
+        """
+        Test that ingest adds missing rows and updates changed rows of a day
+        :return:
+        """
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='27.1000',
+                                     purchase_rate='27.0000', day_of_rate=date(2021, 12, 1))
+
+        self.assertEqual({'inserted': 1, 'updated': 1, 'unchanged': 0},
+                         add_currency_rates_to_db(API_RESPONSE))
+        usd = CurrencyRates.objects.get(to_currency='USD', day_of_rate=date(2021, 12, 1))
+        self.assertEqual(Decimal('27.4000'), usd.sale_rate)
+
+    def test_rates_inserted_concurrently_are_not_counted(self):
+        """
+        Test that a rate inserted by another ingest after the select is compared
+        instead of being reported as inserted
+        :return:
+        """
+        def lock_and_insert(keys):
+            records = lock_rates(keys)
+            if not CurrencyRates.objects.exists():
+                CurrencyRates.objects.create(to_currency='USD', sale_rate='27.4000',
+                                             purchase_rate='27.0000',
+                                             day_of_rate=date(2021, 12, 1))
+            return records
+
+        with mock.patch('currency_exchange.tasks.lock_rates', lock_and_insert):
+            counts = add_currency_rates_to_db(API_RESPONSE)
+
+        self.assertEqual({'inserted': 1, 'updated': 0, 'unchanged': 1}, counts)
+        self.assertEqual(2, CurrencyRates.objects.filter(day_of_rate=date(2021, 12, 1)).count())
+
+    def test_upsert_gives_up_after_repeated_conflicts(self):
+        """
+        Test that insert conflicting on every attempt is retried a few times and then raised
+        :return:
+        """
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='27.4000',
+                                     purchase_rate='27.0000', day_of_rate=date(2021, 12, 1))
+
+        with mock.patch('currency_exchange.tasks.lock_rates', return_value={}) as lock, \
+                self.assertRaises(IntegrityError):
+            add_currency_rates_to_db(API_RESPONSE)
+        self.assertEqual(UPSERT_ATTEMPTS, lock.call_count)
+
+
+class StubPrivatBankHandler(BaseHTTPRequestHandler):
+    """
+    Local api which returns one USD rate for the requested day
+    """
+    requested_days = []
+
+    def do_GET(self):
+        day = parse_qs(urlparse(self.path).query)['date'][0]
+        self.requested_days.append(day)
+        body = json.dumps({'date': day, 'exchangeRate': [
+            {'currency': 'USD', 'saleRate': 27.4, 'purchaseRate': 27.0}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBackfill(APITestCase):
+
+    def setUp(self) -> None:
+        """
+        Start stub api in a thread
+        :return:
+        """
+        StubPrivatBankHandler.requested_days = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPrivatBankHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}/p24api/exchange_rates'
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_backfill_loads_every_day(self):
+        """
+        Test that backfill fetches each day of range and saves checkpoint
+        :return:
+        """
+        counts = backfill_currency_rates(date(2021, 1, 1), date(2021, 1, 20), workers=3,
+                                         requests_per_second=0, base_url=self.base_url)
+
+        self.assertEqual({'inserted': 20, 'updated': 0, 'unchanged': 0}, counts)
+        self.assertEqual(20, len(set(StubPrivatBankHandler.requested_days)))
+        self.assertEqual(date(2021, 1, 20),
+                         IngestCheckpoint.objects.get(name=f'{BACKFILL_CHECKPOINT}:2021-01-01').day)
+
+    def test_backfill_continues_from_checkpoint(self):
+        """
+        Test that repeated backfill requests only days after checkpoint
+        :return:
+        """
+        IngestCheckpoint.objects.create(name=f'{BACKFILL_CHECKPOINT}:2021-01-01',
+                                        day=date(2021, 1, 7))
+
+        backfill_currency_rates(date(2021, 1, 1), date(2021, 1, 10), requests_per_second=0,
+                                base_url=self.base_url)
+
+        self.assertEqual(['08.01.2021', '09.01.2021', '10.01.2021'],
+                         sorted(StubPrivatBankHandler.requested_days))
+
+    def test_backfill_with_later_end_extends_checkpoint(self):
+        """
+        Test that backfill resumed with a later last day, like the default today on the next
+        day, continues from checkpoint of the same first day
+        :return:
+        """
+        backfill_currency_rates(date(2021, 1, 1), date(2021, 1, 5), requests_per_second=0,
+                                base_url=self.base_url)
+        StubPrivatBankHandler.requested_days = []
+
+        backfill_currency_rates(date(2021, 1, 1), date(2021, 1, 7), requests_per_second=0,
+                                base_url=self.base_url)
+
+        self.assertEqual(['06.01.2021', '07.01.2021'], sorted(StubPrivatBankHandler.requested_days))
+        self.assertEqual(date(2021, 1, 7),
+                         IngestCheckpoint.objects.get(name=f'{BACKFILL_CHECKPOINT}:2021-01-01').day)
@@ -0,0 +1,117 @@
+"""
+    Collect all tests for cross rate conversion
+"""
+from datetime import date
+from decimal import Decimal
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.conversion import CrossRateCache, cross_rates
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class ConvertTestCase(APITestCase):
+    """
+    Class for testing convert endpoint
+    """
+
+    def setUp(self) -> None:
+        """
+        Ingest rates of two days
+        :return:
+        """
+        upsert_currency_rates({
+            ('USD', date(2022, 1, 10)): (Decimal('28.0000'), Decimal('27.5000')),
+            ('EUR', date(2022, 1, 10)): (Decimal('32.0000'), Decimal('31.0000')),
+            ('PLN', date(2022, 1, 10)): (Decimal('7.0000'), Decimal('6.5000')),
+            ('USD', date(2022, 1, 12)): (Decimal('29.0000'), Decimal('28.5000')),
+            ('EUR', date(2022, 1, 12)): (Decimal('33.0000'), Decimal('32.0000')),
+        })
+
+    def test_convert_pair(self):
+        """
+        Test that a pair is converted through the base currency
+        :return:
+        """
+        response = self.client.get('/api/v1/convert/', {'from_currency': 'eur', 'to_currency': 'PLN',
+                                                        'amount': 10, 'date': '2022-01-10'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(date(2022, 1, 10), response.data['day_of_rate'])
+        self.assertEqual(round(31 / 7, 6), response.data['rate'])
+        self.assertEqual(round(310 / 7, 4), response.data['result'])
+
+    def test_convert_uses_last_day_before_date(self):
+        """
+        Test that a day without rates uses the previous day with rates
+        :return:
+        """
+        response = self.client.get('/api/v1/convert/', {'from_currency': 'USD', 'to_currency': 'UAH',
+                                                        'date': '2022-01-11'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(date(2022, 1, 10), response.data['day_of_rate'])
+        self.assertEqual(27.5, response.data['result'])
+
+    def test_convert_errors(self):
+        """
+        Test unknown currency of the day and date before all rates
+        :return:
+        """
+        response = self.client.get('/api/v1/convert/', {'from_currency': 'PLN', 'to_currency': 'USD',
+                                                        'date': '2022-01-12'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        response = self.client.get('/api/v1/convert/', {'from_currency': 'EUR', 'to_currency': 'USD',
+                                                        'date': '2021-01-01'})
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        for amount in ('nan', 'inf', '-inf', '1e400', '-1'):
+            with self.subTest(amount=amount):
+                response = self.client.get('/api/v1/convert/', {
+                    'from_currency': 'EUR', 'to_currency': 'USD', 'amount': amount,
+                    'date': '2022-01-12'})
+                self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+                self.assertIn('amount', response.data)
+
+    def test_batch_convert(self):
+        """
+        Test that batch converts every item by rates of one day
+        :return:
+        """
+        response = self.client.post('/api/v1/convert/', {'date': '2022-01-12', 'items': [
+            {'from_currency': 'UAH', 'to_currency': 'USD', 'amount': 290},
+            {'from_currency': 'EUR', 'to_currency': 'USD', 'amount': 2},
+            {'from_currency': 'USD', 'to_currency': 'USD', 'amount': 5},
+        ]}, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([10.0, round(64 / 29, 4), 5.0],
+                         [item['result'] for item in response.data['results']])
+
+    def test_current_day_served_from_memory(self):
+        """
+        Test that repeated conversions don't query the db until rates change
+        :return:
+        """
+        params = {'from_currency': 'EUR', 'to_currency': 'USD', 'date': '2022-01-12'}
+        self.client.get('/api/v1/convert/', params)
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/convert/', params)
+
+        upsert_currency_rates({('USD', date(2022, 1, 12)): (Decimal('30.0000'), Decimal('29.0000'))})
+        response = self.client.get('/api/v1/convert/', dict(params, amount=30))
+        self.assertEqual(32.0, response.data['result'])
+        self.assertEqual(date(2022, 1, 12), cross_rates.get(date(2022, 1, 12)).day)
+
+    def test_requested_days_are_bounded(self):
+        """
+        Test that days without own rates don't grow the cache beyond its limit
+        and the recently requested ones are kept
+        :return:
+        """
+        cache = CrossRateCache(max_days=2, max_requested_days=3)
+        for day in range(13, 20):
+            self.assertEqual(date(2022, 1, 12), cache.get(date(2022, 1, day)).day)
+        cache.get(date(2022, 1, 17))
+        cache.get(date(2022, 1, 20))
+
+        self.assertEqual([date(2022, 1, 19), date(2022, 1, 17), date(2022, 1, 20)],
+                         list(cache.rate_days))
+        self.assertEqual(1, len(cache.matrices))
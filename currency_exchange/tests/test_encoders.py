@@ -0,0 +1,74 @@
+"""
+    Collect all tests for fast encoding of listings
+"""
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from currency_exchange.encoders import OrjsonRenderer, rates_row_encoder
+from currency_exchange.models import CurrencyRates
+from currency_exchange.serializers import CurrencyRatesSerializer
+
+
+class EncodersTestCase(APITestCase):
+    """
+    Class for testing that the fast path gives the same bytes as the serializer
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up data for tests
+        :return:
+        """
+        day = date(2021, 12, 1)
+        CurrencyRates.objects.bulk_create([
+            CurrencyRates(to_currency='USD', sale_rate='27.4', purchase_rate='27',
+                          day_of_rate=day),
+            CurrencyRates(to_currency='EUR', sale_rate='0.0001', purchase_rate='99.9999',
+                          day_of_rate=day - timedelta(days=1)),
+            CurrencyRates(to_currency='X\u2028Yé"', sale_rate='-1.5',
+                          purchase_rate='0', day_of_rate=day),
+        ])
+
+    def test_rows_are_rendered_like_serializer(self):
+        """
+        Test that values_list rows encoded and rendered with orjson are equal bytes
+        to the serializer output rendered with JSONRenderer
+        :return:
+        """
+        rates = CurrencyRates.objects.order_by('id')
+        expected = JSONRenderer().render(CurrencyRatesSerializer(rates, many=True).data)
+
+        rows = rates.values_list(*rates_row_encoder.sources)
+        self.assertEqual(expected, OrjsonRenderer().render(rates_row_encoder.encode_many(rows)))
+
+    def test_other_values_are_rendered_like_json_renderer(self):
+        """
+        Test that values unknown to orjson and nested dicts are rendered like JSONRenderer
+        :return:
+        """
+        data = OrderedDict([('count', 2), ('next', None), ('results', [
+            {'amount': Decimal('1.50'), 'created': datetime(2021, 12, 1, 10, 30, 15, 123456,
+                                                            tzinfo=timezone.utc),
+             'day': date(2021, 12, 1), 1: True, 'text': 'line \n\t'}])])
+
+        self.assertEqual(JSONRenderer().render(data), OrjsonRenderer().render(data))
+
+    def test_list_of_rates_is_not_changed(self):
+        """
+        Test that offset and keyset pages of rates give the serializer output
+        :return:
+        """
+        rates = CurrencyRates.objects.order_by('day_of_rate', 'id')
+        expected = CurrencyRatesSerializer(rates, many=True).data
+
+        offset = self.client.get('/api/v1/rates/?limit=10')
+        keyset = self.client.get('/api/v1/rates/?cursor=&limit=2')
+
+        self.assertEqual({rate['id']: rate for rate in expected},
+                         {rate['id']: rate for rate in offset.json()['results']})
+        self.assertEqual(expected[:2], keyset.json()['results'])
+        self.assertEqual(expected[2:], self.client.get(keyset.json()['next']).json()['results'])
@@ -0,0 +1,102 @@
+"""
+    Collect all tests for the latest rates endpoint
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.latest import LatestRatesPayload
+from currency_exchange.models import CurrencyRates
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class LatestRatesTestCase(APITestCase):
+    """
+    Class for testing latest rates served from memory
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up data for tests
+        :return:
+        """
+        today = date.today()
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='27.4000',
+                                     purchase_rate='27.0000', day_of_rate=today)
+        CurrencyRates.objects.create(to_currency='EUR', sale_rate='31.0000',
+                                     purchase_rate='30.5000', day_of_rate=today - timedelta(1))
+        CurrencyRates.objects.create(to_currency='EUR', sale_rate='31.0500',
+                                     purchase_rate='30.4500', day_of_rate=today)
+
+    def test_latest_rates_are_served_without_queries(self):
+        """
+        Test that the latest rate of every currency is returned and repeated requests
+        don't query the db
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/latest/')
+        with self.assertNumQueries(0):
+            repeated = self.client.get('/api/v1/rates/latest/')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(['EUR', 'USD'], [rate['to_currency'] for rate in response.json()])
+        self.assertEqual('31.0500', response.json()[0]['sale_rate'])
+        self.assertEqual(response.content, repeated.content)
+        self.assertEqual('application/json', response['Content-Type'])
+
+    def test_not_modified_for_known_etag(self):
+        """
+        Test that the client with the current ETag gets 304
+        :return:
+        """
+        etag = self.client.get('/api/v1/rates/latest/')['ETag']
+
+        response = self.client.get('/api/v1/rates/latest/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_etag_changes_next_day(self):
+        """
+        Test that the ETag of yesterday doesn't match, the latest rates depend on the day
+        :return:
+        """
+        etag = self.client.get('/api/v1/rates/latest/')['ETag']
+        tomorrow = date.today() + timedelta(days=1)
+
+        with mock.patch('currency_exchange.views.date') as views_date:
+            views_date.today.return_value = tomorrow
+            response = self.client.get('/api/v1/rates/latest/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_ingest_publishes_rates_for_other_workers(self):
+        """
+        Test that committed ingest renders new rates once and another worker takes them
+        from the shared cache without queries
+        :return:
+        """
+        self.client.get('/api/v1/rates/latest/')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_currency_rates({('USD', date.today()): (Decimal('28.1000'),
+                                                           Decimal('27.9000'))})
+
+        with self.assertNumQueries(0):
+            content = LatestRatesPayload().get()
+        response = self.client.get('/api/v1/rates/latest/')
+
+        self.assertEqual(content, response.content)
+        self.assertEqual('28.1000', json.loads(content)[1]['sale_rate'])
+
+    def test_not_allowed_method(self):
+        """
+        Test that only safe methods are allowed
+        :return:
+        """
+        response = self.client.post('/api/v1/rates/latest/')
+
+        self.assertEqual(status.HTTP_405_METHOD_NOT_ALLOWED, response.status_code)
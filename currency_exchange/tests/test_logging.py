@@ -0,0 +1,96 @@
+"""
+    Collect all tests for logging pipeline
+"""
+import json
+import logging
+import os
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from currency_exchange.log import JsonFormatter, QueueListenerHandler, SamplingFilter
+
+
+class LoggingTestCase(SimpleTestCase):
+    """
+    Class for testing formatter, sampling and queue handler
+    """
+
+    @staticmethod
+    def make_record(name: str, level: int, msg: str, *args, exc_info=None) -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info, func='view')
+
+    def test_json_formatter(self):
+        """
+        Test that record is one json line with merged arguments and exception
+        :return:
+        """
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            record = self.make_record('currency_exchange.views', logging.ERROR, 'User: %s', 'bob',
+                                      exc_info=sys.exc_info())
+        line = JsonFormatter().format(record)
+
+        self.assertNotIn('\n', line)
+        entry = json.loads(line)
+        self.assertEqual(('ERROR', 'currency_exchange.views', 'view', 'User: bob'),
+                         (entry['level'], entry['logger'], entry['function'], entry['message']))
+        self.assertIn('ValueError: broken', entry['exception'])
+
+    def test_sampling_filter(self):
+        """
+        Test that rates apply to child loggers and warnings always pass
+        :return:
+        """
+        sampling = SamplingFilter({'currency_exchange.views': 0, 'currency_exchange': 0.5})
+        self.assertFalse(sampling.filter(self.make_record('currency_exchange.views.rates',
+                                                          logging.DEBUG, 'skipped')))
+        self.assertTrue(sampling.filter(self.make_record('currency_exchange.views',
+                                                         logging.WARNING, 'kept')))
+        self.assertTrue(sampling.filter(self.make_record('django', logging.DEBUG, 'kept')))
+        with mock.patch('currency_exchange.log.random.random', return_value=0.7):
+            self.assertFalse(sampling.filter(self.make_record('currency_exchange.tasks',
+                                                              logging.INFO, 'skipped')))
+
+    def test_discarded_record_not_formatted(self):
+        """
+        Test that arguments of sampled out records are never formatted
+        :return:
+        """
+        argument = mock.MagicMock()
+        logger = logging.getLogger('sampling_test.views')
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        handler.addFilter(SamplingFilter({'sampling_test': 0}))
+        logger.addHandler(handler)
+        try:
+            logger.debug('User: %s', argument)
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual([], records)
+        argument.__str__.assert_not_called()
+
+    def test_queue_handler_writes_in_background(self):
+        """
+        Test that records reach target handlers through the queue and stay
+        after restart in forked process
+        :return:
+        """
+        records = []
+        target = logging.Handler()
+        target.emit = records.append
+        handler = QueueListenerHandler([target])
+        try:
+            handler.handle(self.make_record('currency_exchange', logging.INFO, 'rates %s', 1))
+            handler.listener.stop()
+            handler.restart()
+            handler.handle(self.make_record('currency_exchange', logging.INFO, 'rates %s', 2))
+        finally:
+            handler.close()
+        self.assertEqual(['rates 1', 'rates 2'], [record.getMessage() for record in records])
+        self.assertEqual(os.getpid(), records[0].process)
@@ -0,0 +1,119 @@
+"""
+    Collect all tests for metrics of requests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.models import CurrencyRates
+
+
+class MetricsTestCase(APITestCase):
+    """
+    Class for testing metrics middleware and endpoint
+    """
+
+    def setUp(self) -> None:
+        """
+        Create one rate
+        :return:
+        """
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='28.0000',
+                                     purchase_rate='27.5000', day_of_rate=date.today())
+
+    @staticmethod
+    def sample(name: str, route: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, {'route': route, 'method': 'GET', **labels}) or 0
+
+    def test_request_metrics(self):
+        """
+        Test that latency, queries and size are recorded by route
+        :return:
+        """
+        route = 'api/v1/rates/'
+        before = {name: self.sample(name, route) for name in (
+            'http_request_sql_queries_count', 'http_request_sql_queries_sum',
+            'http_response_size_bytes_sum')}
+        latency_before = self.sample('http_request_duration_seconds_count', route, status='200')
+
+        response = self.client.get('/api/v1/rates/', {'to_currency': 'USD'})
+        self.client.get('/api/v1/rates/', {'to_currency': 'EUR'})
+
+        self.assertEqual(2, self.sample('http_request_duration_seconds_count', route,
+                                        status='200') - latency_before)
+        self.assertEqual(2, self.sample('http_request_sql_queries_count', route)
+                         - before['http_request_sql_queries_count'])
+        self.assertGreater(self.sample('http_request_sql_queries_sum', route)
+                           - before['http_request_sql_queries_sum'], 0)
+        self.assertGreaterEqual(self.sample('http_response_size_bytes_sum', route)
+                                - before['http_response_size_bytes_sum'], len(response.content))
+
+    def test_metrics_endpoint(self):
+        """
+        Test that metrics are exposed in text format, unknown urls share one route
+        :return:
+        """
+        self.client.get('/api/v1/unknown/')
+        response = self.client.get('/metrics')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket{', response.content)
+        self.assertIn(b'route="<unresolved>"', response.content)
+
+
+class ServicesMetricsTestCase(APITestCase):
+    """
+    Class for testing metrics written by processes of other services
+    """
+
+    def test_rate_source_metrics_of_worker(self):
+        """
+        Test that fetches of rate sources in a celery process are exposed by /metrics
+        :return:
+        """
+        script = ('import django; django.setup()\n'
+                  'from datetime import date\n'
+                  'from currency_exchange.sources import fetch_source, get_session\n'
+                  'from currency_exchange.tests.test_sources import BrokenSource\n'
+                  'fetch_source(BrokenSource(), date.today(), get_session())\n')
+        with tempfile.TemporaryDirectory() as root:
+            os.mkdir(os.path.join(root, 'celery'))
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                       PROMETHEUS_MULTIPROC_DIR=os.path.join(root, 'celery'),
+                       DJANGO_ALLOWED_HOSTS='localhost')
+            subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                           cwd=settings.BASE_DIR, capture_output=True)
+            with override_settings(PROMETHEUS_MULTIPROC_ROOT=root):
+                response = self.client.get('/metrics')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn(b'rate_source_fetches_total{outcome="failed",source="broken"} 1.0',
+                      response.content)
+        self.assertIn(b'rate_source_fetch_duration_seconds_count{source="broken"} 1.0',
+                      response.content)
+
+
+class AsyncMetricsTestCase(TransactionTestCase):
+    """
+    Class for testing metrics of async views. Their queries run in other threads,
+    which can't use the transaction of a test case
+    """
+
+    def test_queries_of_async_view_counted(self):
+        """
+        Test that queries run in thread pool are counted for the request
+        :return:
+        """
+        route = 'api/v1/async/currency_statistics/'
+        before = MetricsTestCase.sample('http_request_sql_queries_sum', route)
+        self.assertEqual(status.HTTP_200_OK,
+                         self.client.get('/api/v1/async/currency_statistics/').status_code)
+        self.assertGreater(MetricsTestCase.sample('http_request_sql_queries_sum', route), before)
@@ -0,0 +1,96 @@
+"""
+    Collect all tests for keyset pagination
+"""
+import base64
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+
+
+class KeysetPaginationTestCase(APITestCase):
+    """
+    Class for testing keyset pagination of rates and users operations
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up data for tests
+        :return:
+        """
+        self.user_1 = User.objects.create(username='test_username_1')
+        for offset in range(5):
+            for currency in ('USD', 'EUR'):
+                CurrencyRates.objects.create(to_currency=currency, sale_rate='27.4000',
+                                             purchase_rate='27.0000',
+                                             day_of_rate=date(2021, 12, 5) - timedelta(days=offset))
+        rate = CurrencyRates.objects.first()
+        self.operations = [UsersExchangeOperations.objects.create(currency=rate, count=count,
+                                                                  user=self.user_1)
+                           for count in range(7)]
+
+    def collect_pages(self, url: str, params: dict) -> list:
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_rates_keyset_pages(self):
+        """
+        Test that cursors walk through rates ordered by day and id without count
+        :return:
+        """
+        pages = self.collect_pages('/api/v1/rates/', {'cursor': '', 'limit': 3})
+
+        rates = [rate['id'] for page in pages for rate in page['results']]
+        expected = list(CurrencyRates.objects.order_by('day_of_rate', 'id')
+                        .values_list('id', flat=True))
+        self.assertEqual(expected, rates)
+        self.assertEqual(4, len(pages))
+        self.assertNotIn('count', pages[0])
+
+    def test_operations_keyset_pages_with_count(self):
+        """
+        Test keyset pages of users operations with requested total count
+        :return:
+        """
+        self.client.force_login(self.user_1)
+        pages = self.collect_pages(reverse('users_exchange-list'),
+                                   {'cursor': '', 'limit': 5, 'with_count': 'true'})
+
+        self.assertEqual([operation.id for operation in self.operations],
+                         [operation['id'] for page in pages for operation in page['results']])
+        self.assertEqual(7, pages[0]['count'])
+
+    def test_offset_pagination_is_default(self):
+        """
+        Test that requests without cursor keep limit offset pagination
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/', {'limit': 3, 'offset': 3})
+
+        self.assertEqual(10, response.data['count'])
+        self.assertIn('offset=6', response.data['next'])
+
+    def test_invalid_cursor(self):
+        """
+        Test that broken cursor returns 404
+        :return:
+        """
+        response = self.client.get('/api/v1/rates/', {'cursor': 'broken'})
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        for position in (['not-a-date', 1], ['2020-01-01', 'abc'], [{'a': 1}, 1],
+                         ['2020-01-01', None]):
+            with self.subTest(position=position):
+                cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+                response = self.client.get('/api/v1/rates/', {'cursor': cursor})
+                self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
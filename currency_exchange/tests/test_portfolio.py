@@ -0,0 +1,104 @@
+"""
+    Collect all tests for portfolios of users
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from currency_exchange.models import CurrencyRates, UserPortfolio
+from currency_exchange.portfolio import lock_portfolios
+
+
+class PortfolioTestCase(APITestCase):
+    """
+    Class for testing portfolio endpoint and its maintenance
+    """
+
+    def setUp(self) -> None:
+        """
+        Set up rates of today and a user
+        :return:
+        """
+        self.user = User.objects.create(username='portfolio_user')
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='28.0000', purchase_rate='27.5000',
+                                     day_of_rate=date.today())
+        CurrencyRates.objects.create(to_currency='EUR', sale_rate='32.5000', purchase_rate='31.0000',
+                                     day_of_rate=date.today())
+        self.client.force_login(self.user)
+
+    def get_portfolio(self) -> list:
+        response = self.client.get('/api/v1/portfolio/')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [(item['to_currency'], item['count'], item['value'], item['operations'])
+                for item in response.data]
+
+    def test_portfolio_follows_operations(self):
+        """
+        Test that create, batch create and delete update totals
+        :return:
+        """
+        response = self.client.post(reverse('users_exchange-list'), {'count': 2, 'currency': 'USD'},
+                                    format='json')
+        self.client.post(reverse('users_exchange-batch'), [
+            {'count': 3, 'currency': 'USD'}, {'count': 4, 'currency': 'EUR'}], format='json')
+        self.assertEqual([('EUR', 4, '130.0000', 1), ('USD', 5, '140.0000', 2)],
+                         self.get_portfolio())
+
+        self.client.delete(reverse('users_exchange-detail', args=(response.data['id'],)))
+        self.assertEqual([('EUR', 4, '130.0000', 1), ('USD', 3, '84.0000', 1)],
+                         self.get_portfolio())
+
+        with self.assertNumQueries(3):
+            # session, user, portfolio
+            self.get_portfolio()
+
+    def test_portfolio_inserted_concurrently(self):
+        """
+        Test that a portfolio inserted by another request after the select is added to
+        :return:
+        """
+        def lock_and_insert(user, currencies):
+            portfolios = lock_portfolios(user, currencies)
+            if not UserPortfolio.objects.exists():
+                UserPortfolio.objects.create(user=user, to_currency='USD', count=1,
+                                             value=Decimal('28'), operations=1)
+            return portfolios
+
+        with mock.patch('currency_exchange.portfolio.lock_portfolios', lock_and_insert):
+            response = self.client.post(reverse('users_exchange-list'),
+                                        {'count': 2, 'currency': 'USD'}, format='json')
+
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual([('USD', 3, '84.0000', 2)], self.get_portfolio())
+
+    def test_rebuild_portfolios(self):
+        """
+        Test that command restores totals from operations and reports mismatches
+        :return:
+        """
+        self.client.post(reverse('users_exchange-batch'), [
+            {'count': 3, 'currency': 'USD'}, {'count': 4, 'currency': 'EUR'}], format='json')
+        UserPortfolio.objects.filter(to_currency='USD').update(count=100)
+
+        output = StringIO()
+        call_command('rebuild_portfolios', stdout=output)
+
+        self.assertIn('1 did not match', output.getvalue())
+        self.assertEqual(Decimal('84.0000'), UserPortfolio.objects.get(to_currency='USD').value)
+        self.assertEqual(3, UserPortfolio.objects.get(to_currency='USD').count)
+
+    def test_portfolio_requires_authentication(self):
+        """
+        Test that anonymous user gets no portfolio
+        :return:
+        """
+        self.client.logout()
+        response = self.client.get('/api/v1/portfolio/')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
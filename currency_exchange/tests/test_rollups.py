@@ -0,0 +1,78 @@
+"""
+    Collect all tests for rollups of currency rates
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Max, Min
+from django.test import TestCase
+
+from currency_exchange.models import CurrencyRates, CurrencyRatesRollup
+from currency_exchange.rollups import currency_statistics, rebuild_rollups
+from currency_exchange.tasks import upsert_currency_rates
+
+
+class RollupsTestCase(TestCase):
+    """
+    Class for testing rollups
+    """
+
+    def setUp(self) -> None:
+        """
+        Ingest daily rates of two currencies during three years
+        :return:
+        """
+        rates = {}
+        day = date(2019, 11, 20)
+        while day <= date(2022, 2, 10):
+            sale_rate = Decimal(day.toordinal() % 97 + 1).quantize(Decimal('0.0001'))
+            rates[('USD', day)] = (sale_rate, sale_rate)
+            rates[('EUR', day)] = (sale_rate + 1, sale_rate)
+            day += timedelta(days=1)
+        upsert_currency_rates(rates)
+
+    def assert_statistics(self, low: date, high: date):
+        expected = list(CurrencyRates.objects.filter(day_of_rate__range=[low, high])
+                        .values('to_currency').annotate(min=Min('sale_rate'), max=Max('sale_rate'))
+                        .order_by('to_currency'))
+        self.assertEqual(expected, currency_statistics(low, high))
+
+    def test_statistics_match_rates(self):
+        """
+        Test that statistics from rollups and edge days equal aggregate over rates
+        :return:
+        """
+        ranges = [(date(1970, 1, 1), date(2999, 12, 31)), (date(2019, 12, 15), date(2021, 3, 3)),
+                  (date(2020, 1, 1), date(2020, 12, 31)), (date(2020, 2, 10), date(2020, 2, 20)),
+                  (date(2020, 2, 1), date(2020, 4, 30)), (date(2021, 7, 5), date(2022, 1, 31))]
+        for low, high in ranges:
+            with self.subTest(low=low, high=high):
+                self.assert_statistics(low, high)
+
+    def test_rollups_follow_updated_rates(self):
+        """
+        Test that changed rates refresh month and year rollups
+        :return:
+        """
+        upsert_currency_rates({('USD', date(2020, 6, 15)): (Decimal('99.9000'), Decimal('1'))})
+        CurrencyRates.objects.filter(to_currency='EUR', day_of_rate=date(2020, 6, 16)).delete()
+
+        self.assertEqual(Decimal('99.9000'), CurrencyRatesRollup.objects.get(
+            to_currency='USD', period='year', period_start=date(2020, 1, 1)).max_rate)
+        self.assertEqual(29, CurrencyRatesRollup.objects.get(
+            to_currency='EUR', period='month', period_start=date(2020, 6, 1)).count)
+        self.assert_statistics(date(2019, 12, 15), date(2021, 3, 3))
+
+    def test_rebuild_rollups(self):
+        """
+        Test that rebuild produces the same rollups as incremental refresh
+        :return:
+        """
+        fields = ('to_currency', 'period', 'period_start', 'min_rate', 'max_rate', 'first_rate',
+                  'last_rate', 'first_day', 'last_day', 'count')
+        incremental = list(CurrencyRatesRollup.objects.order_by(*fields[:3]).values_list(*fields))
+
+        rebuild_rollups()
+
+        self.assertEqual(incremental,
+                         list(CurrencyRatesRollup.objects.order_by(*fields[:3]).values_list(*fields)))
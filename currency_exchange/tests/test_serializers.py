@@ -2,7 +2,7 @@
     Collect all tests for serializers
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.contrib.auth.models import User
 from django.db import models
@@ -105,3 +105,30 @@ class SerializersTestCase(TestCase):
             "password": 'User_test'
         }
         self.assertEqual(expected_data, result)
+
+    def test_operation_currency_resolved_from_latest_rates(self):
+        """
+        Test that currency of a new operation is the latest rate on or before today
+        and the lookup doesn't query the db once the snapshot is loaded
+        :return:
+        """
+        today = datetime.today().date()
+        CurrencyRates.objects.create(to_currency='CHF', sale_rate='31.0000', purchase_rate='30.0000',
+                                     day_of_rate=today - timedelta(days=1))
+        CurrencyRates.objects.create(to_currency='CHF', sale_rate='33.0000', purchase_rate='32.0000',
+                                     day_of_rate=today + timedelta(days=1))
+        CurrencyRates.objects.create(to_currency='USD', sale_rate='28.0000', purchase_rate='27.0000',
+                                     day_of_rate=today - timedelta(days=3))
+
+        serializer = GetUsersExchangeOperationsSerializer(data={'count': 1, 'currency': 'CHF'})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(self.cur_1, serializer.validated_data['currency'])
+
+        with self.assertNumQueries(0):
+            serializer = GetUsersExchangeOperationsSerializer(data={'count': 1, 'currency': 'USD'})
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(today - timedelta(days=3), serializer.validated_data['currency'].day_of_rate)
+
+        serializer = GetUsersExchangeOperationsSerializer(data={'count': 1, 'currency': 'XXX'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('currency', serializer.errors)
@@ -0,0 +1,289 @@
+"""
+    Collect all tests for sources of rates
+"""
+import json
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from currency_exchange.cache import get_data_version
+from currency_exchange.models import CurrencyRates, SourcePayloadHash
+from currency_exchange.sources import CircuitBreaker, FileSource, NBUSource, \
+    PrivatBankSource, RateSource, fetch_rates, reset_breakers
+from currency_exchange.tasks import download_exchange_rates, poll_exchange_rates, \
+    upsert_currency_rates
+
+DAY = date(2021, 12, 1)
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    """
+    Local PrivatBank api with USD and EUR rates and NBU api with USD and PLN rates
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        if url.path == '/nbu':
+            day = date(int(query['date'][0][:4]), int(query['date'][0][4:6]),
+                       int(query['date'][0][6:]))
+            data = [{'cc': 'USD', 'rate': 27.2, 'exchangedate': f'{day:%d.%m.%Y}'},
+                    {'cc': 'PLN', 'rate': 6.6412, 'exchangedate': f'{day:%d.%m.%Y}'}]
+        else:
+            data = {'date': query['date'][0], 'exchangeRate': [
+                {'currency': 'USD', 'saleRate': 27.4, 'purchaseRate': 27.0},
+                {'currency': 'EUR', 'saleRate': 31.05, 'purchaseRate': 30.45}]}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BrokenSource(RateSource):
+    """
+    Source which api is down
+    """
+    name = 'broken'
+
+    def fetch(self, day, session):
+        raise requests.ConnectionError('api is down')
+
+
+class TestSources(TestCase):
+
+    def setUp(self) -> None:
+        """
+        Start stub apis in a thread and close circuits left by other tests
+        :return:
+        """
+        reset_breakers()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubApiHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.privatbank = PrivatBankSource(url=f'{base_url}/p24api/exchange_rates')
+        self.nbu = NBUSource(url=f'{base_url}/nbu')
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_rates_are_merged_by_priority(self):
+        """
+        Test that a rate is taken from the first source which has it
+        :return:
+        """
+        rates, owners, reports = fetch_rates(DAY, [self.privatbank, self.nbu])
+
+        self.assertEqual({('USD', DAY): (Decimal('27.4000'), Decimal('27.0000')),
+                          ('EUR', DAY): (Decimal('31.0500'), Decimal('30.4500')),
+                          ('PLN', DAY): (Decimal('6.6412'), Decimal('6.6412'))}, rates)
+        self.assertEqual({('USD', DAY): 'privatbank', ('EUR', DAY): 'privatbank',
+                          ('PLN', DAY): 'nbu'}, owners)
+        self.assertEqual({'status': 'ok', 'rates': 2, 'taken': 2},
+                         {key: reports['privatbank'][key] for key in ('status', 'rates', 'taken')})
+        self.assertEqual({'status': 'ok', 'rates': 2, 'taken': 1},
+                         {key: reports['nbu'][key] for key in ('status', 'rates', 'taken')})
+
+    def test_file_source_returns_rates_of_the_day(self):
+        """
+        Test that file source skips rows of other days
+        :return:
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump([{'currency': 'USD', 'day': '2021-12-01', 'sale_rate': '28',
+                        'purchase_rate': '27.5'},
+                       {'currency': 'USD', 'day': '2021-12-02', 'sale_rate': '29',
+                        'purchase_rate': '28.5'}], file)
+            file.flush()
+            rates, _, _ = fetch_rates(DAY, [FileSource(path=file.name), self.privatbank])
+
+        self.assertEqual((Decimal('28.0000'), Decimal('27.5000')), rates[('USD', DAY)])
+        self.assertEqual((Decimal('31.0500'), Decimal('30.4500')), rates[('EUR', DAY)])
+
+    def test_malformed_payload_fails_only_its_source(self):
+        """
+        Test that non numeric, nan and infinite rates fail the source like a broken api
+        :return:
+        """
+        for value in ('n/a', 'NaN', 'Infinity'):
+            with self.subTest(value=value), \
+                    tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+                json.dump([{'currency': 'USD', 'day': '2021-12-01', 'sale_rate': value,
+                            'purchase_rate': '27.5'}], file)
+                file.flush()
+                reset_breakers()
+                rates, _, reports = fetch_rates(DAY, [FileSource(path=file.name),
+                                                       self.privatbank])
+
+                self.assertEqual('failed', reports['file']['status'])
+                self.assertEqual((Decimal('27.4000'), Decimal('27.0000')), rates[('USD', DAY)])
+
+    @override_settings(RATE_SOURCE_FAILURE_THRESHOLD=2)
+    def test_failing_source_is_skipped_after_threshold(self):
+        """
+        Test that other sources still give rates and a failing source isn't called
+        after failures in a row
+        :return:
+        """
+        def failures(outcome):
+            return REGISTRY.get_sample_value(
+                'rate_source_fetches_total', {'source': 'broken', 'outcome': outcome}) or 0
+
+        failed, skipped = failures('failed'), failures('skipped')
+        statuses = []
+        for _ in range(3):
+            rates, _, reports = fetch_rates(DAY, [BrokenSource(), self.nbu])
+            statuses.append(reports['broken']['status'])
+            self.assertEqual(2, len(rates))
+
+        self.assertEqual(['failed', 'failed', 'skipped'], statuses)
+        self.assertEqual(2, failures('failed') - failed)
+        self.assertEqual(1, failures('skipped') - skipped)
+
+
+class TestCircuitBreaker(TestCase):
+
+    def test_circuit_is_half_open_after_cooldown(self):
+        """
+        Test that one call is let through after cooldown and its failure opens circuit again
+        :return:
+        """
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        with mock.patch('currency_exchange.sources.time.monotonic', return_value=100):
+            breaker.failure()
+            self.assertTrue(breaker.allow())
+            breaker.failure()
+            self.assertFalse(breaker.allow())
+        with mock.patch('currency_exchange.sources.time.monotonic', return_value=160):
+            self.assertTrue(breaker.allow())
+            breaker.failure()
+            self.assertFalse(breaker.allow())
+        with mock.patch('currency_exchange.sources.time.monotonic', return_value=220):
+            self.assertTrue(breaker.allow())
+            breaker.success()
+            breaker.failure()
+            self.assertTrue(breaker.allow())
+
+
+class TestDownloadTask(TestCase):
+
+    def setUp(self) -> None:
+        """
+        Rates of today in a file source which has lower priority than a broken source
+        :return:
+        """
+        reset_breakers()
+        self.file = tempfile.NamedTemporaryFile('w', suffix='.json')
+        self.addCleanup(self.file.close)
+        json.dump([{'currency': currency, 'day': str(date.today()), 'sale_rate': '28',
+                    'purchase_rate': '27.5'} for currency in ('USD', 'PLN')], self.file)
+        self.file.flush()
+        self.sources = [{'BACKEND': 'currency_exchange.tests.test_sources.BrokenSource'},
+                        {'BACKEND': 'currency_exchange.sources.FileSource',
+                         'PATH': self.file.name}]
+
+    def test_task_writes_rates_of_available_sources(self):
+        """
+        Test that daily task writes rates even when one of sources is down
+        :return:
+        """
+        with override_settings(RATE_SOURCES=self.sources):
+            counts = download_exchange_rates.apply().get()
+
+        self.assertEqual({'inserted': 2, 'updated': 0, 'unchanged': 0}, counts)
+        rate = CurrencyRates.objects.get(to_currency='USD', day_of_rate=date.today())
+        self.assertEqual((Decimal('28.0000'), 'file'), (rate.sale_rate, rate.source))
+
+    def test_less_trusted_source_keeps_rates_of_higher_priority(self):
+        """
+        Test that rates written by the broken source, when it was up, aren't replaced
+        by the file source
+        :return:
+        """
+        with override_settings(RATE_SOURCES=self.sources):
+            upsert_currency_rates({('USD', date.today()): (Decimal('29'), Decimal('28'))},
+                                  {('USD', date.today()): 'broken'})
+            counts = download_exchange_rates()
+
+        self.assertEqual({'inserted': 1, 'updated': 0, 'unchanged': 1}, counts)
+        rate = CurrencyRates.objects.get(to_currency='USD', day_of_rate=date.today())
+        self.assertEqual((Decimal('29.0000'), 'broken'), (rate.sale_rate, rate.source))
+
+    def test_task_fails_when_no_source_answered(self):
+        """
+        Test that the task raises instead of reporting success with nothing written
+        :return:
+        """
+        with override_settings(RATE_SOURCES=self.sources[:1]), \
+                self.assertLogs('currency_exchange.tasks', 'ERROR'), \
+                self.assertRaises(RuntimeError):
+            download_exchange_rates()
+
+
+class TestPollTask(TestCase):
+
+    def setUp(self) -> None:
+        """
+        Poll a file source with one USD rate of today
+        :return:
+        """
+        reset_breakers()
+        self.file = tempfile.NamedTemporaryFile('w', suffix='.json')
+        self.addCleanup(self.file.close)
+        self.write_rate('28')
+        self.settings = override_settings(RATE_SOURCES=[
+            {'BACKEND': 'currency_exchange.sources.FileSource', 'PATH': self.file.name}])
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def write_rate(self, sale_rate: str) -> None:
+        self.file.seek(0)
+        self.file.truncate()
+        json.dump([{'currency': 'USD', 'day': str(date.today()), 'sale_rate': sale_rate,
+                    'purchase_rate': '27.5'}], self.file)
+        self.file.flush()
+
+    def test_unchanged_payload_skips_db_and_caches(self):
+        """
+        Test that repeated poll with the same rates runs only the select of hashes
+        and keeps data version
+        :return:
+        """
+        self.assertEqual({'inserted': 1, 'updated': 0, 'unchanged': 0}, poll_exchange_rates())
+        version = get_data_version()
+
+        with self.assertNumQueries(1):
+            counts = poll_exchange_rates()
+
+        self.assertEqual({'inserted': 0, 'updated': 0, 'unchanged': 1}, counts)
+        self.assertEqual(version, get_data_version())
+
+    def test_changed_payload_updates_rates_and_hash(self):
+        """
+        Test that poll writes changed rates, bumps data version and saves the new hash
+        :return:
+        """
+        poll_exchange_rates()
+        digest = SourcePayloadHash.objects.get(source='file', day=date.today()).digest
+        version = get_data_version()
+        self.write_rate('28.5')
+
+        self.assertEqual({'inserted': 0, 'updated': 1, 'unchanged': 0}, poll_exchange_rates())
+        self.assertLess(version, get_data_version())
+        self.assertNotEqual(digest,
+                            SourcePayloadHash.objects.get(source='file', day=date.today()).digest)
+        self.assertEqual(Decimal('28.5000'), CurrencyRates.objects.get(
+            to_currency='USD', day_of_rate=date.today()).sale_rate)
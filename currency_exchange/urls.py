@@ -5,12 +5,22 @@
 from django.urls import path
 from rest_framework.routers import SimpleRouter
 
+from currency_exchange import async_views
 from currency_exchange.views import CurrencyRatesViewSet, CurrencyRatesStatistic, UsersExchangeOperationsView, \
-    UserRegistrationView, APIChangePasswordView, UserRetrieveUpdateAPIView
+    UserRegistrationView, APIChangePasswordView, UserRetrieveUpdateAPIView, ConvertView, \
+    CurrencyRatesAnalytics, CurrencyRatesCandles, UserPortfolioView, latest_rates_view
 
 urlpatterns = [
     path('currency_statistics/', CurrencyRatesStatistic.as_view()),
-    path('change_password/', APIChangePasswordView.as_view())
+    path('change_password/', APIChangePasswordView.as_view()),
+    path('convert/', ConvertView.as_view()),
+    path('currency_analytics/', CurrencyRatesAnalytics.as_view()),
+    path('currency_candles/', CurrencyRatesCandles.as_view()),
+    path('portfolio/', UserPortfolioView.as_view()),
+    path('rates/latest/', latest_rates_view),
+    path('async/rates/', async_views.rates_list),
+    path('async/rates/latest/', async_views.rates_latest),
+    path('async/currency_statistics/', async_views.rates_statistics),
 ]
 
 router = SimpleRouter()
@@ -2,30 +2,84 @@
     Collect all views for app currency exchange
 """
 
+import hashlib
 import logging
+from datetime import date
 
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Min, Max
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import generics, mixins, viewsets
+from rest_framework import generics, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from currency_exchange.analytics import currency_analytics
+from currency_exchange.authentication import StatelessSchemeAuthentication
+from currency_exchange.cache import get_data_modified, get_data_version, rates_list_cache
+from currency_exchange.candles import currency_candles
+from currency_exchange.conversion import cross_rates
+from currency_exchange.encoders import OrjsonRenderer, rates_row_encoder
+from currency_exchange.export import EXPORT_FORMATS, keyset_pages
 from currency_exchange.filters import FilterCurrency
-from currency_exchange.models import CurrencyRates, UsersExchangeOperations
+from currency_exchange.latest import latest_rates_payload
+from currency_exchange.models import CurrencyRates, UserPortfolio, UsersExchangeOperations
+from currency_exchange.negotiation import IgnoreClientContentNegotiation
+from currency_exchange.pagination import OperationsPagination, RatesPagination
 from currency_exchange.permissions import IsOwner
+from currency_exchange.portfolio import update_portfolio
+from currency_exchange.rollups import currency_statistics
 from currency_exchange.serializers import CurrencyRatesSerializer, GetUsersExchangeOperationsSerializer, \
-    UserCreateSerializer, UserSerializer, UserPasswordChangeSerializer
+    UserCreateSerializer, UserSerializer, UserPasswordChangeSerializer, CurrencyStatisticsFilterSerializer, \
+    ConversionRequestSerializer, BatchConversionRequestSerializer, CurrencyAnalyticsFilterSerializer, \
+    CurrencyCandlesFilterSerializer, UserPortfolioSerializer
 
-logger = logging.getLogger('currency_exchange')
+logger = logging.getLogger('currency_exchange.views')
+
+
+def conditional_get(request, validator: str, build_response):
+    """
+    Return 304 if ETag or Last-Modified known to the client still match rates data,
+    otherwise build the response. Validators depend on the data version, so any ingest
+    outdates them.
+    :param request: request
+    :param validator: string which identifies content of the response
+    :param build_response: callable which returns full response
+    :return: response
+    """
+    etag = quote_etag(hashlib.sha1(f'{get_data_version()}:{validator}'.encode()).hexdigest())
+    last_modified = get_data_modified()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@require_safe
+def latest_rates_view(request):
+    """
+    Latest rate of every currency. Bytes are rendered once per data version and day and kept
+    in memory of the worker
+    """
+    return conditional_get(request, f'latest:{date.today()}', lambda: HttpResponse(
+        latest_rates_payload.get(), content_type='application/json'))
 
 
 class CurrencyRatesViewSet(mixins.ListModelMixin, GenericViewSet):
@@ -34,8 +88,11 @@ class CurrencyRatesViewSet(mixins.ListModelMixin, GenericViewSet):
     """
     queryset = CurrencyRates.objects.all()
     serializer_class = CurrencyRatesSerializer
+    authentication_classes = [StatelessSchemeAuthentication]
+    renderer_classes = [OrjsonRenderer, BrowsableAPIRenderer]
     filter_backends = [DjangoFilterBackend]
     filter_class = FilterCurrency
+    pagination_class = RatesPagination
 
     @extend_schema(
         parameters=[
@@ -50,9 +107,77 @@ class CurrencyRatesViewSet(mixins.ListModelMixin, GenericViewSet):
                              description='Set the currency code for filtering currency'),
         ])
     def list(self, request, *args, **kwargs):
-        logger.debug(f'User: {request.user} get response by url {request.get_full_path()}'
-                     f'with args: {args} {kwargs}')
-        return super().list(request, *args, **kwargs)
+        """
+        Return page of rates. Pages are cached until rates are changed
+        """
+        logger.debug('User: %s get response by url %s with args: %s %s', request.user,
+                     request.get_full_path(), args, kwargs)
+        key = rates_list_cache.make_key(request, self.cache_params())
+        return conditional_get(request, key,
+                               lambda: self.cached_list(key, request, *args, **kwargs))
+
+    def cached_list(self, key: str, request, *args, **kwargs):
+        """
+        Return page of rates from cache or build it and put to cache
+        """
+        data = rates_list_cache.get(key)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        response = self.fast_list()
+        if response.status_code == status.HTTP_200_OK:
+            rates_list_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("export_format", OpenApiTypes.STR, OpenApiParameter.QUERY,
+                             enum=sorted(EXPORT_FORMATS),
+                             description='Format of file. csv by default'),
+        ],
+        responses={(200, content_type): OpenApiTypes.BINARY
+                   for content_type, _ in EXPORT_FORMATS.values()})
+    @action(detail=False, methods=['get'], pagination_class=None,
+            content_negotiation_class=IgnoreClientContentNegotiation)
+    def export(self, request):
+        """
+        Stream all filtered rates as csv or ndjson file. Rows are read from the db in keyset
+        pages, so memory use doesn't depend on the size of the range. Under ASGI every page
+        is read in the thread pool by StreamingASGIHandler.
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': f'Choose one of: {", ".join(EXPORT_FORMATS)}'})
+
+        pages = keyset_pages(self.filter_queryset(self.get_queryset()))
+        content_type, encode = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(encode(pages), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="rates.{export_format}"'
+        return response
+
+    def fast_list(self):
+        """
+        Page of rates encoded from values_list rows, the same output as from the serializer
+        without model instances
+        """
+        rows = self.filter_queryset(self.get_queryset()).values_list(*rates_row_encoder.sources)
+        self.paginator.row_fields = rates_row_encoder.sources
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(rates_row_encoder.encode_many(rows))
+        return self.get_paginated_response(rates_row_encoder.encode_many(page))
+
+    def cache_params(self) -> list:
+        """
+        Names of query parameters which change the response
+        """
+        pagination = self.paginator
+        return list(self.filter_class.base_filters) + [
+            getattr(pagination, name) for name in ('limit_query_param', 'offset_query_param',
+                                                    'page_query_param', 'cursor_query_param',
+                                                    'count_query_param')
+            if hasattr(pagination, name)]
 
 
 class CurrencyRatesStatistic(APIView):
@@ -60,6 +185,7 @@ class CurrencyRatesStatistic(APIView):
     View to get statistics during some periods by currency name.
     Statistic like min and max
     """
+    authentication_classes = [StatelessSchemeAuthentication]
 
     @extend_schema(
         parameters=[
@@ -73,13 +199,116 @@ class CurrencyRatesStatistic(APIView):
         """
         Return min max rates for all currency according to filter by date
         """
-        date_filter_lte = request.data.get('date_filter_lte', '2999-12-31')
-        date_filter_gte = request.data.get('date_filter_gte', '1970-01-01')
-        statistic = CurrencyRates.objects. \
-            filter(day_of_rate__range=[date_filter_gte, date_filter_lte]).values('to_currency') \
-            .annotate(min=Min('sale_rate'), max=Max('sale_rate'))
-        logger.debug(f'User: {request.user} get response {statistic}')
-        return Response({'statistics': statistic})
+        date_filter = CurrencyStatisticsFilterSerializer(data=request.data)
+        date_filter.is_valid(raise_exception=True)
+        low = date_filter.validated_data['date_filter_gte']
+        high = date_filter.validated_data['date_filter_lte']
+
+        def build_response():
+            statistic = currency_statistics(low, high)
+            logger.debug('User: %s get statistics from %s to %s', request.user, low, high)
+            return Response({'statistics': statistic})
+
+        return conditional_get(request, f'statistics:{low}:{high}', build_response)
+
+
+class CurrencyRatesAnalytics(APIView):
+    """
+    View to get analytics of currency rates series: mean, standard deviation, percentiles,
+    volatility of daily returns, spread and moving average
+    """
+    authentication_classes = [StatelessSchemeAuthentication]
+
+    @extend_schema(parameters=[CurrencyAnalyticsFilterSerializer])
+    def get(self, request, format=None):
+        """
+        Return metrics of every requested currency according to filter by date
+        """
+        analytics_filter = CurrencyAnalyticsFilterSerializer(data=request.query_params)
+        analytics_filter.is_valid(raise_exception=True)
+        data = analytics_filter.validated_data
+        analytics = currency_analytics(data['currencies'], data['day_of_rate_gte'],
+                                       data['day_of_rate_lte'], data['metrics'], data['window'],
+                                       tuple(data['percentiles']))
+        return Response({'analytics': analytics})
+
+
+class CurrencyRatesCandles(APIView):
+    """
+    View to get open, high, low, close candles of sale rates by week, month, quarter or year.
+    Every bucket overlapping the date range is returned whole.
+    """
+    authentication_classes = [StatelessSchemeAuthentication]
+
+    @extend_schema(parameters=[CurrencyCandlesFilterSerializer])
+    def get(self, request, format=None):
+        """
+        Return candles of every currency according to filter by date
+        """
+        candles_filter = CurrencyCandlesFilterSerializer(data=request.query_params)
+        candles_filter.is_valid(raise_exception=True)
+        data = candles_filter.validated_data
+        candles = currency_candles(data['bucket'], data['currencies'], data['day_of_rate_gte'],
+                                   data['day_of_rate_lte'])
+        return Response({'bucket': data['bucket'], 'candles': candles})
+
+
+class ConvertView(APIView):
+    """
+    View to convert amounts between any two currencies by cross rates of a day.
+    Rates of the last day with rates on or before the requested date are used.
+    """
+    authentication_classes = [StatelessSchemeAuthentication]
+
+    @extend_schema(parameters=[ConversionRequestSerializer])
+    def get(self, request, format=None):
+        """
+        Convert one amount
+        """
+        conversion = ConversionRequestSerializer(data=request.query_params)
+        conversion.is_valid(raise_exception=True)
+        data = conversion.validated_data
+        matrix = self.get_matrix(data['date'], [data['from_currency'], data['to_currency']])
+        rate = matrix.rate(data['from_currency'], data['to_currency'])
+        return Response({
+            'day_of_rate': matrix.day,
+            'from_currency': data['from_currency'],
+            'to_currency': data['to_currency'],
+            'amount': data['amount'],
+            'rate': round(rate, 6),
+            'result': round(rate * data['amount'], 4),
+        })
+
+    @extend_schema(request=BatchConversionRequestSerializer)
+    def post(self, request, format=None):
+        """
+        Convert many amounts in one vectorized call
+        """
+        conversion = BatchConversionRequestSerializer(data=request.data)
+        conversion.is_valid(raise_exception=True)
+        items = conversion.validated_data['items']
+        from_currencies = [item['from_currency'] for item in items]
+        to_currencies = [item['to_currency'] for item in items]
+        matrix = self.get_matrix(conversion.validated_data['date'], from_currencies + to_currencies)
+        results = matrix.convert(from_currencies, to_currencies,
+                                 [item['amount'] for item in items]).round(4)
+        return Response({
+            'day_of_rate': matrix.day,
+            'results': [dict(item, result=result) for item, result in zip(items, results.tolist())],
+        })
+
+    @staticmethod
+    def get_matrix(day, currencies: list):
+        """
+        Cross rates matrix of the day which knows all the currencies
+        """
+        matrix = cross_rates.get(day)
+        if matrix is None:
+            raise NotFound(f'No currency rates on or before {day}')
+        unknown = matrix.unknown(currencies)
+        if unknown:
+            raise ValidationError({'currency': f'No rates on {matrix.day} for: {", ".join(unknown)}'})
+        return matrix
 
 
 class UsersExchangeOperationsView(mixins.CreateModelMixin,
@@ -92,6 +321,8 @@ class UsersExchangeOperationsView(mixins.CreateModelMixin,
 
     permission_classes = [IsAuthenticated]
     serializer_class = GetUsersExchangeOperationsSerializer
+    pagination_class = OperationsPagination
+    max_batch_size = 1000
 
     def perform_create(self, serializer):
         """
@@ -99,7 +330,38 @@ class UsersExchangeOperationsView(mixins.CreateModelMixin,
         :param serializer: serializer
         :return:
         """
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            created = serializer.save(user=self.request.user)
+            update_portfolio(self.request.user, created if isinstance(created, list) else [created])
+
+    def perform_destroy(self, instance):
+        """
+        Called by DestroyModelMixin when deleting an object instance.
+        :param instance: operation
+        :return:
+        """
+        with transaction.atomic():
+            update_portfolio(self.request.user, [instance], sign=-1)
+            instance.delete()
+
+    @extend_schema(request=GetUsersExchangeOperationsSerializer(many=True),
+                   responses={201: GetUsersExchangeOperationsSerializer(many=True)})
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Create a list of operations in one transaction. Currencies are resolved from
+        the latest rates snapshot and all operations are inserted with one query.
+        Nothing is created if any item is invalid, errors are listed per item.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError({'non_field_errors': ['Expected a non empty list of operations.']})
+        if len(request.data) > self.max_batch_size:
+            raise ValidationError({'non_field_errors': [
+                f'Ensure this list has no more than {self.max_batch_size} operations.']})
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def get_queryset(self):
         """
@@ -107,11 +369,28 @@ class UsersExchangeOperationsView(mixins.CreateModelMixin,
         and that should be used as the base for lookups in detail views.
         :return:
         """
-        return (UsersExchangeOperations.objects
-                .filter(user=self.request.user.id)
-                .annotate(amount_operation=models.F('count') * models.F('currency__sale_rate'))
-                .select_related('user', 'currency')
-                )
+        if not self.request.user.is_authenticated:
+            return UsersExchangeOperations.objects.none()
+        # operations of the related manager already know their user, so no join is needed
+        return self.request.user.exchanges.all()
+
+
+class UserPortfolioView(generics.ListAPIView):
+    """
+    View for getting totals of user operations per currency: count, value in UAH by
+    the rates of operations and number of operations
+    """
+    serializer_class = UserPortfolioSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        """
+        Portfolio of the current user
+        :return:
+        """
+        return UserPortfolio.objects.filter(user=self.request.user.id, operations__gt=0) \
+            .order_by('to_currency')
 
 
 class UserRegistrationView(mixins.CreateModelMixin,
@@ -151,7 +430,8 @@ class APIChangePasswordView(generics.UpdateAPIView):
         :param queryset:
         :return:
         """
-        logger.debug(f'User: {self.request.user} get response by url {self.request.get_full_path()}')
+        logger.debug('User: %s get response by url %s', self.request.user,
+                     self.request.get_full_path())
         return self.request.user
 
 
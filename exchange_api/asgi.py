@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exchange_api.settings')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+from currency_exchange.asgi import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
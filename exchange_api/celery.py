@@ -27,5 +27,9 @@ app.conf.beat_schedule = {
     'get-currency-by-api-every-night': {
         'task': 'currency_exchange.tasks.download_exchange_rates',
         'schedule': crontab(minute='0', hour='10'),
-    }
+    },
+    'poll-currency-by-api-every-quarter-hour': {
+        'task': 'currency_exchange.tasks.poll_exchange_rates',
+        'schedule': crontab(minute='*/15'),
+    },
 }
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'currency_exchange.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,9 +58,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# toolbar middleware is sync only, under ASGI it makes all requests wait for one thread
+if os.environ.get('DEBUG_TOOLBAR', '1') == '1':
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'exchange_api.urls'
 
 TEMPLATES = [
@@ -153,11 +157,7 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-        'rest_framework_social_oauth2.authentication.SocialAuthentication',
+        'currency_exchange.authentication.SchemeAuthentication',
     )
 
 }
@@ -168,6 +168,7 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'Your project description',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
+    'SECURITY': [{'basicAuth': []}, {'cookieAuth': []}],
 }
 
 SIMPLE_JWT = {
@@ -213,6 +214,39 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# data version and cached payloads must be shared by web workers and celery, so redis
+# is the default. Tests keep their data in process memory, see test_settings.
+RATES_CACHE = {
+    'BACKEND': os.environ.get('RATES_CACHE_BACKEND', 'currency_exchange.cache.RedisBackend'),
+    'LOCATION': 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/1',
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+# seconds a successful basic authentication is trusted without hashing the password again
+BASIC_AUTH_CACHE_TIMEOUT = int(os.environ.get('BASIC_AUTH_CACHE_TIMEOUT', 60))
+
+PRIVATBANK_API_URL = os.environ.get('PRIVATBANK_API_URL',
+                                    'https://api.privatbank.ua/p24api/exchange_rates')
+PRIVATBANK_API_TIMEOUT = 10
+NBU_API_URL = os.environ.get('NBU_API_URL',
+                             'https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange')
+
+# Sources of daily rates ordered by priority, a rate is taken from the first source which has it
+RATE_SOURCES = [
+    {'BACKEND': 'currency_exchange.sources.PrivatBankSource', 'URL': PRIVATBANK_API_URL,
+     'TIMEOUT': PRIVATBANK_API_TIMEOUT},
+    {'BACKEND': 'currency_exchange.sources.NBUSource', 'URL': NBU_API_URL, 'TIMEOUT': 10},
+]
+if os.environ.get('RATES_FILE'):
+    RATE_SOURCES.insert(0, {'BACKEND': 'currency_exchange.sources.FileSource',
+                            'PATH': os.environ['RATES_FILE']})
+RATE_SOURCE_FAILURE_THRESHOLD = 3
+RATE_SOURCE_COOLDOWN = 300
+
+# directory with PROMETHEUS_MULTIPROC_DIR of every service, /metrics merges all of them
+PROMETHEUS_MULTIPROC_ROOT = os.environ.get('PROMETHEUS_MULTIPROC_ROOT', '')
+
 
 LOGGING = {
     'version': 1,
@@ -222,6 +256,16 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {filename} {funcName} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'currency_exchange.log.JsonFormatter',
+        },
+    },
+    'filters': {
+        # share of debug and info records written per logger, warnings are always written
+        'sampling': {
+            '()': 'currency_exchange.log.SamplingFilter',
+            'rates': {'currency_exchange.views': float(os.environ.get('LOG_SAMPLE_VIEWS', 1))},
+        },
     },
     'handlers': {
         'console': {
@@ -229,18 +273,26 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'main_format'
         },
+        # web workers and celery append to one file. It is rotated by size by the logrotate
+        # service of compose with logrotate.conf, the handler reopens the file when it is moved
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'logging.handlers.WatchedFileHandler',
             'filename': pathlib.Path.joinpath(BASE_DIR, 'logs/logs_currency.log'),
-            'formatter': 'main_format'
+            'formatter': 'json'
+        },
+        # records are written to console and file by a background thread
+        'queue': {
+            'class': 'currency_exchange.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['sampling'],
         },
     },
     'loggers': {
         'currency_exchange': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'propagate': True,
-            'level': 'DEBUG',
+            'level': os.environ.get('LOG_LEVEL', 'DEBUG'),
         },
     }
 }
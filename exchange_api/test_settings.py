@@ -0,0 +1,7 @@
+"""
+Settings for running tests: python manage.py test --settings=exchange_api.test_settings
+"""
+from exchange_api.settings import *  # noqa: F401,F403
+
+# tests don't need redis and must not share cached data with a running server
+RATES_CACHE = dict(RATES_CACHE, BACKEND='currency_exchange.cache.LocMemBackend')  # noqa: F405
@@ -19,6 +19,7 @@ from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
+from currency_exchange.metrics import metrics_view
 from currency_exchange.views import auth
 
 urlpatterns = [
@@ -29,6 +30,8 @@ urlpatterns = [
 
     path('__debug__/', include('debug_toolbar.urls')),
 
+    path('metrics', metrics_view, name='metrics'),
+
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'),
          name='swagger-ui'),